@@ -0,0 +1,63 @@
+"""
+Caption parser throughput on the fixtures in benchmarks/fixtures/captions.
+
+    python -m benchmarks.captions_bench [repeat]
+
+For every fixture it reports payload size, parse throughput and transcript
+size for src.youtube.captions and for the old _strip_caption_payload (kept
+below as the baseline), so regressions in speed or in how much caption noise
+reaches the embedder/LLM show up side by side.
+"""
+
+import html
+import json
+import sys
+import time
+from pathlib import Path
+
+from src.youtube.captions import parse_captions
+
+FIXTURES = Path(__file__).parent / "fixtures" / "captions"
+EXT_FORMAT = {".json3": "json3", ".srv3": "srv3", ".vtt": "vtt", ".srt": "srt"}
+
+
+def legacy_strip(raw: str) -> str:
+    """The pre-captions.py parser, for comparison."""
+    if raw.lstrip().startswith("{"):
+        try:
+            obj = json.loads(raw)
+            return "\n".join(html.unescape(seg["utf8"]) for ev in obj["events"]
+                             if "segs" in ev for seg in ev["segs"] if seg.get("utf8"))
+        except Exception:
+            return ""
+    lines = []
+    for ln in raw.splitlines():
+        ln = ln.strip()
+        if ln and not ln.isdigit() and "-->" not in ln and not ln.lower().startswith("webvtt"):
+            lines.append(ln)
+    return "\n".join(lines)
+
+
+def _time(fn, raw, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        out = fn(raw)
+    return (time.perf_counter() - started) / repeat, out
+
+
+def main(repeat: int = 20):
+    print(f"{'fixture':<16}{'kB':>7}{'MB/s':>8}{'chars':>8}{'legacy MB/s':>13}{'legacy chars':>14}")
+    for path in sorted(FIXTURES.iterdir()):
+        fmt = EXT_FORMAT.get(path.suffix)
+        if fmt is None:
+            continue
+        raw = path.read_text(encoding="utf-8")
+        mb = len(raw.encode("utf-8")) / 1e6
+        secs, text = _time(lambda r: parse_captions(r, fmt), raw, repeat)
+        old_secs, old_text = _time(legacy_strip, raw, repeat)
+        print(f"{path.name:<16}{mb * 1000:>7.0f}{mb / secs:>8.1f}{len(text):>8}"
+              f"{mb / old_secs:>13.1f}{len(old_text):>14}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
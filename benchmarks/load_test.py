@@ -0,0 +1,276 @@
+"""
+Load test: the real pipeline entry points against local stand-ins.
+
+    python -m benchmarks.load_test [harvest] [videos] [summarise] [send]
+        [--scales 1,2,5,10]       sources / channels, × today's sources.yaml / channels.yaml
+        [--entries 20]            entries per stub feed
+        [--page-latency 80]       ms per feed / page request
+        [--llm-latency 800]       ms per completion (±25 % jitter)
+        [--llm-429 0,0.1,0.3]     share of throttled LLM calls, one run each
+        [--subscribers 1,10,100]  × the hard-coded subscriber list
+        [--smtp-delay 0]          ms the sink takes to accept each message
+        [--full-harvest]          PRESCORE_TOP=0: fetch every entry, not the best 60
+        [--async]                 HARVEST_ASYNC=1
+        [--json results.json]
+
+Every run gets a fresh working directory (newsletter.db via src.init_db,
+generated sources.yaml / channels.yaml, the repo's keyword files and
+templates) and runs the stage as `python -m <module>` with endpoints pointed
+at benchmarks.stub_servers through the environment:
+
+* harvest   — src.articles.run_harvest (HARVEST_ALL=1, RUN_BUDGET_S=1e9: every
+              feed, whatever the scheduler would defer) against a FeedServer,
+* videos    — src.youtube.youtube_scraper against a YouTubeServer,
+* summarise — src.lineup + src.articles.summarise against an LLMServer
+              (OpenAI-compatible and Gemini REST), SUMMARISE_PAUSE_S=0,0,
+* send      — src.render_newsletter, src.subscribers import and
+              src.smtp_mailer against an SMTPSink.
+
+Inputs a stage needs from earlier stages (scored articles for the lineup, a
+summarised lineup for render) are seeded straight into the DB, so each curve
+measures one stage. Wall time includes interpreter start-up and imports.
+A stage whose dependencies are not installed is reported, not fatal.
+"""
+
+import csv
+import datetime
+import json
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+
+from benchmarks.stub_servers import FeedServer, LLMServer, SMTPSink, YouTubeServer
+
+REPO = Path(__file__).resolve().parent.parent
+SHARED = ("keywords.yaml", "youtube_keywords.yaml", "profiles.yaml")
+STAGES = ("harvest", "videos", "summarise", "send")
+LINEUP_SEED = 20        # scored articles offered to src.lineup in the summarise runs
+
+
+def _ts(dt: datetime.datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def base_counts() -> Dict[str, int]:
+    from src.init_db import HARDCODED_SUBS
+
+    sources = yaml.safe_load((REPO / "sources_and_keywords/sources.yaml").read_text())
+    channels = yaml.safe_load((REPO / "sources_and_keywords/channels.yaml").read_text())["channels"]
+    return {"sources": sum(1 for s in sources if s.get("rss")), "channels": len(channels),
+            "subscribers": len({e.lower() for e in HARDCODED_SUBS})}
+
+
+# ── running stages ───────────────────────────────────────────────────────
+class Run:
+    def __init__(self, root: Path, name: str, sources=(), channels=()):
+        self.dir = root / name
+        cfg = self.dir / "sources_and_keywords"
+        cfg.mkdir(parents=True)
+        for f in SHARED:
+            (cfg / f).symlink_to(REPO / "sources_and_keywords" / f)
+        (cfg / "sources.yaml").write_text(yaml.safe_dump(list(sources)))
+        (cfg / "channels.yaml").write_text(yaml.safe_dump({"channels": list(channels)}))
+        (self.dir / "templates").symlink_to(REPO / "templates")
+        self.env = {"PYTHONPATH": os.pathsep.join(filter(None, [str(REPO), os.getenv("PYTHONPATH")])),
+                    # never the real services, whatever .env says
+                    "SMTP_HOST": "127.0.0.1", "SMTP_PORT": "1", "SMTP_STARTTLS": "0", "SMTP_PASS": "",
+                    "SMTP_USER": "loadtest@example.org",
+                    "OPENROUTER_BASE_URL": "http://127.0.0.1:1/v1", "OPENROUTER_API_KEY": "stub",
+                    "GEMINI_API_ENDPOINT": "http://127.0.0.1:1", "GEMINI_API_KEY": "stub",
+                    "YOUTUBE_API_ENDPOINT": "http://127.0.0.1:1/", "YOUTUBE_API_KEY": "stub"}
+        self.stage("src.init_db")
+
+    def stage(self, module: str, *args, **env) -> dict:
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-m", module, *args], cwd=self.dir,
+                              env={**os.environ, **self.env, **env}, capture_output=True, text=True)
+        out = {"seconds": time.perf_counter() - started, "ok": proc.returncode == 0, "note": ""}
+        if not out["ok"]:
+            missing = re.search(r"No module named '([^']+)'", proc.stderr)
+            tail = proc.stderr.strip().splitlines()[-1:] or [f"exit {proc.returncode}"]
+            out["note"] = f"needs {missing.group(1)}" if missing else tail[0][:80]
+        return out
+
+    def sql(self, query: str, rows=None):
+        with sqlite3.connect(self.dir / "newsletter.db") as conn:
+            if rows is not None:
+                conn.executemany(query, rows)
+                return None
+            return conn.execute(query).fetchone()[0]
+
+
+def _row(stage, scale, load, items, run, latency=None, **extra) -> dict:
+    secs = run["seconds"]
+    return {"stage": stage, "scale": scale, "load": load, "items": items,
+            "seconds": round(secs, 2), "per_s": round(items / secs, 1) if secs and items else 0,
+            "p50_ms": (latency or {}).get("p50_ms"), "p95_ms": (latency or {}).get("p95_ms"),
+            "note": run["note"], **extra}
+
+
+# ── curves ───────────────────────────────────────────────────────────────
+def harvest_curve(root, scales, base, entries, page_latency, full, use_async) -> List[dict]:
+    rows = []
+    for k in scales:
+        feeds = FeedServer(base["sources"] * k, entries, page_latency, page_latency / 4)
+        run = Run(root, f"harvest-{k}", sources=feeds.source_list())
+        # the curve measures ingest, not the scheduler: no schedule, no budget
+        env = {"HARVEST_ALL": "1", "RUN_BUDGET_S": "1e9", "HARVEST_ASYNC": "1" if use_async else ""}
+        if full:
+            env["PRESCORE_TOP"] = "0"
+        res = run.stage("src.articles.run_harvest", **env)
+        stored = run.sql("SELECT count(*) FROM articles")
+        # feeds read < feeds: some feeds failed
+        read = feeds.stats.summary("feed")["requests"]
+        rows.append(_row("harvest", k, f"{read}/{feeds.sources} feeds × {entries}", stored, res,
+                         feeds.stats.summary("page"), requests=feeds.stats.summary()["requests"]))
+        feeds.close()
+    return rows
+
+
+def videos_curve(root, scales, base, page_latency) -> List[dict]:
+    rows = []
+    for k in scales:
+        api = YouTubeServer(base["channels"] * k, 7, page_latency, page_latency / 4)
+        run = Run(root, f"videos-{k}", channels=api.channel_list())
+        res = run.stage("src.youtube.youtube_scraper", YOUTUBE_API_ENDPOINT=f"{api.url}/")
+        stored = run.sql("SELECT count(*) FROM videos")
+        rows.append(_row("videos", k, f"{api.channels} channels", stored, res, api.stats.summary(),
+                         requests=api.stats.summary()["requests"]))
+        api.close()
+    return rows
+
+
+def _seed_articles(run: Run, n: int, summarised: bool = False):
+    """n scored articles with page text (and a summary) from the stub generator."""
+    gen = FeedServer(n, 1)
+    now = datetime.datetime.utcnow()
+    rnd = random.Random(7)
+    rows = []
+    for s in range(n):
+        text = " ".join(gen._paragraph(rnd) for _ in range(10))
+        rows.append((f"{s:064x}", f"Stub Source {s:03d}", f"{gen.url}/a/{s}/0", gen._title(rnd),
+                     _ts(now - datetime.timedelta(hours=s)), text, _ts(now), 1000 - s,
+                     LLMServer.answer() if summarised else None))
+    gen.close()
+    run.sql("INSERT INTO articles (id, source_name, url, title, published_at, text, fetched_at, "
+            "score, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def summarise_curve(root, rates, latency) -> List[dict]:
+    rows = []
+    for rate in rates:
+        llm = LLMServer(latency, latency / 4, rate)
+        run = Run(root, f"summarise-{rate}")
+        _seed_articles(run, LINEUP_SEED)
+        run.stage("src.lineup")
+        picked = run.sql("SELECT count(*) FROM lineup_items WHERE kind = 'articles'")
+        res = run.stage("src.articles.summarise", SUMMARISE_PAUSE_S="0,0",
+                        OPENROUTER_BASE_URL=f"{llm.url}/v1", GEMINI_API_ENDPOINT=llm.url)
+        done = run.sql("SELECT count(*) FROM lineup_items l JOIN articles a ON a.id = l.item_id "
+                       "WHERE l.kind = 'articles' AND a.summary IS NOT NULL")
+        ok = [r for r in llm.stats.requests if r[2] == 200]
+        rows.append(_row("summarise", rate, f"{picked} items, {int(rate * 100)}% 429", done, res,
+                         llm.stats.summary(), requests=len(llm.stats.requests),
+                         throttled=len(llm.stats.requests) - len(ok)))
+        llm.close()
+    return rows
+
+
+def send_curve(root, scales, base, smtp_delay) -> List[dict]:
+    rows = []
+    for k in scales:
+        sink = SMTPSink(smtp_delay)
+        run = Run(root, f"send-{k}")
+        _seed_articles(run, 5, summarised=True)
+        today = datetime.datetime.utcnow().date().isoformat()     # the edition: UTC, as src.lineup
+        run.sql("INSERT INTO lineup_items (edition, kind, position, item_id, score) "
+                "VALUES (?, 'articles', ?, ?, ?)",
+                [(today, p, f"{p:064x}", 1000 - p) for p in range(5)])
+        smtp = {"SMTP_PORT": str(sink.port), "UNSUBSCRIBE_URL": "http://127.0.0.1/u/{token}"}
+        rendered = run.stage("src.render_newsletter", **smtp)
+        rows.append(_row("render", k, "5 items", 1, rendered))
+
+        extra = base["subscribers"] * k - base["subscribers"]
+        subs = run.dir / "subscribers.csv"
+        with subs.open("w", newline="") as fh:
+            w = csv.writer(fh)
+            w.writerow(["email"])
+            w.writerows([f"reader{i:07d}@example.org"] for i in range(extra))
+        imported = run.stage("src.subscribers", "import", str(subs))
+        rows.append(_row("import", k, f"{extra} rows", extra, imported))
+
+        sent = run.stage("src.smtp_mailer", **smtp)
+        time.sleep(0.2)                 # last DATA acknowledged before the count
+        recipients = run.sql("SELECT count(*) FROM subscribers WHERE active = 1")
+        rows.append(_row("send", k, f"{recipients} subscribers", sink.recipients, sent,
+                         sink.stats.summary(), messages=sink.messages))
+        sink.close()
+    return rows
+
+
+# ── report ───────────────────────────────────────────────────────────────
+def report(rows: List[dict]):
+    """One table; `vs 1st` is the cost per item relative to the stage's first run."""
+    print(f"{'stage':<10}{'scale':>6}  {'load':<28}{'items':>7}{'secs':>9}{'items/s':>10}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'vs 1st':>8}  note")
+    first = {}
+    for r in rows:
+        per_item = r["seconds"] / r["items"] if r["items"] else None
+        if per_item:
+            first.setdefault(r["stage"], per_item)
+        rel = f"{per_item / first[r['stage']]:.2f}" if per_item else "-"
+        p50 = r["p50_ms"] if r["p50_ms"] is not None else "-"
+        p95 = r["p95_ms"] if r["p95_ms"] is not None else "-"
+        print(f"{r['stage']:<10}{r['scale']:>6}  {r['load']:<28}{r['items']:>7}{r['seconds']:>9.2f}"
+              f"{r['per_s']:>10}{p50:>9}{p95:>9}{rel:>8}  {r['note']}")
+
+
+def _option(args, name, default):
+    return args[args.index(name) + 1] if name in args[:-1] else default
+
+
+def _numbers(spec: str, cast=int) -> list:
+    return [cast(x) for x in spec.split(",") if x]
+
+
+def main(args: List[str]):
+    stages = [a for a in args if a in STAGES] or list(STAGES)
+    scales = _numbers(_option(args, "--scales", "1,2,5,10"))
+    entries = int(_option(args, "--entries", 20))
+    page_latency = float(_option(args, "--page-latency", 80))
+    llm_latency = float(_option(args, "--llm-latency", 800))
+    rates = _numbers(_option(args, "--llm-429", "0,0.1,0.3"), float)
+    subscriber_scales = _numbers(_option(args, "--subscribers", "1,10,100"))
+    smtp_delay = float(_option(args, "--smtp-delay", 0))
+
+    base = base_counts()
+    root = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    print(f"working in {root}; 1× = {base['sources']} sources, {base['channels']} channels, "
+          f"{base['subscribers']} subscribers")
+    rows = []
+    if "harvest" in stages:
+        rows += harvest_curve(root, scales, base, entries, page_latency,
+                              "--full-harvest" in args, "--async" in args)
+    if "videos" in stages:
+        rows += videos_curve(root, scales, base, page_latency)
+    if "summarise" in stages:
+        rows += summarise_curve(root, rates, llm_latency)
+    if "send" in stages:
+        rows += send_curve(root, subscriber_scales, base, smtp_delay)
+    report(rows)
+    if out := _option(args, "--json", None):
+        Path(out).write_text(json.dumps(rows, indent=2))
+    return rows
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,99 @@
+"""
+Parity check: batch video ranking against the old per-row ranker.
+
+    python -m benchmarks.rank_parity [--videos 20000]
+
+Scores a synthetic set of videos (unit float32 vectors, some missing;
+transcripts with and without keyword hits; weighted and unknown channels)
+twice, with SEMANTIC_MODE=mean:
+
+* reference — the loop rank_videos ran before batching, per row
+  int(w * (kw*1 + np.dot(vector, QUERY_VEC)*25)), recency off,
+* batch     — youtube_rank.batch_scores(..., recency=False).
+
+Every score must match, and so must the raw score before int() on the
+exact path, bit for bit. For scale it also reports on how many rows the
+plain float64 matrix product (the recency=True path) gives a different raw
+score before int(): each of those flips the integer when it sits on a
+boundary.
+"""
+
+import datetime
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+os.environ["SEMANTIC_MODE"] = "mean"        # the old ranker only had mean vectors
+
+from src.youtube import youtube_rank as yr   # noqa: E402
+
+
+def _option(args, name, default):
+    return args[args.index(name) + 1] if name in args[:-1] else default
+
+
+def videos(n: int, seed: int = 7) -> list:
+    rnd = random.Random(seed)
+    rng = np.random.default_rng(seed)
+    keywords = [k for kws in yr.KW_DICT.values() for k in kws]
+    channels = list(yr.SRC_W) + ["Unlisted Channel"]
+    vecs = rng.standard_normal((n, yr.QUERY_VEC.shape[0])).astype(np.float32)
+    # lean towards the query so the semantic term spans a useful range
+    vecs += rng.uniform(0, 2, (n, 1)).astype(np.float32) * yr.QUERY_VEC
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    out = []
+    for i in range(n):
+        words = rnd.sample(keywords, k=min(len(keywords), rnd.randint(0, 4)))
+        out.append(SimpleNamespace(
+            video_id=f"vid{i}", channel_name=rnd.choice(channels), published_at=None,
+            vector=None if i % 50 == 0 else vecs[i].tobytes(), chunk_vectors=None,
+            transcript=" ".join(["filler talk"] + words) if i % 3 else None,
+            description="a description " + " ".join(words[:1])))
+    return out
+
+
+def reference(vids) -> list:
+    """The old loop's raw w * (kw + sem*25) per row, before int()."""
+    scores = []
+    for v in vids:
+        txt = v.transcript or v.description or ""
+        sem = float(np.dot(np.frombuffer(v.vector, dtype=np.float32), yr.QUERY_VEC)) if v.vector else 0
+        kw = yr.kw_weighted_hits(txt)
+        w = yr.source_weight(v.channel_name)
+        scores.append(w * (kw * 1 + sem * 25))
+    return scores
+
+
+def main(args) -> bool:
+    n = int(_option(args, "--videos", 20_000))
+    vids = videos(n)
+    now = datetime.datetime.now(tz=yr.UTC)
+
+    raw = reference(vids)
+    want = [int(r) for r in raw]
+    got = yr.batch_scores(vids, now, recency=False).tolist()
+    diff = [i for i, (a, b) in enumerate(zip(want, got)) if a != b]
+
+    kw = np.array([yr.kw_weighted_hits(v.transcript or v.description or "") for v in vids],
+                  dtype=np.float64)
+    w = np.array([yr.source_weight(v.channel_name) for v in vids], dtype=np.float64)
+    blobs = [v.vector for v in vids]
+    exact = w * (kw + yr.semantic_sims(blobs, [None] * n, exact=True) * 25)
+    bits = int(np.count_nonzero(exact != np.array(raw)))
+    matrix = w * (kw + yr.semantic_sims(blobs, [None] * n) * 25)
+    off = int(np.count_nonzero(matrix != np.array(raw)))
+
+    print(f"{n} videos, recency off: {n - len(diff)} identical, {len(diff)} different "
+          f"(the matrix product's raw score differs on {off} rows)")
+    if bits:
+        print(f"  raw scores on the exact path differ on {bits} rows")
+    for i in diff[:10]:
+        print(f"  {vids[i].video_id}: old {want[i]}, batch {got[i]}")
+    return not diff and not bits
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(sys.argv[1:]) else 1)
@@ -0,0 +1,99 @@
+"""
+Parity check: the compiled-template render against a full premailer pass.
+
+    python -m benchmarks.render_parity
+
+Renders the stock templates/newsletter.html.j2 with a synthetic edition
+(ampersands, quotes, ">", non-ASCII, multi-line summaries, query-string URLs,
+items with and without an image) twice:
+
+* reference — Jinja render of the real items, then
+  Premailer(..., **PREMAILER_OPTIONS).transform(), as build() did before the
+  template was compiled,
+* compiled  — compile_template() + fill_item() + personalise(), as build()
+  and the mailer do now (the compile cache is bypassed).
+
+The reference still carries the <!--frag:…--> markers the compiled path cuts
+along, so they are stripped from it; everything else must match byte for
+byte, for the shared copy and for a subscriber's copy with a token.
+
+Not covered, on purpose: a literal "<tag>" in a title or summary, or a '"'
+in a URL. The template is not autoescaped (.j2), so a full premailer pass
+parsed the first as markup and cut the attribute short at the second; the
+compiled path escapes both.
+"""
+
+import datetime
+import difflib
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from premailer import Premailer
+
+from src import render_newsletter as rn
+
+TOKEN = "0123456789abcdef0123456789abcdef"
+EDITION = datetime.date(2025, 6, 3)
+
+
+def edition():
+    articles = [
+        SimpleNamespace(title=f"Story {i}: R&D -> \"quotes\" & 'ticks'",
+                        summary=f"Line one of {i}.\nLine two — ünïcode & 5 > 3.\n\nLast line.",
+                        url=f"https://example.org/a/{i}?x=1&y=2&q=it's",
+                        image_url=f"https://img.example.org/{i}.jpg?w=600&h=400" if i % 2 else None)
+        for i in range(5)]
+    videos = [
+        SimpleNamespace(title=f"Video {i} (live) & more",
+                        summary=f"What happened:\n- point {i}\n- another & one",
+                        url=f"https://www.youtube.com/watch?v=vid{i}&t=30s",
+                        thumbnail_url=f"https://i.ytimg.com/vi/vid{i}/hqdefault.jpg" if i != 1 else None)
+        for i in range(3)]
+    return articles, videos
+
+
+def reference(env, articles, videos, token=None) -> str:
+    url = rn.UNSUBSCRIBE_URL.format(token=token) if rn.UNSUBSCRIBE_URL and token else None
+    raw = env.get_template("newsletter.html.j2").render(
+        articles=articles, videos=videos, date=EDITION, unsubscribe_url=url)
+    html = Premailer(raw, **rn.PREMAILER_OPTIONS).transform()
+    return rn.FRAG_RE.sub(lambda m: m.group(2), html)
+
+
+def compiled(env, articles, videos, token=None) -> str:
+    rn.CACHE_DIR = Path(tempfile.mkdtemp(prefix="premailer-parity-"))
+    tpl = rn.compile_template(env, "newsletter.html.j2")
+    parts = {
+        "skeleton":  rn.DATE_RE.sub(lambda m: EDITION.strftime(m.group(1)), tpl["skeleton"]),
+        "separators": tpl["separators"],
+        "fragments": {"articles":    [rn.fill_item(tpl, "articles", a) for a in articles],
+                      "videos":      [rn.fill_item(tpl, "videos", v) for v in videos],
+                      "unsubscribe": [tpl["unsubscribe"]] if rn.UNSUBSCRIBE_URL else []},
+        "text":      {"articles": [""] * len(articles), "videos": [""] * len(videos)},
+    }
+    return rn.personalise(parts, token)[0]
+
+
+def main() -> bool:
+    env = Environment(loader=FileSystemLoader("templates"),
+                      autoescape=select_autoescape(enabled_extensions=("html",)))
+    articles, videos = edition()
+    rn.UNSUBSCRIBE_URL = rn.UNSUBSCRIBE_URL or "https://example.org/unsubscribe?token={token}"
+    ok = True
+    for label, token in (("shared copy", None), ("subscriber copy", TOKEN)):
+        want = reference(env, articles, videos, token)
+        got = compiled(env, articles, videos, token)
+        same = want == got
+        ok &= same
+        print(f"{label:<16} {len(want):>7} bytes  " + ("identical" if same else "DIFFERENT"))
+        if not same:
+            sys.stdout.writelines(difflib.unified_diff(
+                want.splitlines(True), got.splitlines(True), "premailer", "compiled", n=1))
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
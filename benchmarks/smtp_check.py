@@ -0,0 +1,127 @@
+"""
+Delivery check for src.smtp_mailer against a local SMTPSink.
+
+    python -m benchmarks.smtp_check [--subscribers 400] [--drop-every 3] [--drops 3]
+
+Works in a throwaway directory: imports N subscribers (one of them without an
+unsubscribe token), then sends one edition over SMTP_WORKERS parallel
+connections while the sink cuts the connection on every K-th MAIL FROM (up
+to --drops times) and refuses the first recipient of the first three
+batches. It checks that
+
+* the drops were hit and retried,
+* every other subscriber got exactly one copy, and nobody else got any,
+* refused recipients (550) were tried once, are not marked sent but are
+  marked bounced, so nobody is left pending for the pipeline's send stage,
+* everyone else is marked sent, and a second send() delivers nothing,
+* the subscriber without a token was given one.
+
+Runs twice: the shared Bcc payload (one envelope per batch) and the
+personalised one (one envelope per recipient, so a drop lands mid-batch).
+"""
+
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import Session
+
+from benchmarks.stub_servers import SMTPSink
+from src import subscribers
+from src.models import Base, Subscriber
+
+
+def _option(args, name, default):
+    return args[args.index(name) + 1] if name in args[:-1] else default
+
+
+def _write_edition(base: str, personalised: bool):
+    Path(f"{base}.html").write_text("<html><body><p>edition</p></body></html>", encoding="utf-8")
+    Path(f"{base}.txt").write_text("edition", encoding="utf-8")
+    parts = Path(f"{base}.parts.json")
+    parts.unlink(missing_ok=True)
+    if personalised:
+        parts.write_text(json.dumps({
+            "skeleton": "<html><body><!--slot:articles--><!--slot:unsubscribe--></body></html>",
+            "fragments": {"articles": ["<p>one</p>", "<p>two</p>"],
+                          "unsubscribe": ['<a href="%%UNSUBSCRIBE_URL%%">unsubscribe</a>']},
+            "text": {"articles": ["one", "two"]},
+        }), encoding="utf-8")
+
+
+def check(n: int, drop_every: int, drops: int, personalised: bool) -> bool:
+    from src import smtp_mailer
+
+    label = "personalised" if personalised else "shared Bcc"
+    Path("newsletter.db").unlink(missing_ok=True)
+    eng = create_engine(subscribers.DB_URL)
+    Base.metadata.create_all(eng)
+    emails = [f"reader{i:05d}@example.org" for i in range(n)]
+    refuse = set(emails[:3 * smtp_mailer.BATCH_SIZE:smtp_mailer.BATCH_SIZE])
+    with Session(eng) as ssn:
+        subscribers.upsert(ssn, emails)
+        ssn.execute(update(Subscriber).where(Subscriber.email == emails[-1]).values(token=None))
+        ssn.commit()
+
+    sink = SMTPSink(drop_every=drop_every, drops=drops, refuse=refuse)
+    smtp_mailer.HOST, smtp_mailer.PORT = sink.host, sink.port
+    base = f"newsletter_{datetime.date.today()}"
+    _write_edition(base, personalised)
+
+    started = time.perf_counter()
+    smtp_mailer.send(f"{base}.html", f"{base}.txt")
+    took = time.perf_counter() - started
+    first_messages, tried = sink.messages, dict(sink.counter.refused)
+    smtp_mailer.send(f"{base}.html", f"{base}.txt")     # everyone is served: a no-op
+    sink.close()
+
+    with Session(eng) as ssn:
+        marked = set(ssn.scalars(select(Subscriber.email).where(Subscriber.last_sent.is_not(None))))
+        bounced = set(ssn.scalars(select(Subscriber.email).where(Subscriber.bounced_at.is_not(None))))
+        pending = sum(len(p) for p in subscribers.iter_recipient_pages(
+            smtp_mailer.edition_start(), db_url=subscribers.DB_URL))
+        no_token = ssn.scalar(select(func.count()).select_from(Subscriber)
+                              .where(Subscriber.token.is_(None)))
+    copies = sink.delivered
+    failures = {
+        "no drop was hit": sink.counter.dropped == 0,
+        "missing recipients": set(emails) - refuse - set(copies),
+        "unknown recipients": set(copies) - set(emails),
+        "duplicates": {e: c for e, c in copies.items() if c > 1},
+        "refused recipients retried": {e: c for e, c in tried.items() if c > 1},
+        "refused recipients marked sent": refuse & marked,
+        "refused recipients not marked bounced": refuse - bounced,
+        "others marked bounced": bounced - refuse,
+        "recipients still pending": pending,
+        "not marked sent": set(emails) - refuse - marked,
+        "second send delivered mail": sink.messages != first_messages,
+        "token not created": personalised and no_token,
+    }
+    failures = {k: v for k, v in failures.items() if v}
+    print(f"{label:<14} {n} subscribers, {sink.messages} messages, {sink.counter.dropped} drops, "
+          f"{took:.1f}s: " + ("ok" if not failures else f"FAILED {failures}"))
+    return not failures
+
+
+def main(args):
+    n = int(_option(args, "--subscribers", 400))
+    drop_every = int(_option(args, "--drop-every", 3))
+    drops = int(_option(args, "--drops", 3))
+
+    # the mailer and renderer read these at import
+    os.environ.update({"SMTP_HOST": "127.0.0.1", "SMTP_PORT": "25", "SMTP_STARTTLS": "0",
+                       "SMTP_USER": "newsletter@example.org", "SMTP_PASS": "",
+                       "UNSUBSCRIBE_URL": "https://example.org/unsubscribe?token={token}"})
+    sys.path.insert(0, os.getcwd())         # src stays importable after the chdir
+    os.chdir(tempfile.mkdtemp(prefix="smtp-check-"))
+    ok = [check(n, drop_every, drops, personalised) for personalised in (False, True)]
+    sys.exit(0 if all(ok) else 1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,574 @@
+"""
+Local stand-ins for everything the pipeline talks to, for benchmarks.load_test.
+
+* FeedServer     — N RSS feeds × M entries, each entry a full article page
+                   (header, nav, 8–12 paragraphs, sidebar, footer, scripts),
+* LLMServer      — OpenAI-compatible /chat/completions and Gemini REST
+                   :generateContent, with configurable latency, jitter and a
+                   share of 429 responses,
+* YouTubeServer  — the three Data API v3 calls youtube_scraper makes,
+* SMTPSink       — accepts and counts mail (per recipient, too); aiosmtpd
+                   when installed, otherwise a minimal threaded SMTP server.
+                   Can drop every K-th connection mid-session and refuse
+                   given recipients.
+* SOCKS5Proxy    — username/password SOCKS5 (CONNECT only) standing in for
+                   Tor's SocksPort: relays the stream and counts connections
+                   per username, i.e. per isolated circuit.
+
+Every server runs on 127.0.0.1 with an OS-assigned port in a daemon thread
+and records (route, seconds, status) per request in `.stats`.
+
+    python -m benchmarks.stub_servers       # run all five until Ctrl-C, print their URLs
+"""
+
+import collections
+import datetime
+import email.utils
+import json
+import random
+import re
+import select
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import yaml
+
+try:
+    from aiosmtpd.controller import Controller
+except ModuleNotFoundError:          # the built-in sink below
+    Controller = None
+
+KEYWORDS_YAML = Path("sources_and_keywords/keywords.yaml")
+
+FILLER = ("the company said on its quarterly call that customers adopted the new platform faster "
+          "than expected while analysts pointed to pricing pressure margins hiring plans data "
+          "centres supply chains and a crowded market where rivals ship similar features every "
+          "month and regulators keep asking how the systems are trained tested and deployed").split()
+
+
+def _vocabulary() -> List[str]:
+    """Scoring keywords, so generated stories look on-topic to prescore / rank."""
+    try:
+        cfg = yaml.safe_load(KEYWORDS_YAML.read_text())
+        words = [k for cat in cfg["scoring_categories"] for k in cat["keywords"]]
+    except (OSError, KeyError, TypeError):
+        words = []
+    return words or ["AI", "startup", "funding", "model", "chips", "robotics"]
+
+
+class Stats:
+    """Thread-safe per-request log."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = []       # (route, seconds, status)
+
+    def add(self, route: str, seconds: float, status: int):
+        with self._lock:
+            self.requests.append((route, seconds, status))
+
+    def reset(self):
+        with self._lock:
+            self.requests = []
+
+    def summary(self, route: str = None) -> dict:
+        with self._lock:
+            rows = [r for r in self.requests if route is None or r[0] == route]
+        secs = sorted(r[1] for r in rows)
+
+        def pct(p):
+            return round(1000 * secs[min(len(secs) - 1, int(p * len(secs)))], 1) if secs else None
+
+        return {"requests": len(rows), "errors": sum(r[2] >= 400 for r in rows),
+                "p50_ms": pct(0.50), "p95_ms": pct(0.95)}
+
+
+# ── HTTP plumbing ────────────────────────────────────────────────────────
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body, ctype: str, headers: Dict[str, str] = None):
+        data = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        started = time.perf_counter()
+        route, status = self.server.stub.route(self)
+        self.server.stub.stats.add(route, time.perf_counter() - started, status)
+
+    do_GET = do_POST = _handle
+
+
+class _HTTPStub:
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0):
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.stats = Stats()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def delay(self):
+        ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def route(self, h: _Handler):
+        h._reply(404, "not found", "text/plain")
+        return "404", 404
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ── feeds + article pages ────────────────────────────────────────────────
+class FeedServer(_HTTPStub):
+    """
+    /feed/<s>.xml  RSS 2.0 with `entries` items published over the last hours
+    /a/<s>/<i>     the article page (deterministic per s, i)
+    """
+
+    def __init__(self, sources: int, entries: int, latency_ms: float = 0, jitter_ms: float = 0):
+        super().__init__(latency_ms, jitter_ms)
+        self.sources, self.entries = sources, entries
+        self.vocab = _vocabulary()
+        self.now = datetime.datetime.now(datetime.timezone.utc)
+
+    def source_list(self) -> List[dict]:
+        """sources.yaml entries for every stub feed."""
+        return [{"name": f"Stub Source {s:03d}", "url": f"{self.url}/s/{s}", "category": "startups",
+                 "feed_url": f"{self.url}/feed/{s}.xml", "rss": True, "login_required": False,
+                 "paywall": False, "scrape_method": "rss"} for s in range(self.sources)]
+
+    def _title(self, rnd: random.Random) -> str:
+        words = rnd.sample(self.vocab, min(2, len(self.vocab))) + rnd.sample(FILLER, 5)
+        rnd.shuffle(words)
+        return " ".join(words).capitalize()
+
+    def _paragraph(self, rnd: random.Random) -> str:
+        words = [rnd.choice(self.vocab) if rnd.random() < 0.06 else rnd.choice(FILLER)
+                 for _ in range(rnd.randint(45, 80))]
+        return " ".join(words).capitalize() + "."
+
+    def feed(self, s: int) -> str:
+        items = []
+        for i in range(self.entries):
+            rnd = random.Random(s * 100_003 + i)
+            published = self.now - datetime.timedelta(minutes=17 * i + s % 13)
+            link = f"{self.url}/a/{s}/{i}"
+            items.append(
+                f"<item><title>{self._title(rnd)}</title><link>{link}</link>"
+                f"<guid isPermaLink=\"true\">{link}</guid>"
+                f"<pubDate>{email.utils.format_datetime(published)}</pubDate>"
+                f"<description>{self._paragraph(rnd)[:240]}</description></item>")
+        return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                f"<title>Stub Source {s:03d}</title><link>{self.url}/s/{s}</link>"
+                f"<description>synthetic feed</description>{''.join(items)}</channel></rss>")
+
+    def page(self, s: int, i: int) -> str:
+        rnd = random.Random(s * 100_003 + i)
+        title = self._title(rnd)
+        paras = "".join(f"<p>{self._paragraph(rnd)}</p>" for _ in range(rnd.randint(8, 12)))
+        related = "".join(f'<li><a href="/a/{s}/{j}">{self._title(random.Random(j))}</a></li>'
+                          for j in range(6))
+        return (
+            "<!doctype html><html lang=\"en\"><head><meta charset=\"utf-8\">"
+            f"<title>{title} | Stub Source {s:03d}</title>"
+            f'<meta property="og:title" content="{title}">'
+            f'<meta property="og:image" content="{self.url}/img/{s}/{i}.jpg">'
+            "<link rel=\"stylesheet\" href=\"/static/site.css\">"
+            "<script>window.dataLayer=window.dataLayer||[];function gtag(){dataLayer.push(arguments)}</script>"
+            "</head><body><header class=\"site-header\"><nav><a href=\"/\">Home</a> <a href=\"/tech\">Tech</a>"
+            " <a href=\"/startups\">Startups</a> <a href=\"/subscribe\">Subscribe</a></nav></header>"
+            f"<main><article><h1>{title}</h1><div class=\"byline\">By Staff Writer · "
+            f"{(self.now - datetime.timedelta(minutes=17 * i)).strftime('%d %b %Y')}</div>"
+            f"<div class=\"entry-content\">{paras}</div></article>"
+            f"<aside class=\"sidebar\"><h3>Related</h3><ul>{related}</ul>"
+            "<div class=\"ad\">Advertisement</div></aside></main>"
+            "<footer><p>© Stub Media. All rights reserved.</p><a href=\"/privacy\">Privacy</a></footer>"
+            "<script src=\"/static/app.js\" async></script></body></html>")
+
+    def route(self, h):
+        path = urlparse(h.path).path
+        self.delay()
+        if m := re.fullmatch(r"/feed/(\d+)\.xml", path):
+            h._reply(200, self.feed(int(m.group(1))), "application/rss+xml; charset=utf-8")
+            return "feed", 200
+        if m := re.fullmatch(r"/a/(\d+)/(\d+)", path):
+            h._reply(200, self.page(int(m.group(1)), int(m.group(2))), "text/html; charset=utf-8")
+            return "page", 200
+        if path == "/robots.txt":
+            h._reply(200, "User-agent: *\nAllow: /\n", "text/plain")
+            return "robots", 200
+        return super().route(h)
+
+
+# ── LLM ──────────────────────────────────────────────────────────────────
+class LLMServer(_HTTPStub):
+    """OpenAI chat completions + Gemini generateContent, `rate_429` of them throttled."""
+
+    def __init__(self, latency_ms: float = 800, jitter_ms: float = 200, rate_429: float = 0.0):
+        super().__init__(latency_ms, jitter_ms)
+        self.rate_429 = rate_429
+
+    @staticmethod
+    def answer() -> str:
+        return ("The company launched a new product for enterprise customers. "
+                "Analysts expect the move to pressure rivals on price. "
+                "A wider rollout is planned for next quarter.")
+
+    def route(self, h):
+        path = urlparse(h.path).path
+        length = int(h.headers.get("Content-Length") or 0)
+        h.rfile.read(length)
+        kind = "gemini" if ":generateContent" in path else "openai" if path.endswith("/chat/completions") else None
+        if kind is None:
+            return super().route(h)
+        if random.random() < self.rate_429:
+            time.sleep(min(self.latency_ms, 50) / 1000)
+            h._reply(429, json.dumps({"error": {"code": 429, "message": "rate limited",
+                                                "status": "RESOURCE_EXHAUSTED"}}),
+                     "application/json", {"Retry-After": "1"})
+            return kind, 429
+        self.delay()
+        if kind == "gemini":
+            body = {"candidates": [{"content": {"role": "model", "parts": [{"text": self.answer()}]},
+                                    "finishReason": "STOP", "index": 0}],
+                    "usageMetadata": {"promptTokenCount": length // 4, "candidatesTokenCount": 40}}
+        else:
+            body = {"id": f"chatcmpl-{random.getrandbits(48):x}", "object": "chat.completion",
+                    "created": int(time.time()), "model": "stub",
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": self.answer()}}],
+                    "usage": {"prompt_tokens": length // 4, "completion_tokens": 40,
+                              "total_tokens": length // 4 + 40}}
+        h._reply(200, json.dumps(body), "application/json")
+        return kind, 200
+
+
+# ── YouTube Data API ─────────────────────────────────────────────────────
+class YouTubeServer(_HTTPStub):
+    """channels / playlistItems / videos for `channels` × `videos` recent uploads."""
+
+    def __init__(self, channels: int, videos: int, latency_ms: float = 0, jitter_ms: float = 0):
+        super().__init__(latency_ms, jitter_ms)
+        self.channels, self.videos = channels, videos
+        self.now = datetime.datetime.now(datetime.timezone.utc)
+
+    def channel_list(self) -> List[dict]:
+        return [{"name": f"Stub Channel {c:03d}", "id": f"UCstub{c:06d}"} for c in range(self.channels)]
+
+    def route(self, h):
+        url = urlparse(h.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.delay()
+        if url.path.endswith("/channels"):
+            cid = q.get("id", "")
+            items = [{"id": cid, "contentDetails": {"relatedPlaylists": {"uploads": "UU" + cid[2:]}}}]
+            body, route = {"items": items if cid.startswith("UCstub") else []}, "channels"
+        elif url.path.endswith("/playlistItems"):
+            pl = q.get("playlistId", "")
+            n = min(int(q.get("maxResults", 5)), self.videos)
+            items = []
+            for i in range(n):
+                vid = f"{pl[-6:]}v{i:03d}"
+                published = self.now - datetime.timedelta(minutes=37 * i + 5)
+                items.append({"snippet": {
+                    "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "title": f"Stub video {i} on {pl[-6:]}", "description": "A synthetic upload.",
+                    "thumbnails": {"high": {"url": f"{self.url}/thumb/{vid}.jpg"}},
+                    "resourceId": {"kind": "youtube#video", "videoId": vid}}})
+            body, route = {"items": items}, "playlistItems"
+        elif url.path.endswith("/videos"):
+            ids = [i for i in q.get("id", "").split(",") if i]
+            body = {"items": [{"id": i, "contentDetails": {"duration": "PT12M30S"}} for i in ids]}
+            route = "videos"
+        else:
+            return super().route(h)
+        h._reply(200, json.dumps(body), "application/json")
+        return route, 200
+
+
+# ── SMTP ─────────────────────────────────────────────────────────────────
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _SinkCounter:
+    def __init__(self, delay_ms: float, drop_every: int = 0, drops: int = 0, refuse=()):
+        self.delay_ms = delay_ms
+        self.drop_every, self.drops_left = drop_every, drops
+        self.refuse = {r.lower() for r in refuse}
+        self.refused: collections.Counter = collections.Counter()     # address → RCPTs refused
+        self.stats = Stats()
+        self.messages = 0
+        self.recipients = 0
+        self.delivered: collections.Counter = collections.Counter()   # address → copies
+        self.dropped = 0
+        self._mails = 0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def should_drop(self) -> bool:
+        """Called on MAIL FROM: True when this session should be cut instead."""
+        with self._lock:
+            self._mails += 1
+            if self.drop_every and self.drops_left and self._mails % self.drop_every == 0:
+                self.drops_left -= 1
+                self.dropped += 1
+                return True
+        return False
+
+    def refuses(self, address: str) -> bool:
+        if address.lower() not in self.refuse:
+            return False
+        with self._lock:
+            self.refused[address.lower()] += 1
+        return True
+
+    def accepted(self, rcpts: List[str], seconds: float):
+        now = time.perf_counter()
+        with self._lock:
+            self.messages += 1
+            self.recipients += len(rcpts)
+            self.delivered.update(r.lower() for r in rcpts)
+            self.first = self.first or now
+            self.last = now
+        self.stats.add("data", seconds, 250)
+
+
+class _AioHandler:
+    def __init__(self, counter: _SinkCounter):
+        self.counter = counter
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        if self.counter.should_drop():
+            server.transport.close()
+            return "421 4.3.2 closing connection"
+        envelope.mail_from = address
+        envelope.mail_options.extend(mail_options)
+        return "250 OK"
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if self.counter.refuses(address):
+            return "550 5.1.1 no such user"
+        envelope.rcpt_tos.append(address)
+        envelope.rcpt_options.extend(rcpt_options)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        import asyncio
+
+        started = time.perf_counter()
+        if self.counter.delay_ms:
+            await asyncio.sleep(self.counter.delay_ms / 1000)
+        self.counter.accepted(envelope.rcpt_tos, time.perf_counter() - started)
+        return "250 OK"
+
+
+class _SMTPSession(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        counter = self.server.counter
+        self.reply("220 stub ESMTP")
+        rcpts = []
+        while line := self.rfile.readline():
+            cmd = line.decode(errors="replace").strip().upper()
+            if cmd.startswith("EHLO"):
+                self.wfile.write(b"250-stub\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+            elif cmd.startswith("HELO"):
+                self.reply("250 stub")
+            elif cmd.startswith("MAIL"):
+                if counter.should_drop():
+                    return                  # connection closed under the client
+                rcpts = []
+                self.reply("250 OK")
+            elif cmd.startswith("RCPT"):
+                address = line.decode(errors="replace").split(":", 1)[1].strip().strip("<>")
+                if counter.refuses(address):
+                    self.reply("550 5.1.1 no such user")
+                    continue
+                rcpts.append(address)
+                self.reply("250 OK")
+            elif cmd == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                started = time.perf_counter()
+                while (body := self.rfile.readline()) and body not in (b".\r\n", b".\n"):
+                    pass
+                if counter.delay_ms:
+                    time.sleep(counter.delay_ms / 1000)
+                counter.accepted(rcpts, time.perf_counter() - started)
+                self.reply("250 OK queued")
+            elif cmd in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif cmd == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+class SMTPSink:
+    def __init__(self, delay_ms: float = 0, drop_every: int = 0, drops: int = 0, refuse=()):
+        self.counter = _SinkCounter(delay_ms, drop_every, drops, refuse)
+        self.stats = self.counter.stats
+        self.host, self.port = "127.0.0.1", _free_port()
+        if Controller is not None:
+            self._ctl = Controller(_AioHandler(self.counter), hostname=self.host, port=self.port)
+            self._ctl.start()
+            self._srv = None
+        else:
+            self._ctl = None
+            self._srv = socketserver.ThreadingTCPServer((self.host, self.port), _SMTPSession)
+            self._srv.daemon_threads = True
+            self._srv.counter = self.counter
+            threading.Thread(target=self._srv.serve_forever, daemon=True).start()
+        self.url = f"smtp://{self.host}:{self.port}"
+
+    @property
+    def messages(self) -> int:
+        return self.counter.messages
+
+    @property
+    def recipients(self) -> int:
+        return self.counter.recipients
+
+    @property
+    def delivered(self) -> collections.Counter:
+        return self.counter.delivered
+
+    def close(self):
+        if self._ctl is not None:
+            self._ctl.stop()
+        else:
+            self._srv.shutdown()
+            self._srv.server_close()
+
+
+# ── SOCKS5 (Tor's SocksPort) ─────────────────────────────────────────────
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("client went away")
+        data += chunk
+    return data
+
+
+class _SOCKS5Session(socketserver.BaseRequestHandler):
+    """RFC 1928 CONNECT with RFC 1929 username/password auth, nothing else."""
+
+    def handle(self):
+        proxy, conn = self.server.proxy, self.request
+        try:
+            _, n = _recv_exact(conn, 2)
+            if 2 not in _recv_exact(conn, n):
+                conn.sendall(b"\x05\xff")            # no acceptable method
+                return
+            conn.sendall(b"\x05\x02")
+            _, ulen = _recv_exact(conn, 2)
+            user = _recv_exact(conn, ulen).decode()
+            password = _recv_exact(conn, _recv_exact(conn, 1)[0]).decode()
+            if proxy.password is not None and password != proxy.password:
+                conn.sendall(b"\x01\x01")
+                return
+            conn.sendall(b"\x01\x00")
+
+            _, cmd, _, atyp = _recv_exact(conn, 4)
+            if atyp == 1:
+                host = socket.inet_ntoa(_recv_exact(conn, 4))
+            elif atyp == 3:
+                host = _recv_exact(conn, _recv_exact(conn, 1)[0]).decode()
+            else:
+                host = socket.inet_ntop(socket.AF_INET6, _recv_exact(conn, 16))
+            port = int.from_bytes(_recv_exact(conn, 2), "big")
+            if cmd != 1:
+                conn.sendall(b"\x05\x07\x00\x01" + bytes(6))
+                return
+            try:
+                upstream = socket.create_connection((host, port), timeout=10)
+            except OSError:
+                conn.sendall(b"\x05\x05\x00\x01" + bytes(6))
+                return
+        except ConnectionError:
+            return
+
+        proxy.connected(user, f"{host}:{port}")
+        conn.sendall(b"\x05\x00\x00\x01" + bytes(6))
+        with upstream:
+            while True:
+                ready, _, _ = select.select([conn, upstream], [], [], 30)
+                if not ready:
+                    return
+                for sock in ready:
+                    data = sock.recv(65536)
+                    if not data:
+                        return
+                    (upstream if sock is conn else conn).sendall(data)
+
+
+class SOCKS5Proxy:
+    """
+    Stand-in for Tor's SocksPort. Tor isolates streams by their SOCKS
+    credentials; this one relays every CONNECT and records its username, so
+    `.connections` counts streams per circuit. `password=None` takes any.
+    """
+
+    def __init__(self, password: Optional[str] = None):
+        self.password = password
+        self.connections: collections.Counter = collections.Counter()   # username → streams
+        self.targets: collections.Counter = collections.Counter()       # host:port → streams
+        self._lock = threading.Lock()
+        self.host, self.port = "127.0.0.1", _free_port()
+        self._srv = socketserver.ThreadingTCPServer((self.host, self.port), _SOCKS5Session)
+        self._srv.daemon_threads = True
+        self._srv.proxy = self
+        threading.Thread(target=self._srv.serve_forever, daemon=True).start()
+        self.url = f"socks5h://{self.host}:{self.port}"
+
+    def connected(self, username: str, target: str):
+        with self._lock:
+            self.connections[username] += 1
+            self.targets[target] += 1
+
+    def close(self):
+        self._srv.shutdown()
+        self._srv.server_close()
+
+
+if __name__ == "__main__":
+    servers = {"feeds": FeedServer(10, 20), "llm": LLMServer(), "youtube": YouTubeServer(10, 7),
+               "smtp": SMTPSink(), "socks": SOCKS5Proxy()}
+    for name, srv in servers.items():
+        print(f"{name:<8} {srv.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for srv in servers.values():
+            srv.close()
@@ -0,0 +1,119 @@
+"""
+Subscriber import, batch updates and recipient iteration at list scale.
+
+    python -m benchmarks.subscribers_bench [n_subscribers]     # default 100 000
+
+Works on a throwaway SQLite file: generates an n-row CSV, imports it with
+src.subscribers (fresh, then again as all-conflicts), deactivates and
+unsubscribes 10 % each, and pages through the recipients the mailer would
+send to. The one-`session.add`-per-row seed and the load-everything
+recipient query it replaced run alongside as the baseline. Peak memory is
+traced in a separate run of the recipient steps, so it doesn't skew timings.
+"""
+
+import csv
+import datetime
+import secrets
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from sqlalchemy import create_engine, or_, select
+from sqlalchemy.orm import Session
+
+from src import subscribers
+from src.models import Base, Subscriber
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - started
+
+
+def _peak_mb(fn) -> float:
+    """Peak Python allocations of a (read-only) step, in a separate traced run."""
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def legacy_seed(ssn, emails):
+    """init_db.seed_subscribers as it was: read every email, add row by row."""
+    known = {e.lower() for e in ssn.scalars(select(Subscriber.email))}
+    for email in emails:
+        if email.lower() in known:
+            continue
+        known.add(email.lower())
+        ssn.add(Subscriber(email=email, active=True, subscribed_at=datetime.datetime.utcnow(),
+                           token=secrets.token_hex(16)))
+    ssn.commit()
+
+
+def legacy_recipients(ssn, since):
+    return ssn.scalars(select(Subscriber.email)
+                       .where(Subscriber.active.is_(True))
+                       .where(or_(Subscriber.last_sent.is_(None), Subscriber.last_sent < since))
+                       .order_by(Subscriber.email)).all()
+
+
+def report(label, n, secs, peak_mb=None):
+    peak = f"{peak_mb:>9.1f} MB" if peak_mb is not None else f"{'-':>12}"
+    print(f"{label:<34}{n:>9}{secs:>9.2f}s{n / secs if secs else 0:>11.0f}/s{peak}")
+
+
+def main(n: int = 100_000):
+    tmp = Path(tempfile.mkdtemp(prefix="subs-bench-"))
+    src_csv = tmp / "subscribers.csv"
+    with src_csv.open("w", newline="") as fh:
+        w = csv.writer(fh)
+        w.writerow(["email", "name"])
+        for i in range(n):
+            w.writerow([f"Reader{i:07d}@Example.org", f"Reader {i}"])
+
+    url = f"sqlite:///{tmp / 'bench.db'}"
+    eng = create_engine(url)
+    Base.metadata.create_all(eng)
+    subscribers.ensure_indexes(eng)
+    since = datetime.datetime.combine(datetime.date.today(), datetime.time.min)
+    print(f"{'step':<34}{'rows':>9}{'time':>10}{'rate':>13}{'peak':>12}")
+
+    with Session(eng) as ssn:
+        counts, secs = _timed(lambda: subscribers.upsert(ssn, subscribers.iter_emails(src_csv)))
+        report("import (new)", counts["seen"], secs)
+        counts, secs = _timed(lambda: subscribers.upsert(ssn, subscribers.iter_emails(src_csv)))
+        report("re-import (all conflicts)", counts["seen"], secs)
+
+        tenth = [f"reader{i:07d}@example.org" for i in range(0, n, 10)]
+        changed, secs = _timed(lambda: subscribers.deactivate(ssn, tenth))
+        report("deactivate 10 % by email", changed, secs)
+        tokens = [t for (t,) in ssn.execute(select(Subscriber.token)
+                                            .where(Subscriber.active.is_(True))
+                                            .limit(n // 10))]
+        changed, secs = _timed(lambda: subscribers.unsubscribe(ssn, tokens))
+        report("unsubscribe 10 % by token", changed, secs)
+
+    pages = lambda: sum(len(p) for p in subscribers.iter_recipient_pages(since, url))
+    rows, secs = _timed(pages)
+    report("recipient pages", rows, secs, _peak_mb(pages))
+
+    # baseline
+    legacy_url = f"sqlite:///{tmp / 'legacy.db'}"
+    legacy_eng = create_engine(legacy_url)
+    Base.metadata.create_all(legacy_eng)
+    with Session(legacy_eng) as ssn:
+        emails = [r[0] for r in csv.reader(src_csv.open())][1:]
+        _, secs = _timed(lambda: legacy_seed(ssn, emails))
+        report("legacy seed (session.add per row)", n, secs)
+        _, secs = _timed(lambda: legacy_seed(ssn, emails))
+        report("legacy re-seed", n, secs)
+        rows, secs = _timed(lambda: legacy_recipients(ssn, since))
+        report("legacy load_recipients", len(rows), secs, _peak_mb(lambda: legacy_recipients(ssn, since)))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
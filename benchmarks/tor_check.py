@@ -0,0 +1,102 @@
+"""
+Circuit isolation check for src.youtube.tor_pool against a local SOCKS5Proxy.
+
+    python -m benchmarks.tor_check [--workers 4] [--requests 40]
+
+Tor puts streams with different SOCKS credentials on different circuits, so
+the proxy's per-username connection count stands in for "which circuit".
+Fetches a stub page through a CircuitPool from --workers threads at once,
+the way refresh_transcripts does, then rotates one worker and fetches again.
+It checks that
+
+* every worker reached the proxy with its own username (and the pool's
+  password), and each request went out under the circuit it was handed,
+* rotate() gave only that worker a new username: its old one gets no more
+  streams, every other worker keeps its own,
+* no control port is needed for any of it.
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import requests
+
+from benchmarks.stub_servers import FeedServer, SOCKS5Proxy
+from src.youtube.tor_pool import CircuitPool
+
+
+def _option(args, name, default):
+    return args[args.index(name) + 1] if name in args[:-1] else default
+
+
+def fetch_all(pool: CircuitPool, url: str, n: int) -> list:
+    """`n` GETs from pool.size threads; the (worker, username) each went out as."""
+    def work(_):
+        with pool.circuit() as c:
+            r = requests.get(url, proxies=c.proxies, timeout=10)
+            r.raise_for_status()
+            return c.worker, c.username
+
+    with ThreadPoolExecutor(max_workers=pool.size) as ex:
+        return list(ex.map(work, range(n)))
+
+
+def main(args):
+    workers = int(_option(args, "--workers", 4))
+    n = int(_option(args, "--requests", 40))
+    rotated = workers // 2
+
+    origin = FeedServer(1, 1, latency_ms=20)       # slow enough for the workers to overlap
+    proxy = SOCKS5Proxy(password="x")
+    pool = CircuitPool(size=workers, host=proxy.host, port=proxy.port, control_port=None)
+    url = f"{origin.url}/feed/0.xml"
+
+    started = time.perf_counter()
+    first = fetch_all(pool, url, n)
+    before = {w: c.username for w, c in enumerate(_circuits(pool))}
+    seen_first = dict(proxy.connections)
+
+    with ExitStack() as stack:                      # hold every circuit, rotate one
+        circuits = [stack.enter_context(pool.circuit()) for _ in range(workers)]
+        next(c for c in circuits if c.worker == rotated).rotate("check")
+    after = {w: c.username for w, c in enumerate(_circuits(pool))}
+
+    second = fetch_all(pool, url, n)
+    took = time.perf_counter() - started
+    seen = proxy.connections
+    proxy.close()
+    origin.close()
+
+    failures = {
+        "workers sharing a username": len(set(before.values())) != workers,
+        "proxy saw other usernames": set(seen_first) != set(before.values()),
+        "not every worker was used": {w for w, _ in first} != set(range(workers)),
+        "requests off their circuit": sum(seen_first.values()) != n
+                                      or any(u != before[w] for w, u in first),
+        "rotated worker kept its username": after[rotated] == before[rotated],
+        "other workers changed username": {w: u for w, u in after.items()
+                                           if w != rotated and u != before[w]},
+        "old username still used": seen[before[rotated]] != seen_first.get(before[rotated]),
+        "second round off its circuit": any(u != after[w] for w, u in second)
+                                        or sum(seen.values()) != 2 * n,
+        "pool rotations": pool.rotations != 1,
+    }
+    failures = {k: v for k, v in failures.items() if v}
+    for user, count in sorted(seen.items()):
+        print(f"  {user:<24} {count:>4} streams")
+    print(f"{workers} workers, {2 * n} requests, 1 rotation, {took:.1f}s: "
+          + ("ok" if not failures else f"FAILED {failures}"))
+    sys.exit(0 if not failures else 1)
+
+
+def _circuits(pool: CircuitPool) -> list:
+    """Every circuit of an idle pool, in worker order."""
+    with ExitStack() as stack:
+        return sorted((stack.enter_context(pool.circuit()) for _ in range(pool.size)),
+                      key=lambda c: c.worker)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
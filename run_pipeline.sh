@@ -10,20 +10,22 @@ cd "$(dirname "$0")"  # change to the script's directory (your project root)
 
 # ENV vars (or source from .env)
 
-# 1. Harvest articles
-python3 -m src.articles.run_harvest.py
-python3 -m src.articles.embed_articles
-python3 -m src.articles.rank
-python3 -m src.articles.summarise
-
-# 2. harvest YouTube videos
-python3 -m src.youtube.youtube_scraper
-python3 -m src.youtube.embed_videos
-python3 -m src.youtube.youtube_rank
-python3 -m src.youtube.youtube_summarise
-
-# 3. Build and send newsletter
-python3 -m src.render_newsletter
-python3 -m src.smtp_mailer
-
-python3 -m src.housekeeping
\ No newline at end of file
+python3 -m src.init_db
+
+# every stage checks stage_runs first: a re-run skips what this edition
+# already finished and resumes the rest (src.pipeline)
+
+# 1. Harvest articles and YouTube videos
+python3 -m src.pipeline harvest harvest_videos
+
+# 2. Embed + rank articles and YouTube
+python3 -m src.pipeline embed_articles rank_articles embed_videos rank_videos
+
+# 3. Pick today's lineup once, summarise exactly that
+python3 -m src.pipeline lineup summarise_articles summarise_videos
+
+# 4. Render, send & archive
+python3 -m src.pipeline render send archive
+
+# 5. House-keeping (only once send is done)
+python3 -m src.pipeline housekeeping
@@ -0,0 +1,272 @@
+"""
+Searchable archive of every edition that went out.
+
+housekeeping retires and then deletes harvested rows after a month, so
+after each send this stage copies the edition's lineup (as rendered: items
+with a summary) into `archive_items` — title, summary, url, source and the
+item's vector — which retention never touches. Two indexes sit on it:
+
+* `archive_fts`, an FTS5 index over title / summary / source (porter
+  stemming), kept in step by triggers, so archiving an edition indexes
+  exactly its new rows,
+* an int8 src.vector_store matrix of the vectors (vectors/archive.*),
+  derived from the table and re-synced when the archive has grown, so a
+  semantic query is one memory-mapped matrix product — milliseconds for
+  years of editions.
+
+    python -m src.archive                     # archive today's edition
+    python -m src.archive --backfill          # every lineup not archived yet
+    python -m src.archive search "mistral funding" [--kind articles] [--since 2026-01-01] [--raw]
+    python -m src.archive similar "open-weight reasoning models"
+    python -m src.archive rebuild             # re-create the FTS index and vector matrix
+"""
+
+import datetime
+import re
+import sys
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import create_engine, literal_column, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from src import lineup
+from src.models import ArchiveItem, LineupItem
+from src.vector_store import VECTOR_DIR, VectorStore, decode_blobs
+
+DB_URL = "sqlite:///newsletter.db"
+SNIPPET_TOKENS = 12
+FTS_WEIGHTS = (5.0, 1.0, 2.0)       # bm25 weight of title, summary, source
+
+# external-content FTS5: the text lives once, in archive_items
+SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS archive_fts USING fts5("
+    "title, summary, source, content='archive_items', content_rowid='rowid', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS archive_fts_ai AFTER INSERT ON archive_items BEGIN "
+    "INSERT INTO archive_fts(rowid, title, summary, source) "
+    "VALUES (new.rowid, new.title, new.summary, new.source); END",
+    "CREATE TRIGGER IF NOT EXISTS archive_fts_ad AFTER DELETE ON archive_items BEGIN "
+    "INSERT INTO archive_fts(archive_fts, rowid, title, summary, source) "
+    "VALUES ('delete', old.rowid, old.title, old.summary, old.source); END",
+    "CREATE TRIGGER IF NOT EXISTS archive_fts_au AFTER UPDATE ON archive_items BEGIN "
+    "INSERT INTO archive_fts(archive_fts, rowid, title, summary, source) "
+    "VALUES ('delete', old.rowid, old.title, old.summary, old.source); "
+    "INSERT INTO archive_fts(rowid, title, summary, source) "
+    "VALUES (new.rowid, new.title, new.summary, new.source); END",
+)
+
+
+def ensure_schema(engine):
+    """The FTS table and its triggers (archive_items itself comes from create_all)."""
+    ArchiveItem.__table__.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        for stmt in SCHEMA:
+            conn.execute(text(stmt))
+
+
+# ── indexing ─────────────────────────────────────────────────────────────
+def archive(edition: datetime.date = None, db_url: str = DB_URL) -> int:
+    """Copy `edition`'s rendered lineup into the archive; returns rows written."""
+    edition = edition or lineup.today()
+    engine = create_engine(db_url)
+    ensure_schema(engine)
+    now = datetime.datetime.utcnow()
+    with Session(engine) as ssn:
+        ids = lineup.load_ids(ssn, edition)
+        values = []
+        for kind, item_ids in ids.items():
+            model, id_col, src_col = lineup.SECTIONS[kind][:3]
+            by_id = {getattr(r, id_col.key): r
+                     for r in ssn.scalars(select(model).where(id_col.in_(item_ids)))}
+            for pos, item_id in enumerate(item_ids):
+                r = by_id.get(item_id)
+                if r is None or not r.summary:      # not in the sent edition
+                    continue
+                values.append({"kind": kind, "item_id": item_id, "edition": edition,
+                               "position": pos, "source": getattr(r, src_col.key),
+                               "title": r.title, "summary": r.summary, "url": r.url,
+                               "published_at": r.published_at,
+                               "vector": r.vector, "archived_at": now})
+        if values:
+            ins = insert(ArchiveItem)
+            # a re-run (e.g. after re-summarising) refreshes the row; the
+            # update trigger re-indexes it
+            ssn.execute(ins.on_conflict_do_update(
+                index_elements=["kind", "item_id"],
+                set_={c: ins.excluded[c] for c in ("edition", "position", "source", "title",
+                                                   "summary", "url", "vector", "archived_at")}),
+                values)
+        ssn.commit()
+    print(f"🗄️ archived {len(values)} items of the {edition} edition")
+    return len(values)
+
+
+def backfill(db_url: str = DB_URL) -> int:
+    """Archive every edition still in lineup_items that the archive lacks."""
+    engine = create_engine(db_url)
+    ensure_schema(engine)
+    with Session(engine) as ssn:
+        editions = ssn.scalars(
+            select(LineupItem.edition).distinct()
+            .where(LineupItem.edition.not_in(select(ArchiveItem.edition).distinct()))
+            .order_by(LineupItem.edition)).all()
+    return sum(archive(e, db_url) for e in editions)
+
+
+def rebuild(db_url: str = DB_URL):
+    engine = create_engine(db_url)
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO archive_fts(archive_fts) VALUES ('rebuild')"))
+        conn.execute(text("INSERT INTO archive_fts(archive_fts) VALUES ('optimize')"))
+    (VECTOR_DIR / "archive.synced").unlink(missing_ok=True)
+    with Session(engine) as ssn:
+        vectors(ssn)
+
+
+# ── search ───────────────────────────────────────────────────────────────
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(q: str) -> str:
+    """Plain words → an FTS5 query matching all of them (no syntax errors)."""
+    return " ".join(f'"{w}"' for w in _WORD_RE.findall(q))
+
+
+def _filters(kind: Optional[str], since: Optional[datetime.date]):
+    where, params = [], {}
+    if kind:
+        where.append("a.kind = :kind")
+        params["kind"] = kind
+    if since:
+        where.append("a.edition >= :since")
+        params["since"] = since.isoformat()
+    return "".join(f" AND {w}" for w in where), params
+
+
+_COLUMNS = "a.kind, a.item_id, a.edition, a.title, a.url, a.source"
+
+
+def _hit(row, score: float, snippet: str = None) -> dict:
+    kind, item_id, edition, title, url, source = row[:6]
+    return {"kind": kind, "item_id": item_id, "edition": edition, "title": title,
+            "url": url, "source": source, "score": score, "snippet": snippet}
+
+
+def search(ssn, query: str, kind: str = None, since: datetime.date = None,
+           limit: int = 10, raw: bool = False) -> List[dict]:
+    """Keyword search, best bm25 first; `raw` passes FTS5 syntax through."""
+    match = query if raw else fts_query(query)
+    if not match:
+        return []
+    extra, params = _filters(kind, since)
+    w_title, w_summary, w_source = FTS_WEIGHTS
+    rows = ssn.execute(text(
+        f"SELECT {_COLUMNS}, "
+        f"snippet(archive_fts, 1, '[', ']', '…', {SNIPPET_TOKENS}), "
+        f"bm25(archive_fts, {w_title}, {w_summary}, {w_source}) AS rank "
+        "FROM archive_fts JOIN archive_items a ON a.rowid = archive_fts.rowid "
+        f"WHERE archive_fts MATCH :match{extra} ORDER BY rank LIMIT :limit"),
+        {"match": match, "limit": limit, **params}).all()
+    return [_hit(r, -r[7], r[6]) for r in rows]
+
+
+def vectors(ssn) -> VectorStore:
+    """
+    The archive's vectors as an int8 memory-mapped matrix keyed by rowid
+    (vectors/archive.*), re-synced whenever the archive has grown or an item
+    was archived again (its vector replaced in place) since.
+    """
+    store = VectorStore("archive", dtype="int8").load()
+    # count(*) runs on the edition index; a re-archive keeps the rowid but bumps archived_at
+    state = "{},{},{}".format(*ssn.execute(text(
+        "SELECT count(*), max(rowid), max(archived_at) FROM archive_items")).one())
+    mark = store.root / "archive.synced"
+    if not mark.exists() or mark.read_text() != state:
+        store.sync_from_db(ssn, ArchiveItem, literal_column("archive_items.rowid"))
+        mark.write_text(state)
+    return store
+
+
+def similar_to(ssn, vector: np.ndarray, kind: str = None, since: datetime.date = None,
+               limit: int = 10) -> List[dict]:
+    """Archived items closest to a normalised query vector (cosine)."""
+    store = vectors(ssn)
+    if not len(store):
+        return []
+    sims = store.similarities(vector)[:, 0]
+    extra, params = _filters(kind, since)
+    if extra:
+        allowed = [r for (r,) in ssn.execute(text(
+            f"SELECT a.rowid FROM archive_items a WHERE a.vector IS NOT NULL{extra}"), params)]
+        keep = np.zeros(len(sims), dtype=bool)
+        keep[[store.index[r] for r in allowed if r in store.index]] = True
+        sims[~keep] = -np.inf
+    k = min(limit, len(sims))
+    top = np.argpartition(-sims, k - 1)[:k]
+    top = [i for i in top[np.argsort(-sims[top])] if np.isfinite(sims[i])]
+    if not top:
+        return []
+    score = {store.ids[i]: float(sims[i]) for i in top}
+    details = {r[6]: r for r in ssn.execute(text(
+        f"SELECT {_COLUMNS}, a.rowid FROM archive_items a "
+        f"WHERE a.rowid IN ({','.join(map(str, score))})"))}
+    return [_hit(details[rid], s) for rid, s in score.items() if rid in details]
+
+
+def similar(ssn, query: str, **kw) -> List[dict]:
+    """Semantic search with the scoring model's embedding of `query`."""
+    from src.articles.scoring import MODEL
+
+    vec = MODEL.encode([query], normalize_embeddings=True)[0]
+    return similar_to(ssn, vec, **kw)
+
+
+def related(ssn, kind: str, item_id: str, limit: int = 10, **kw) -> List[dict]:
+    """Past coverage closest to a (live or archived) item's own vector."""
+    model, id_col = lineup.SECTIONS[kind][:2]
+    blob = (ssn.scalar(select(model.vector).where(id_col == item_id))
+            or ssn.scalar(select(ArchiveItem.vector)
+                          .where(ArchiveItem.kind == kind, ArchiveItem.item_id == item_id)))
+    if not blob:
+        return []
+    vec = decode_blobs([blob])[0]
+    hits = similar_to(ssn, vec, limit=limit + 1, **kw)
+    return [h for h in hits if h["item_id"] != item_id][:limit]
+
+
+def _print(hits: List[dict]):
+    for h in hits:
+        print(f"{h['score']:7.3f}  {h['edition']}  {h['kind'][:1]}  {h['title']}  ({h['source']})")
+        if h["snippet"]:
+            print(f"         {h['snippet']}")
+        print(f"         {h['url']}")
+
+
+def _option(args, name, default=None):
+    return args[args.index(name) + 1] if name in args[:-1] else default
+
+
+if __name__ == "__main__":
+    cmd, *args = sys.argv[1:] or ["archive"]
+    if cmd == "--backfill":
+        print(f"🗄️ backfilled {backfill()} items")
+    elif cmd == "rebuild":
+        rebuild()
+        print("🗄️ archive_fts rebuilt")
+    elif cmd in ("search", "similar") and args:
+        since = _option(args, "--since")
+        opts = {"kind": _option(args, "--kind"),
+                "since": datetime.date.fromisoformat(since) if since else None,
+                "limit": int(_option(args, "--limit", 10))}
+        with Session(create_engine(DB_URL)) as ssn:
+            if cmd == "search":
+                _print(search(ssn, args[0], raw="--raw" in args, **opts))
+            else:
+                _print(similar(ssn, args[0], **opts))
+    elif cmd == "archive":
+        archive()
+    else:
+        print(__doc__)
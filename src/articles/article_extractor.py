@@ -1,13 +1,46 @@
 # src/article_extractor.py
 
+import datetime
 import trafilatura
+import lxml.html
 from urllib.parse import urlparse
+from src.models import ExtractionTier
 
-def extract_text(html: str, url: str) -> str:
+# cheapest first; a domain starts at the tier it last succeeded with
+TIERS          = ("lxml", "trafilatura", "selenium")
+MIN_CHARS      = 200     # below this an extraction counts as failed
+LXML_MIN_CHARS = 600     # the fast path must clearly have found the article body
+PROBE_EVERY    = 25      # after this many wins, try one tier cheaper again
+
+_BOILERPLATE = ("script", "style", "noscript", "nav", "header", "footer", "aside", "form")
+
+
+def extract_lxml(html: str) -> str:
     """
-    Given raw HTML and its URL, return the cleaned article text.
-    Falls back to a simple BeautifulSoup extract if Trfilatura fails.
+    Fast path: paragraphs under <article>/<main> (or the articleBody itemprop).
+    Returns "" when the page has no obvious article container, so we never
+    pass off cookie banners or link lists as article text.
     """
+    try:
+        doc = lxml.html.fromstring(html)
+    except Exception:
+        return ""
+    for el in doc.iter(*_BOILERPLATE):
+        el.drop_tree()
+
+    containers = (doc.xpath('//*[@itemprop="articleBody"]')
+                  or doc.xpath("//article")
+                  or doc.xpath("//main"))
+    if not containers:
+        return ""
+    root = max(containers, key=lambda c: len(c.text_content()))
+    paragraphs = [p.text_content().strip() for p in root.iter("p")]
+    paragraphs = [p for p in paragraphs if len(p) > 40]
+    text = "\n\n".join(paragraphs).strip()
+    return text if len(paragraphs) >= 3 and len(text) >= LXML_MIN_CHARS else ""
+
+
+def extract_trafilatura(html: str, url: str) -> str:
     downloaded = trafilatura.extract(
         html,
         url=url,
@@ -15,10 +48,105 @@ def extract_text(html: str, url: str) -> str:
         include_tables=False,
         favor_precision=True
     )
-    if downloaded and len(downloaded) > 100:
-        return downloaded.strip()
+    return downloaded.strip() if downloaded else ""
+
+
+def extract_text(html: str, url: str) -> str:
+    """
+    Given raw HTML and its URL, return the cleaned article text.
+    Falls back to plain <p> text if Trafilatura fails.
+    """
+    downloaded = extract_trafilatura(html, url)
+    if len(downloaded) > 100:
+        return downloaded
+
+    try:
+        doc = lxml.html.fromstring(html)
+    except Exception:
+        return ""
+    paragraphs = [p.text_content().strip() for p in doc.iter("p")]
+    return "\n\n".join(p for p in paragraphs if p).strip()
+
+
+def _domain(url: str) -> str:
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _start_tier(row) -> int:
+    if row is None or row.tier not in TIERS:
+        return 0
+    start = TIERS.index(row.tier)
+    # every so often check whether a cheaper tier works for this domain now
+    if start > 0 and row.successes and row.successes % PROBE_EVERY == 0:
+        return start - 1
+    return start
+
+
+def extract_cheap(html: str, url: str, start: int = 0):
+    """
+    Run the non-JS tiers from `start` on. Pure (no DB, no network), so the
+    async harvester can run it in a process pool.
+    Returns (best text, tier that succeeded or None).
+    """
+    text = ""
+    for tier in TIERS[start:TIERS.index("selenium")]:
+        candidate = extract_lxml(html) if tier == "lxml" else extract_text(html, url)
+        if len(candidate) > len(text):
+            text = candidate
+        if len(candidate) >= MIN_CHARS:
+            return text, tier
+    return text, None
+
+
+def extract_with_tiers(url: str, db, download, render_js):
+    """
+    Run the extraction tiers for `url`, starting from the one this domain last
+    needed, and remember which tier produced the text.
+
+    `download(url)` and `render_js(url)` return HTML (render_js may return None).
+    Returns (text, html, tier); text is the best we got even if every tier failed.
+    """
+    domain = _domain(url)
+    row = db.get(ExtractionTier, domain)
+    start = _start_tier(row)
+
+    html, text = None, ""
+    if start < TIERS.index("selenium"):
+        html = download(url)
+        text, tier = extract_cheap(html, url, start)
+        if tier:
+            _remember(db, row, domain, tier)
+            return text, html, tier
+
+    print(f"⚠️ Cheap extraction too short ({len(text)}) for {url}, trying Selenium...")
+    js_html = render_js(url)
+    if js_html:
+        html = js_html
+        candidate = extract_text(html, url)
+        if len(candidate) > len(text):
+            text = candidate
+        if len(candidate) >= MIN_CHARS:
+            _remember(db, row, domain, "selenium")
+            return text, html, "selenium"
+    else:
+        print(f"❌ Selenium fetch failed for {url}, sticking to whatever was there before")
+
+    _remember(db, row, domain, None)
+    if html is None:
+        html = download(url)
+    return text, html, None
+
 
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(html, "html.parser")
-    paragraphs = [p.get_text(strip=True) for p in soup.find_all("p")]
-    return "\n\n".join(paragraphs).strip()
+def _remember(db, row, domain: str, tier):
+    if row is None:
+        row = ExtractionTier(domain=domain, successes=0, failures=0)
+        db.add(row)
+    if tier is None:
+        row.failures = (row.failures or 0) + 1
+    elif row.tier != tier:
+        print(f"📌 {domain}: extraction tier {row.tier or '-'} → {tier}")
+        row.tier, row.successes = tier, 1
+    else:
+        row.successes = (row.successes or 0) + 1
+    row.updated_at = datetime.datetime.utcnow()
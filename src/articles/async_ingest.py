@@ -0,0 +1,347 @@
+"""
+Asyncio harvest path: feed → page → text → Article row, overlapped across sources.
+
+    HARVEST_ASYNC=1 python -m src.articles.run_harvest
+    python -m src.articles.async_ingest
+
+Same scheduler plan, tier memory and Article rows as `fetch_rss`, but:
+
+* feeds and pages come through one httpx.AsyncClient (page bodies capped at
+  MAX_PAGE_BYTES like download_page),
+* Google News links are resolved with async Playwright (one browser per run),
+* feed parsing and the lxml/trafilatura tiers run in a process pool, so CPU
+  work doesn't stall the event loop; Selenium stays a blocking call in a
+  thread, limited to SELENIUM_CONCURRENCY at once,
+* with PRESCORE_TOP every due feed is read first and only the run's best
+  entries are fetched (see prescore),
+* all DB writes — articles, tier memory, scheduler stats — go through one
+  DbWriter task, so SQLite only ever sees a single writer.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import feedparser
+import httpx
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from src.models import Article, ExtractionTier
+from src.articles import page_cache, prescore, scheduler, seen
+from src.articles.article_extractor import (TIERS, MIN_CHARS, extract_cheap, extract_text,
+                                            _domain, _remember, _start_tier)
+from src.articles.registry import load_sources, rss_sites
+from src.articles.rss_scraper import (COMMIT_EVERY, MAX_PAGE_BYTES, UA, entry_image,
+                                      image_from_html, select_entries)
+from src.articles.rss_scraper_utils import AsyncGoogleNewsResolver, fetch_with_selenium_stealth
+
+SOURCE_CONCURRENCY   = 8     # feeds in flight
+ENTRY_CONCURRENCY    = 4     # pages in flight per feed
+PAGE_CONCURRENCY     = 16    # pages in flight overall
+SELENIUM_CONCURRENCY = 2
+HTTP_TIMEOUT_S       = 10
+SELENIUM             = TIERS.index("selenium")
+
+
+# ── process-pool work (top level so it pickles) ──────────────────────────
+def parse_feed(content: bytes):
+    return feedparser.parse(content).entries
+
+def extract_page(html: str, url: str, start: int):
+    text, tier = extract_cheap(html, url, start)
+    return text, tier, image_from_html(html)
+
+def extract_rendered(html: str, url: str):
+    return extract_text(html, url), image_from_html(html)
+
+
+# ── network ──────────────────────────────────────────────────────────────
+async def download(client: httpx.AsyncClient, url: str, max_bytes: int = MAX_PAGE_BYTES) -> str:
+    """Async download_page: stop reading after `max_bytes` of body."""
+    async with client.stream("GET", url) as r:
+        buf = bytearray()
+        async for block in r.aiter_bytes(64 * 1024):
+            buf += block
+            if len(buf) >= max_bytes:
+                print(f"✂️ page capped at {max_bytes // 1000} kB: {url}")
+                break
+        return bytes(buf[:max_bytes]).decode(r.encoding or "utf-8", errors="replace")
+
+
+# ── the single writer ────────────────────────────────────────────────────
+class DbWriter:
+    """Owns the session; every write is an op on its queue, applied in order."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    def add_article(self, art: Article):
+        self.queue.put_nowait(("article", art))
+
+    def tier(self, domain: str, tier):
+        self.queue.put_nowait(("tier", domain, tier))
+
+    def record(self, name: str, run: dict):
+        self.queue.put_nowait(("record", name, run))
+
+    def mark_seen(self, entry, source: dict):
+        self.queue.put_nowait(("seen", seen.mark_rows(entry, source)))
+
+    async def close(self):
+        self.queue.put_nowait(None)
+        await self.task
+
+    async def _run(self):
+        db, pending = self.db, 0
+        while (op := await self.queue.get()) is not None:
+            kind, *args = op
+            try:
+                if kind == "article":
+                    db.add(args[0])
+                    pending += 1
+                elif kind == "tier":
+                    domain, tier = args
+                    _remember(db, db.get(ExtractionTier, domain), domain, tier)
+                    pending += 1
+                elif kind == "seen":
+                    for row in args[0]:
+                        db.merge(row)
+                elif kind == "record":
+                    db.commit()
+                    scheduler.record(db, *args)      # commits
+                    pending = 0
+                if pending >= COMMIT_EVERY:
+                    db.commit()
+                    db.expunge_all()
+                    pending = 0
+            except Exception as e:
+                print(f"❌ DB write failed ({kind}): {e}")
+                db.rollback()
+                pending = 0
+        db.commit()
+
+
+# ── per-run context ──────────────────────────────────────────────────────
+class Harvest:
+    def __init__(self, db: Session, client, resolver, pool, writer):
+        self.db, self.client, self.resolver, self.pool, self.writer = db, client, resolver, pool, writer
+        self.pages    = asyncio.Semaphore(PAGE_CONCURRENCY)
+        self.selenium = asyncio.Semaphore(SELENIUM_CONCURRENCY)
+        # read once up front; afterwards only the writer writes (seen-key lookups
+        # are plain reads on the same session)
+        self.known = set(db.scalars(select(Article.id)))
+        self.tiers = {r.domain: SimpleNamespace(tier=r.tier, successes=r.successes or 0)
+                      for r in db.query(ExtractionTier)}
+
+    def in_pool(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    def remember(self, domain: str, tier):
+        """Mirror _remember on the in-memory view, and queue the real write."""
+        if tier is not None:
+            view = self.tiers.get(domain)
+            if view is None or view.tier != tier:
+                self.tiers[domain] = SimpleNamespace(tier=tier, successes=1)
+            else:
+                view.successes += 1
+        self.writer.tier(domain, tier)
+
+    async def fetch(self, url: str) -> str:
+        async with self.pages:
+            return await download(self.client, url)
+
+
+async def ingest_entry(h: Harvest, source: dict, entry, published, stats: dict):
+    """Async iter_articles for one entry: returns an Article or None."""
+    stats["processed"] += 1
+    url = await h.resolver.resolve(getattr(entry, "link", None))
+    if not url:
+        print(f"❌ No link found for entry in {source['name']}, skipping")
+        return None
+
+    aid = hashlib.sha256(url.encode()).hexdigest()
+    if aid in h.known:
+        return None
+    h.known.add(aid)
+
+    domain = _domain(url)
+    start = _start_tier(h.tiers.get(domain))
+    html, text, tier, img = None, "", None, None
+    if start < SELENIUM:
+        html = await h.fetch(url)
+        text, tier, img = await h.in_pool(extract_page, html, url, start)
+
+    if tier is None:
+        print(f"⚠️ Cheap extraction too short ({len(text)}) for {url}, trying Selenium...")
+        async with h.selenium:
+            js_html = await asyncio.to_thread(fetch_with_selenium_stealth, url)
+        if js_html:
+            html = js_html
+            candidate, img = await h.in_pool(extract_rendered, js_html, url)
+            if len(candidate) > len(text):
+                text = candidate
+            if len(candidate) >= MIN_CHARS:
+                tier = "selenium"
+                stats["selenium"] += 1
+        else:
+            print(f"❌ Selenium fetch failed for {url}, sticking to whatever was there before")
+            if html is None:
+                html = await h.fetch(url)
+                _, _, img = await h.in_pool(extract_page, html, url, SELENIUM)
+    h.remember(domain, tier)
+    await asyncio.to_thread(page_cache.store, url, html)
+
+    description = getattr(entry, "description", None)
+    if description and len(text) < len(description):
+        text = description
+
+    return Article(
+        id=aid,
+        source_name=source["name"],
+        url=url,
+        title=entry.title,
+        published_at=published,
+        text=text,
+        fetched_at=datetime.datetime.utcnow(),
+        image_url=entry_image(entry) or img,
+    )
+
+
+async def read_feed(h: Harvest, source: dict, horizon: int, limit: int, stats: dict):
+    """Async iter_feed_entries: the feed's in-window, unseen (entry, published) pairs."""
+    print(f"Fetching RSS feed for {source['name']} from {source['feed_url']}")
+    r = await h.client.get(source["feed_url"])
+    r.raise_for_status()
+    entries = await h.in_pool(parse_feed, r.content)
+    is_seen = seen.seen_filter(h.db, entries, source)
+    return list(select_entries(entries, source, horizon, limit, stats, is_seen))
+
+
+async def ingest_selected(h: Harvest, source: dict, selected, stats: dict):
+    """Ingest one feed's selected entries concurrently."""
+    entry_slots = asyncio.Semaphore(ENTRY_CONCURRENCY)
+
+    async def one(entry, published):
+        async with entry_slots:
+            try:
+                art = await ingest_entry(h, source, entry, published, stats)
+            except Exception as e:
+                print(f"❌ {source['name']}: {getattr(entry, 'link', '?')} – {e}")
+                return
+        h.writer.mark_seen(entry, source)
+        if art is not None:
+            h.writer.add_article(art)
+            stats["new"] += 1
+
+    await asyncio.gather(*(one(e, p) for e, p in selected))
+
+
+async def harvest_source(h: Harvest, source: dict, horizon: int, limit: int):
+    """Async fetch_rss: one feed, its entries concurrently, stats to the writer."""
+    started = time.monotonic()
+    stats = {"processed": 0, "new": 0, "selenium": 0}
+    try:
+        selected = await read_feed(h, source, horizon, limit, stats)
+        await ingest_selected(h, source, selected, stats)
+    except Exception as e:
+        print(f"Error on {source['name']}: {e}")
+        h.writer.record(source["name"], {"failed": True})
+        return
+    stats["seconds"] = time.monotonic() - started
+    h.writer.record(source["name"], stats)
+
+
+async def harvest_prescored(h: Harvest, plan, source_slots: asyncio.Semaphore, started: float,
+                            budget_s: float):
+    """PRESCORE_TOP harvest: read every due feed, then ingest only the global best entries."""
+    async def read(src, horizon, limit):
+        stats = {"processed": 0, "new": 0, "selenium": 0}
+        async with source_slots:
+            try:
+                return src, stats, await read_feed(h, src, horizon, limit, stats)
+            except Exception as e:
+                print(f"Error on {src['name']}: {e}")
+                h.writer.record(src["name"], {"failed": True})
+                return None
+
+    feeds = [f for f in await asyncio.gather(*(read(*item) for item in plan)) if f]
+    kept = prescore.select_global([(src, e, p) for src, _, sel in feeds for e, p in sel])
+
+    async def ingest(src, stats, selected):
+        async with source_slots:
+            if time.monotonic() - started > budget_s:
+                print(f"⏱️ run budget spent, leaving {src['name']} for next run")
+                h.writer.record(src["name"], {"deferred": True})
+                return
+            if selected and not kept.get(src["name"]):
+                # every entry was cut: leave last_polled_at so they are read again
+                print(f"✂️ {src['name']}: all {len(selected)} entries cut by pre-score")
+                h.writer.record(src["name"], {"deferred": True})
+                return
+            t0 = time.monotonic()
+            try:
+                await ingest_selected(h, src, kept.get(src["name"], []), stats)
+            except Exception as e:
+                print(f"Error on {src['name']}: {e}")
+                h.writer.record(src["name"], {"failed": True})
+                return
+            stats["seconds"] = time.monotonic() - t0
+            h.writer.record(src["name"], stats)
+
+    await asyncio.gather(*(ingest(*f) for f in feeds))
+
+
+async def harvest(poll_all: bool = False, db_url: str = "sqlite:///newsletter.db"):
+    engine = create_engine(db_url)
+    db = Session(engine)
+    sources = load_sources("sources_and_keywords/sources.yaml")
+    plan = scheduler.plan(db, rss_sites(sources), poll_all=poll_all)
+
+    started = time.monotonic()
+    budget_s = scheduler.run_budget(poll_all)
+    source_slots = asyncio.Semaphore(SOURCE_CONCURRENCY)
+    ctx = multiprocessing.get_context("spawn")
+
+    async def run(h, src, horizon, limit):
+        async with source_slots:
+            if time.monotonic() - started > budget_s:
+                print(f"⏱️ run budget spent, leaving {src['name']} for next run")
+                h.writer.record(src["name"], {"deferred": True})
+                return
+            print(f"Fetching RSS feed from {src['name']} … (last {horizon}h, ≤{limit} entries)")
+            await harvest_source(h, src, horizon, limit)
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=ctx) as pool:
+        async with httpx.AsyncClient(headers=UA, timeout=HTTP_TIMEOUT_S,
+                                     follow_redirects=True) as client, \
+                   AsyncGoogleNewsResolver() as resolver:
+            writer = DbWriter(db)
+            h = Harvest(db, client, resolver, pool, writer)
+            writer.start()
+            if prescore.PRESCORE_TOP:
+                await harvest_prescored(h, plan, source_slots, started, budget_s)
+            else:
+                await asyncio.gather(*(run(h, *item) for item in plan))
+            await writer.close()
+    db.close()
+    print("Harvest complete")
+
+
+def main(poll_all: bool = None):
+    asyncio.run(harvest(scheduler.harvest_all() if poll_all is None else poll_all))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,44 @@
 import numpy as np, sqlalchemy as sa
 from sqlalchemy.orm import Session
 from sentence_transformers import SentenceTransformer
+from src.chunking import chunk_for, encode_chunks
 from src.models import Article
+from src.streaming import iter_batches
+from src.vector_store import KEEP_CHUNKS, VectorStore
 
 EMB_MODEL      = "sentence-transformers/all-MiniLM-L6-v2"
-MAX_WORDS_CHUNK= 750           # ≈512 tokens
-MAX_CHUNKS     = 7             # first 5 chunks (~3750 words)
+MAX_CHUNKS     = 7             # 254-token chunks (~190 words each): the mean covers ~1.3k words
+MAX_STORED_CHUNKS = 16         # chunk_vectors (SEMANTIC_MODE=max/topk) keep more of long pieces
 
 model = SentenceTransformer(EMB_MODEL)
 
-def chunk_article(text):
-    words = text.split()
-    for i in range(0, len(words), MAX_WORDS_CHUNK):
-        yield " ".join(words[i : i + MAX_WORDS_CHUNK])
-
 def main(batch_size=32):
     eng = sa.create_engine("sqlite:///newsletter.db")
+    done = 0
     with Session(eng) as ssn:
         pending = (
             ssn.query(Article)
+               .filter(Article.retired_at.is_(None))
                .filter(Article.vector.is_(None))
                .filter(Article.text.isnot(None))
-               .all()
         )
-        for i in range(0, len(pending), batch_size):
-            batch = pending[i:i+batch_size]
-            # encode each article separately (variable chunk counts)
-            for art in batch:
-                chunks = list(chunk_article(art.text))[:MAX_CHUNKS]
-                emb_mb = (model.encode(chunks, normalize_embeddings=True)
-                               .mean(axis=0)
-                               .astype(np.float32)
-                               .tobytes())
-                art.vector = emb_mb
+        # one page of articles in memory at a time, committed as we go
+        for batch in iter_batches(pending, Article.id, batch_size):
+            # tokenize only as far as the chunks we keep, encode the page in one go
+            limit = MAX_STORED_CHUNKS if KEEP_CHUNKS else MAX_CHUNKS
+            chunks = [chunk_for(model, art.text, limit) or [[]] for art in batch]
+            vecs = encode_chunks(model, [c for sub in chunks for c in sub])
+            idx = 0
+            for art, chunk_list in zip(batch, chunks):
+                k = len(chunk_list)
+                art.vector = vecs[idx : idx + min(k, MAX_CHUNKS)].mean(axis=0).astype(np.float32).tobytes()
+                art.chunk_vectors = vecs[idx : idx + k].tobytes() if KEEP_CHUNKS else None
+                idx += k
             ssn.commit()
-    print(f"✅ embedded {len(pending)} articles")
+            ssn.expunge_all()
+            done += len(batch)
+        VectorStore("articles").sync_from_db(ssn, Article, "id")
+    print(f"✅ embedded {done} articles")
 
 if __name__ == "__main__":
     main()
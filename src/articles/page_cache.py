@@ -0,0 +1,159 @@
+"""
+zstd-compressed cache of the raw HTML behind every stored article.
+
+Pages are written during harvest, keyed by sha256(url) — the same value as
+Article.id — under the day they were fetched:
+
+    .cache/pages/2025-06-01/<sha256(url)>.html.zst
+
+so re-running the extractor never needs the network:
+
+    python -m src.articles.page_cache reextract [days] [--dry-run]
+    python -m src.articles.page_cache stats
+
+`reextract` runs `extract_text` over the newest cached copy of each live
+(not yet retired) article on every core and updates Article.text in bulk,
+refilling it where housekeeping already dropped it; rows whose text changed
+get their vector / chunk_vectors / score cleared so the next embed + rank
+pass picks them up. Retired rows are left alone: nothing re-embeds or
+re-ranks them. Housekeeping prunes day directories older than the payload
+retention (payload_days).
+
+zstandard is optional: without it nothing is cached and `reextract` says so.
+
+The cache is not in newsletter.db. The GitHub workflows carry it between
+runs with actions/cache and GitLab CI with its job cache; a Cloud Build run
+starts without it, so there `reextract` only covers that build's pages.
+"""
+
+import datetime
+import hashlib
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import zstandard
+except ModuleNotFoundError:          # cache off; harvest carries on as before
+    zstandard = None
+
+CACHE_DIR  = Path(os.getenv("PAGE_CACHE_DIR", ".cache/pages"))
+ZSTD_LEVEL = 10
+UPDATE_BATCH = 500
+
+
+def page_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def store(url: str, html: Optional[str], fetched: datetime.date = None,
+          root: Path = CACHE_DIR) -> Optional[Path]:
+    """Compress and write one page; a no-op without zstandard or HTML."""
+    if zstandard is None or not html:
+        return None
+    day = (fetched or datetime.date.today()).isoformat()
+    path = root / day / f"{page_key(url)}.html.zst"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(html.encode("utf-8"))
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return path
+
+
+def load(path: Path) -> str:
+    return zstandard.ZstdDecompressor().decompress(path.read_bytes()).decode("utf-8", "replace")
+
+
+def index(root: Path = CACHE_DIR, since: datetime.date = None) -> Dict[str, Path]:
+    """key → newest cached copy, optionally only from days ≥ `since`."""
+    latest: Dict[str, Path] = {}
+    if not root.exists():
+        return latest
+    for day in sorted(p for p in root.iterdir() if p.is_dir()):
+        if since and day.name < since.isoformat():
+            continue
+        for f in day.glob("*.html.zst"):
+            latest[f.name[:-len(".html.zst")]] = f      # later days win
+    return latest
+
+
+def prune(days: int, root: Path = CACHE_DIR) -> int:
+    """Delete day directories older than `days`."""
+    if not root.exists():
+        return 0
+    cutoff = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+    old = [d for d in root.iterdir() if d.is_dir() and d.name < cutoff]
+    for d in old:
+        shutil.rmtree(d, ignore_errors=True)
+    return len(old)
+
+
+def _reextract_one(job):
+    aid, url, path = job
+    from src.articles.article_extractor import extract_text
+    try:
+        return aid, extract_text(load(Path(path)), url)
+    except Exception as e:
+        print(f"❌ {url}: {e}")
+        return aid, None
+
+
+def reextract(days: int = None, dry_run: bool = False, workers: int = None,
+              db_url: str = "sqlite:///newsletter.db", root: Path = CACHE_DIR) -> dict:
+    """Re-run extract_text over live articles' cached pages on every core; bulk-update changed texts."""
+    if zstandard is None:
+        print("❌ zstandard is not installed; there is no page cache to re-extract from")
+        return {}
+    from sqlalchemy import create_engine, select, update
+    from sqlalchemy.orm import Session
+    from src.models import Article
+    from src.articles.article_extractor import MIN_CHARS
+
+    since = datetime.date.today() - datetime.timedelta(days=days) if days else None
+    cached = index(root, since)
+    eng = create_engine(db_url)
+    with Session(eng) as ssn:
+        rows = [r for r in ssn.execute(select(Article.id, Article.url, Article.text)
+                                       .where(Article.retired_at.is_(None)))
+                if r.id in cached]
+        current = {aid: text or "" for aid, _, text in rows}
+        jobs = [(aid, url, str(cached[aid])) for aid, url, _ in rows]
+        print(f"♻️ re-extracting {len(jobs)} cached pages on {workers or os.cpu_count()} cores")
+
+        changed = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for aid, text in pool.map(_reextract_one, jobs, chunksize=16):
+                # a failed extraction mustn't replace a feed-description fallback
+                old = current[aid]
+                if text and text != old and (len(text) >= MIN_CHARS or len(text) >= len(old)):
+                    changed.append({"id": aid, "text": text, "vector": None,
+                                    "chunk_vectors": None, "score": None})
+
+        if not dry_run:
+            for i in range(0, len(changed), UPDATE_BATCH):
+                ssn.execute(update(Article), changed[i:i + UPDATE_BATCH])
+                ssn.commit()
+    verb = "would change" if dry_run else "updated"
+    print(f"✅ {verb} {len(changed)} / {len(jobs)} article texts")
+    return {"pages": len(jobs), "changed": len(changed)}
+
+
+def stats(root: Path = CACHE_DIR):
+    for day in sorted(p for p in root.iterdir() if p.is_dir()) if root.exists() else []:
+        files = list(day.glob("*.html.zst"))
+        size = sum(f.stat().st_size for f in files)
+        print(f"{day.name}  {len(files):>5} pages  {size / 1e6:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if args[:1] == ["reextract"]:
+        reextract(int(args[1]) if len(args) > 1 else None, dry_run="--dry-run" in sys.argv)
+    elif args[:1] == ["stats"]:
+        stats()
+    else:
+        print(__doc__)
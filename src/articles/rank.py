@@ -1,15 +1,46 @@
-from sqlalchemy import create_engine
+import itertools
+from sqlalchemy import create_engine, update
 from sqlalchemy.orm import Session
 from src.models import Article
 from datetime import datetime
 from dateutil import tz
-from src.articles.scoring import article_score
+from src.articles.scoring import (article_score, semantic_chunk_rows,
+                                  semantic_score_rows, SEMANTIC_MODE)
+from src.vector_store import decode_blobs
 
-engine = create_engine("sqlite:///newsletter.db")
-sess = Session(engine)
-now = datetime.now(tz.tz.UTC)
+CHUNK = 500
 
-fresh = sess.query(Article).filter(Article.score == None).all()
-for art in fresh:
-    art.score = int(article_score(art, now))
-sess.commit()
+
+def main():
+    engine = create_engine("sqlite:///newsletter.db")
+    sess = Session(engine)
+    now = datetime.now(tz.tz.UTC)
+
+    fresh = (sess.query(Article)
+                 .filter(Article.score == None)
+                 .filter(Article.retired_at.is_(None))
+                 .yield_per(CHUNK))
+
+    # stream CHUNK articles at a time; only (id, score) pairs are kept around
+    scores = []
+    it = iter(fresh)
+    while (chunk := list(itertools.islice(it, CHUNK))):
+        # one matrix product for every article's (or chunk's) category similarities
+        if SEMANTIC_MODE == "mean":
+            sems = semantic_score_rows(decode_blobs([art.vector for art in chunk]))
+        else:
+            sems = semantic_chunk_rows([art.chunk_vectors for art in chunk],
+                                       [art.vector for art in chunk])
+        for art, sem in zip(chunk, sems):
+            scores.append({"id": art.id, "score": int(article_score(art, now, sem))})
+        sess.expunge_all()
+
+    if scores:
+        sess.execute(update(Article), scores)
+    sess.commit()
+    sess.close()
+    print(f"✅ ranked {len(scores)} articles")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,124 @@
-import feedparser, hashlib, datetime, pytz, requests
+import feedparser, hashlib, datetime, pytz, requests, time
 from sqlalchemy.orm import Session
 from src.models import Article
-from src.articles.article_extractor import extract_text 
-from bs4 import BeautifulSoup
+from src.articles.article_extractor import extract_with_tiers
+from src.articles import page_cache, seen
+from bs4 import BeautifulSoup, SoupStrainer
 import dateutil.parser
 from src.articles.rss_scraper_utils import fetch_with_selenium_stealth, resolve_google_news_url
 
-UTC = pytz.utc 
+UTC = pytz.utc
 
 UA = {"User-Agent": "Mozilla/5.0"}
 
-def fetch_rss(source: dict, db: Session, horizon_hours=24, limit=30):
-    cutoff = datetime.datetime.now(tz=UTC) - datetime.timedelta(hours=horizon_hours)
+MAX_PAGE_BYTES = 2_000_000   # article pages bigger than this get truncated
+COMMIT_EVERY   = 10          # articles per db.commit()
+
+def download_page(url: str, max_bytes: int = MAX_PAGE_BYTES) -> str:
+    """GET `url` but stop reading after `max_bytes` of body."""
+    with requests.get(url, headers=UA, timeout=10, stream=True) as r:
+        buf = bytearray()
+        for block in r.iter_content(chunk_size=64 * 1024):
+            buf += block
+            if len(buf) >= max_bytes:
+                print(f"✂️ page capped at {max_bytes // 1000} kB: {url}")
+                break
+        return bytes(buf[:max_bytes]).decode(r.encoding or "utf-8", errors="replace")
+
+def entry_published(entry, source: dict):
+    if hasattr(entry, "published_parsed") and entry.published_parsed:
+        # Normal case (RFC822 etc.)
+        return datetime.datetime(*entry.published_parsed[:6], tzinfo=pytz.utc)
+
+    # Fallback to raw string
+    raw_date = getattr(entry, "published", None) or entry.get("pubDate")
+    if not raw_date:
+        print(f"❌ No date found for entry in {source['name']}, skipping")
+        return None
+    try:
+        published = dateutil.parser.parse(raw_date)
+        if published.tzinfo is None:
+            published = published.replace(tzinfo=UTC)
+        print(f"⚠️ Fallback date parse for {source['name']}: {raw_date}")
+        return published
+    except Exception as e:
+        print(f"❌ Failed to parse date for {source['name']}: {raw_date} ({e})")
+        return None
+
+def entry_image(entry):
+    """Image the feed itself gives us, if any."""
+    if entry.get("media_content"):
+        return entry.media_content[0].get("url")
+    if entry.get("enclosures"):
+        return entry.enclosures[0].get("href")
+    return None
+
+def find_image(entry, html: str):
+    # next bit is for loading images if they exist
+    return entry_image(entry) or image_from_html(html)
+
+def image_from_html(html: str):
+    # only build a tree for <meta>/<img> tags, not the whole page
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer(["meta", "img"]))
+    og = soup.find("meta", property="og:image")
+    if og and og.get("content"):
+        return og["content"]
+    first_img = soup.find("img", src=True)
+    if first_img:
+        return first_img["src"]
+    return None
+
+def publish_rate(entries) -> float:
+    """Items per day implied by the feed's own timestamps (None if unknown)."""
+    stamps = sorted(
+        datetime.datetime(*e.published_parsed[:6])
+        for e in entries if e.get("published_parsed")
+    )
+    if len(stamps) < 2:
+        return None
+    span_days = (stamps[-1] - stamps[0]).total_seconds() / 86400
+    return (len(stamps) - 1) / max(span_days, 1 / 24)
+
+def iter_feed_entries(source: dict, horizon_hours=24, limit=30, stats=None, db=None):
+    """Yield (entry, published) for in-window, unseen feed entries, at most `limit`."""
     print(f"Fetching RSS feed for {source['name']} from {source['feed_url']}")
     feed = feedparser.parse(source["feed_url"])
-    fetches = 0
-    print(len(feed.entries), "entries found in feed")
-    for entry in feed.entries:
+    is_seen = seen.seen_filter(db, feed.entries, source) if db is not None else None
+    yield from select_entries(feed.entries, source, horizon_hours, limit, stats, is_seen)
+
+def select_entries(entries, source: dict, horizon_hours=24, limit=30, stats=None, is_seen=None):
+    """
+    The in-window part of an already parsed feed, as (entry, published).
+    Entries `is_seen` recognises are dropped here, before any resolution or
+    download; `limit` only counts the entries that are left.
+    """
+    cutoff = datetime.datetime.now(tz=UTC) - datetime.timedelta(hours=horizon_hours)
+    fetches = skipped = 0
+    print(len(entries), "entries found in feed")
+    if stats is not None:
+        stats["items_per_day"] = publish_rate(entries)
+    for entry in entries:
         if fetches >= limit:
             break
-        fetches += 1
-        img = None
-        published = None
-        if hasattr(entry, "published_parsed") and entry.published_parsed:
-            # Normal case (RFC822 etc.)
-            published = datetime.datetime(*entry.published_parsed[:6], tzinfo=pytz.utc)
-        else:
-            # Fallback to raw string
-            raw_date = getattr(entry, "published", None) or entry.get("pubDate")
-            if raw_date:
-                try:
-                    published = dateutil.parser.parse(raw_date)
-                    if published.tzinfo is None:
-                        published = published.replace(tzinfo=UTC)
-                    print(f"⚠️ Fallback date parse for {source['name']}: {raw_date}")
-                except Exception as e:
-                    print(f"❌ Failed to parse date for {source['name']}: {raw_date} ({e})")
-                    continue
-            else:
-                print(f"❌ No date found for entry in {source['name']}, skipping")
-                continue
-
-        if published < cutoff:
+        published = entry_published(entry, source)
+        if published is None or published < cutoff:
+            continue
+        if is_seen is not None and is_seen(entry):
+            skipped += 1
             continue
-            
+        fetches += 1
+        yield entry, published
+    if skipped:
+        print(f"⏭️ {skipped} entries already seen")
+
+def iter_articles(source: dict, db: Session, entries, stats=None):
+    """
+    Turn feed entries into Article rows one page at a time. Only the current
+    page's HTML is alive at any point; the caller decides when to commit.
+    """
+    stats = stats if stats is not None else {}
+    for entry, published in entries:
+        stats["processed"] = stats.get("processed", 0) + 1
         # --- URL handling ---
         url = getattr(entry, "link", None)
         url = resolve_google_news_url(url)
@@ -52,44 +127,25 @@ def fetch_rss(source: dict, db: Session, horizon_hours=24, limit=30):
             continue
 
         aid = hashlib.sha256(url.encode()).hexdigest()
-        if db.query(Article).get(aid):
+        if db.get(Article, aid):
+            seen.mark(db, entry, source)
             continue
 
-        html = requests.get(url, headers=UA, timeout=10).text
-        text = extract_text(html, url)
-
-        if not text or len(text) < 200:
-            print(f"⚠️ Extracted text too short ({len(text) if text else 0}) for {url}, trying Selenium...")
-            html = fetch_with_selenium_stealth(url)
-            if html:
-                text = extract_text(html, url)
-            else:
-                print(f"❌ Selenium fetch failed for {url}, sticking to whatever was there before")
-
-        # next bit is for loading images if they exist
-        if entry.get("media_content"):
-            img = entry.media_content[0].get("url")
-        elif entry.get("enclosures"):
-            img = entry.enclosures[0].get("href")
-
-        html = requests.get(url, headers=UA, timeout=10).text
-        if not img:
-            soup = BeautifulSoup(html, "html.parser")
-
-            og = soup.find("meta", property="og:image")
-            if og and og.get("content"):
-                img = og["content"]
-
-            if not img:
-                first_img = soup.find("img", src=True)
-                if first_img:
-                    img = first_img["src"]
-        
+        # lxml → trafilatura → Selenium, starting at the tier this domain needed last time
+        text, html, tier = extract_with_tiers(url, db, download_page, fetch_with_selenium_stealth)
+        if tier == "selenium":
+            stats["selenium"] = stats.get("selenium", 0) + 1
+
+        img = find_image(entry, html)
+        page_cache.store(url, html)     # raw page for offline re-extraction
+        del html
+
         if hasattr(entry, 'description') and entry.description:
             if len(text) < len(entry.description):
                 text = entry.description
 
-        db.add(Article(
+        seen.mark(db, entry, source)
+        yield Article(
             id=aid,
             source_name=source["name"],
             url=url,
@@ -98,5 +154,30 @@ def fetch_rss(source: dict, db: Session, horizon_hours=24, limit=30):
             text=text,
             fetched_at=datetime.datetime.utcnow(),
             image_url=img
-        ))
+        )
+
+def fetch_rss(source: dict, db: Session, horizon_hours=24, limit=30):
+    """
+    Harvest one source. Returns run stats for the scheduler: items_per_day,
+    processed entries, new articles, Selenium fallbacks and seconds spent.
+    """
+    started = time.monotonic()
+    stats = {"processed": 0, "new": 0, "selenium": 0}
+    entries = iter_feed_entries(source, horizon_hours, limit, stats, db)
+    return store_entries(source, db, entries, stats, started)
+
+def store_entries(source: dict, db: Session, entries, stats: dict, started: float):
+    """Fetch, extract and store the given (entry, published) pairs; finish `stats`."""
+    pending = 0
+    for art in iter_articles(source, db, entries, stats):
+        db.add(art)
+        stats["new"] += 1
+        pending += 1
+        if pending >= COMMIT_EVERY:
+            db.commit()
+            db.expunge_all()
+            pending = 0
     db.commit()
+    db.expunge_all()
+    stats["seconds"] = time.monotonic() - started
+    return stats
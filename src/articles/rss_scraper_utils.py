@@ -1,5 +1,7 @@
+import asyncio
 from urllib.parse import urlparse
 from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 import time
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -151,6 +153,65 @@ def _is_valid_resolved_url(url: str) -> bool:
     
     return True
 
+class AsyncGoogleNewsResolver:
+    """
+    Async counterpart of resolve_google_news_url for the async harvester:
+    one Chromium for the whole run (started on the first Google News link),
+    a fresh context per link, at most `concurrency` pages at a time.
+    """
+
+    def __init__(self, concurrency: int = 2):
+        self._sem = asyncio.Semaphore(concurrency)
+        self._lock = asyncio.Lock()
+        self._pw = None
+        self._browser = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._browser:
+            await self._browser.close()
+        if self._pw:
+            await self._pw.stop()
+
+    async def _get_browser(self):
+        async with self._lock:
+            if self._browser is None:
+                self._pw = await async_playwright().start()
+                self._browser = await self._pw.chromium.launch(
+                    headless=True,
+                    args=['--no-sandbox', '--disable-web-security',
+                          '--disable-features=VizDisplayCompositor', '--disable-dev-shm-usage']
+                )
+            return self._browser
+
+    async def resolve(self, url: str) -> str:
+        if not url or "news.google.com/rss/articles" not in url:
+            return url
+        async with self._sem:
+            browser = await self._get_browser()
+            context = await browser.new_context(
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                viewport={'width': 1920, 'height': 1080}
+            )
+            try:
+                page = await context.new_page()
+                await page.goto(url, timeout=45000, wait_until='domcontentloaded')
+                await page.wait_for_timeout(5000)   # late JS redirects
+                resolved = page.url
+            except Exception as e:
+                print(f"❌ Playwright resolve failed for {url}: {e}")
+                resolved = None
+            finally:
+                await context.close()
+        if resolved and resolved != url and _is_valid_resolved_url(resolved):
+            print(f"✅ Resolved to: {resolved}")
+            return resolved
+        print(f"🔄 Could not resolve, keeping original URL")
+        return url
+
+
 def fetch_with_selenium_stealth(url):
     """Use regular Selenium with stealth modifications"""
     options = Options()
@@ -1,22 +1,81 @@
-import os
+import os, time
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from src.articles.registry import load_sources, rss_sites
-from src.articles.rss_scraper import fetch_rss
+from src.articles.rss_scraper import fetch_rss, iter_feed_entries, store_entries
+from src.articles import prescore, scheduler
+
+def prescored(session, plan, started, budget_s):
+    """
+    PRESCORE_TOP harvest: read every due feed first, then fetch only the
+    globally best entries. Yields (source, run stats) like the plain loop.
+    """
+    feeds = []
+    for src, horizon, limit in plan:
+        stats = {"processed": 0, "new": 0, "selenium": 0}
+        try:
+            selected = list(iter_feed_entries(src, horizon, limit, stats, session))
+        except Exception as e:
+            print(f"Error on {src['name']}: {e}")
+            yield src, {"failed": True}
+            continue
+        feeds.append((src, stats, selected))
+
+    kept = prescore.select_global([(src, e, p) for src, _, sel in feeds for e, p in sel])
+    for src, stats, selected in feeds:
+        if time.monotonic() - started > budget_s:
+            print(f"⏱️ run budget spent, leaving {src['name']} for next run")
+            yield src, {"deferred": True}
+            continue
+        if selected and not kept.get(src["name"]):
+            # every entry was cut: leave last_polled_at so they are read again
+            print(f"✂️ {src['name']}: all {len(selected)} entries cut by pre-score")
+            yield src, {"deferred": True}
+            continue
+        try:
+            run = store_entries(src, session, kept.get(src["name"], []), stats, time.monotonic())
+        except Exception as e:
+            print(f"Error on {src['name']}: {e}")
+            session.rollback()
+            run = {"failed": True}
+        yield src, run
+
+def main(poll_all: bool = None):
+    if poll_all is None:
+        poll_all = scheduler.harvest_all()
+    if os.getenv("HARVEST_ASYNC"):
+        from src.articles import async_ingest     # overlapped, process-pool extraction
+        return async_ingest.main(poll_all)
 
-def main():
     engine = create_engine("sqlite:///newsletter.db")
     Session = sessionmaker(bind=engine)
     session = Session()
 
     sources = load_sources("sources_and_keywords/sources.yaml")
-    for src in rss_sites(sources):
-        print(f"Fetching RSS feed from {src['name']} …")
+    started = time.monotonic()
+    budget_s = scheduler.run_budget(poll_all)
+    plan = scheduler.plan(session, rss_sites(sources), poll_all=poll_all)
+    if prescore.PRESCORE_TOP:
+        for src, run in prescored(session, plan, started, budget_s):
+            scheduler.record(session, src["name"], run)
+        session.close()
+        print("Harvest complete")
+        return
+
+    for src, horizon, limit in plan:
+        if time.monotonic() - started > budget_s:
+            print(f"⏱️ run budget spent, leaving {src['name']} for next run")
+            scheduler.record(session, src["name"], {"deferred": True})
+            continue
+        print(f"Fetching RSS feed from {src['name']} … (last {horizon}h, ≤{limit} entries)")
         try:
-            fetch_rss(src, session)
+            run = fetch_rss(src, session, horizon_hours=horizon, limit=limit)
         except Exception as e:
             print(f"Error on {src['name']}: {e}")
-    
+            session.rollback()
+            run = {"failed": True}
+        scheduler.record(session, src["name"], run)
+
     session.close()
     print("Harvest complete")
 
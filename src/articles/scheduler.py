@@ -0,0 +1,160 @@
+"""
+Per-source adaptive polling.
+
+Every RSS source gets a row in `source_stats` with EWMAs of its publish rate,
+how many new articles a poll actually stores and what each processed entry
+costs us (download, extraction, Selenium). From those:
+
+* `next_poll_at`  — busy feeds are polled every run, a feed that posts twice a
+                    week only every few days,
+* `horizon_hours` — always covers the gap since the last poll, so skipping a
+                    run never loses entries,
+* `limit`         — roughly the number of entries expected in that window,
+* run budget      — RUN_BUDGET_S seconds (45 min) per run; due sources are
+                    taken in order of value per second, where
+                    value is the share of their recent articles that made the
+                    summarised pool. Sources never polled are always taken
+                    (there is no gap to cover for them yet); one that still
+                    misses a run remembers since when (`pending_since`) and
+                    its first horizon reaches back that far. HARVEST_ALL=1
+                    ignores both the schedule and the budget.
+"""
+
+import datetime
+import math
+import os
+
+from sqlalchemy import func
+
+from src.models import Article, SourceStats
+
+EWMA_ALPHA         = 0.3
+TARGET_NEW_PER_POLL = 5        # aim for about this many fresh entries per poll
+MIN_INTERVAL_H     = 12
+MAX_INTERVAL_H     = 96
+HORIZON_SLACK_H    = 2
+MIN_LIMIT, MAX_LIMIT = 5, 30
+DEFAULT_SECS_PER_ITEM = 4.0    # cost guess for sources we haven't measured yet
+RUN_BUDGET_S       = float(os.getenv("RUN_BUDGET_S", 45 * 60))
+SCHEDULE_GRACE_H   = 2         # cron jitter: "due in an hour" counts as due now
+YIELD_WINDOW_DAYS  = 30
+
+
+def harvest_all() -> bool:
+    """HARVEST_ALL=1: poll every source now, whatever its schedule or the budget."""
+    return os.getenv("HARVEST_ALL", "0") not in ("", "0")
+
+
+def run_budget(poll_all: bool = False) -> float:
+    """Seconds a harvest run may spend on sources."""
+    return math.inf if poll_all else RUN_BUDGET_S
+
+
+def _ewma(old, new):
+    return new if old is None else (1 - EWMA_ALPHA) * old + EWMA_ALPHA * new
+
+
+def _ranked_yield(db, since) -> dict:
+    """source_name → (stored articles, summarised articles) since `since`."""
+    rows = (db.query(Article.source_name,
+                     func.count(Article.id),
+                     func.count(Article.summary))
+              .filter(Article.fetched_at >= since)
+              .group_by(Article.source_name)
+              .all())
+    return {name: (total, summarised) for name, total, summarised in rows}
+
+
+def plan(db, sources, now=None, budget_s=None, poll_all=False):
+    """
+    Decide which sources to fetch this run.
+    Returns [(source, horizon_hours, limit)] in the order they should run.
+    """
+    now = now or datetime.datetime.utcnow()
+    budget_s = run_budget(poll_all) if budget_s is None else budget_s
+    stats = {s.name: s for s in db.query(SourceStats)}
+    yields = _ranked_yield(db, now - datetime.timedelta(days=YIELD_WINDOW_DAYS))
+
+    due = []
+    for src in sources:
+        st = stats.get(src["name"])
+        if st is None or st.last_polled_at is None:
+            horizon = 24
+            if st is not None and st.pending_since is not None:
+                waited_h = (now - st.pending_since).total_seconds() / 3600
+                horizon = math.ceil(24 + waited_h + HORIZON_SLACK_H)
+            due.append((True, 1.0, DEFAULT_SECS_PER_ITEM * MAX_LIMIT, src, horizon, MAX_LIMIT))
+            continue
+        grace = datetime.timedelta(hours=SCHEDULE_GRACE_H)
+        if not poll_all and st.next_poll_at and st.next_poll_at > now + grace:
+            continue
+
+        since_h = (now - st.last_polled_at).total_seconds() / 3600
+        horizon = max(24, math.ceil(since_h + HORIZON_SLACK_H))
+        expected = (st.items_per_day or 0) * horizon / 24
+        limit = int(min(MAX_LIMIT, max(MIN_LIMIT, math.ceil(expected * 1.5))))
+
+        total, summarised = yields.get(src["name"], (0, 0))
+        value = (summarised + 1) / (total + 2)          # Laplace-smoothed hit rate
+        cost = (st.secs_per_item or DEFAULT_SECS_PER_ITEM) * limit
+        due.append((False, value, cost, src, horizon, limit))
+
+    # never-polled sources first, then by value per second
+    due.sort(key=lambda d: (d[0], d[1] / max(d[2], 1.0)), reverse=True)
+
+    chosen, spent = [], 0.0
+    for cold, value, cost, src, horizon, limit in due:
+        if not cold and chosen and spent + cost > budget_s:
+            print(f"⏭️ {src['name']}: over run budget, deferred")
+            continue
+        spent += cost
+        chosen.append((src, horizon, limit))
+    print(f"🗓️ polling {len(chosen)}/{len(sources)} sources, est. {spent / 60:.1f} min")
+    return chosen
+
+
+def record(db, name: str, run: dict, now=None):
+    """
+    Fold one fetch_rss run into the source's stats and schedule its next poll.
+    `run` is the dict fetch_rss returns, {"failed": True}, or {"deferred": True}
+    for a planned source nothing was fetched from (the run ran out of time,
+    or pre-scoring cut every entry).
+    """
+    now = now or datetime.datetime.utcnow()
+    st = db.get(SourceStats, name)
+    if st is None:
+        st = SourceStats(name=name, polls=0, selenium_fallbacks=0, failures=0)
+        db.add(st)
+
+    if (run.get("deferred") or run.get("failed")) and st.last_polled_at is None:
+        # a never-polled source: its first horizon has to reach back to here
+        st.pending_since = st.pending_since or now
+    if run.get("deferred"):
+        db.commit()
+        return st
+
+    st.polls = (st.polls or 0) + 1
+    if run.get("failed"):
+        # leave last_polled_at alone so the next horizon still covers the gap;
+        # back off a little on broken feeds, but keep trying
+        st.failures = (st.failures or 0) + 1
+        st.next_poll_at = now + datetime.timedelta(hours=MIN_INTERVAL_H * 2)
+        db.commit()
+        return st
+
+    st.last_polled_at = now
+    st.pending_since = None
+
+    if run.get("items_per_day") is not None:
+        st.items_per_day = _ewma(st.items_per_day, run["items_per_day"])
+    st.new_per_poll = _ewma(st.new_per_poll, run.get("new", 0))
+    if run.get("processed"):
+        st.secs_per_item = _ewma(st.secs_per_item, run["seconds"] / run["processed"])
+    st.selenium_fallbacks = (st.selenium_fallbacks or 0) + run.get("selenium", 0)
+
+    rate = st.items_per_day or 0
+    interval = 24 * TARGET_NEW_PER_POLL / rate if rate > 0 else MAX_INTERVAL_H
+    interval = min(MAX_INTERVAL_H, max(MIN_INTERVAL_H, interval))
+    st.next_poll_at = now + datetime.timedelta(hours=interval)
+    db.commit()
+    return st
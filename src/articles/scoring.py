@@ -1,7 +1,8 @@
 import datetime as dt
-import itertools, yaml, numpy as np, pytz
+import itertools, os, yaml, numpy as np, pytz
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
+from src.vector_store import CHUNK_MODES, TOP_K_CHUNKS, chunk_scores, decode_chunks
 
 # Load YAML configuration
 CFG = yaml.safe_load(Path("sources_and_keywords/keywords.yaml").read_text())
@@ -13,6 +14,11 @@ SRC_W = CFG.get("source_weights", {})
 KW_DICT = {c["name"]: c["keywords"] for c in CATEGORIES}
 WEIGHTS = {c["name"]: c.get("weight", 1) for c in CATEGORIES}
 
+# "mean": the mean-pooled Article.vector; "max"/"topk": best chunk(s) of chunk_vectors
+SEMANTIC_MODE = os.getenv("SEMANTIC_MODE", "mean")
+if SEMANTIC_MODE not in CHUNK_MODES:
+    raise ValueError(f"SEMANTIC_MODE must be one of {CHUNK_MODES}")
+
 # Initialize embedding model
 EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 MODEL = SentenceTransformer(EMB_MODEL)
@@ -29,6 +35,8 @@ def create_semantic_vectors():
 
 # Generate all semantic vectors at startup
 SEMANTIC_VECTORS = create_semantic_vectors()
+SEMANTIC_NAMES   = list(SEMANTIC_VECTORS.keys())
+SEMANTIC_MATRIX  = np.stack([SEMANTIC_VECTORS[c] for c in SEMANTIC_NAMES]).astype(np.float32)
 
 # Helper functions
 def kw_weighted_hits(text: str) -> int:
@@ -39,8 +47,12 @@ def kw_weighted_hits(text: str) -> int:
             total += WEIGHTS[name]
     return total
 
-def semantic_scores(article_vector_bytes: bytes) -> dict:
+def semantic_scores(article_vector_bytes: bytes, chunk_bytes: bytes = None,
+                    mode: str = None) -> dict:
     """Calculate semantic similarity scores for all categories."""
+    mode = mode or SEMANTIC_MODE
+    if mode != "mean":
+        return semantic_chunk_rows([chunk_bytes], [article_vector_bytes], mode)[0]
     if not article_vector_bytes or len(article_vector_bytes) < 1500:
         return {category: 0.0 for category in SEMANTIC_VECTORS.keys()}
     
@@ -54,6 +66,38 @@ def semantic_scores(article_vector_bytes: bytes) -> dict:
     
     return scores
 
+def semantic_score_matrix(vectors: np.ndarray) -> np.ndarray:
+    """(n_articles, n_categories) similarities in one matrix product, summed in float64."""
+    return np.asarray(vectors, dtype=np.float64) @ SEMANTIC_MATRIX.T.astype(np.float64)
+
+def semantic_score_rows(vectors: np.ndarray) -> list:
+    """Per-article {category: score} dicts; zero rows (no vector) score 0."""
+    sims = semantic_score_matrix(vectors)
+    return [dict(zip(SEMANTIC_NAMES, map(float, row))) for row in sims]
+
+def semantic_chunk_rows(chunk_blobs, vector_blobs=None, mode: str = None,
+                        k: int = TOP_K_CHUNKS) -> list:
+    """
+    Per-article {category: score} dicts from chunk vectors ("max" / "topk"),
+    one matrix product over every chunk of every article.
+    """
+    chunks, owner = decode_chunks(chunk_blobs, vector_blobs)
+    sims = chunk_scores(chunks, owner, len(chunk_blobs), SEMANTIC_MATRIX,
+                        mode or SEMANTIC_MODE, k)
+    return [dict(zip(SEMANTIC_NAMES, map(float, row))) for row in sims]
+
+SEMANTIC_WEIGHTS = {
+    "quality_terms":      8,
+    "business_terms":     7,
+    "growth_terms":       6,
+    "innovation_terms":   8,
+    "governance_terms":   4,
+    "promotional_terms": -5,     # Penalize promotional content
+}
+
+def semantic_contribution_of(sem_scores: dict) -> float:
+    return sum(sem_scores.get(c, 0) * w for c, w in SEMANTIC_WEIGHTS.items())
+
 def source_weight(name: str) -> float:
     return float(SRC_W.get(name, 1.0))
 
@@ -65,7 +109,7 @@ def ensure_aware(dt_obj: dt.datetime) -> dt.datetime:
     return dt_obj.astimezone(UTC)
 
 # Main scoring function
-def article_score(article, now: dt.datetime) -> int:
+def article_score(article, now: dt.datetime, sem_scores: dict = None) -> int:
     now_utc = ensure_aware(now or dt.datetime.utcnow())
     pub_utc = ensure_aware(article.published_at)
     
@@ -77,15 +121,9 @@ def article_score(article, now: dt.datetime) -> int:
     keyword_score = kw_weighted_hits(article.text)
     
     # Semantic scoring with reduced weights
-    sem_scores = semantic_scores(article.vector)
-    semantic_contribution = (
-        sem_scores.get("quality_terms", 0) * 8 +       
-        sem_scores.get("business_terms", 0) * 7 +      
-        sem_scores.get("growth_terms", 0) * 6 +        
-        sem_scores.get("innovation_terms", 0) * 8 +    
-        sem_scores.get("governance_terms", 0) * 4  +
-        sem_scores.get("promotional_terms", 0) * -5     # Penalize promotional content        
-    )
+    if sem_scores is None:
+        sem_scores = semantic_scores(article.vector)
+    semantic_contribution = semantic_contribution_of(sem_scores)
     
     # Source multiplier
     source_mult = source_weight(article.source_name)
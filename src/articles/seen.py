@@ -0,0 +1,71 @@
+"""
+Pre-fetch dedup of feed entries.
+
+Article.id is sha256 of the *resolved* URL, so telling that an entry is old
+news used to take a Google News resolution (a headless browser) and a page
+download first. Every processed entry now also leaves short keys derived from
+what the feed itself says:
+
+    guid:<entry id>            link:<raw entry link>
+    title:<source>|<normalised title>     (titles of MIN_TITLE_WORDS+ words)
+
+in `seen_entries`. Before any network work a feed's entries are checked
+against it in one query. The table outlives article retention; housekeeping
+only expires keys after SEEN_DAYS.
+"""
+
+import datetime
+import hashlib
+import re
+from typing import Callable, Iterable, List
+
+from sqlalchemy import select
+
+from src.models import SeenEntry
+
+SEEN_DAYS       = 120
+MIN_TITLE_WORDS = 5      # "Morning Briefing" recurs daily; long titles don't
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def _h(raw: str) -> str:
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def normalise_title(title: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", title.lower()).split())
+
+
+def entry_keys(entry, source: dict) -> List[str]:
+    keys = []
+    guid = entry.get("id") or entry.get("guid")
+    if guid:
+        keys.append(_h(f"guid:{guid}"))
+    link = entry.get("link")
+    if link:
+        keys.append(_h(f"link:{link}"))
+    title = normalise_title(entry.get("title") or "")
+    if len(title.split()) >= MIN_TITLE_WORDS:
+        keys.append(_h(f"title:{source['name']}|{title}"))
+    return keys
+
+
+def seen_filter(db, entries: Iterable, source: dict) -> Callable:
+    """Predicate entry → already seen, backed by one lookup for the whole feed."""
+    by_entry = [(e, entry_keys(e, source)) for e in entries]
+    wanted = {k for _, keys in by_entry for k in keys}
+    known = set(db.scalars(select(SeenEntry.key).where(SeenEntry.key.in_(wanted)))) if wanted else set()
+    flags = {id(e): any(k in known for k in keys) for e, keys in by_entry}
+    return lambda entry: flags.get(id(entry), False)
+
+
+def mark_rows(entry, source: dict, now=None) -> List[SeenEntry]:
+    """SeenEntry rows for an entry we have dealt with (for db.merge)."""
+    now = now or datetime.datetime.utcnow()
+    return [SeenEntry(key=k, seen_at=now) for k in entry_keys(entry, source)]
+
+
+def mark(db, entry, source: dict):
+    for row in mark_rows(entry, source):
+        db.merge(row)
@@ -1,12 +1,16 @@
 import os, textwrap, dotenv
 from sqlalchemy import create_engine, select
 from sqlalchemy.orm import Session
-from openai import OpenAI
+from openai import AsyncOpenAI
 import re, sqlalchemy as sa
 from sqlalchemy.orm import Session
 from src.models import Article
+from src.condense import condense, est_tokens
+from src.hedge import LatencyStats, race
+from src import lineup
 import time
 import random
+import httpx
 import google.generativeai as genai
 
 def clean_summary(text: str) -> str:
@@ -32,6 +36,14 @@ def clean_summary(text: str) -> str:
 dotenv.load_dotenv()                               
 
 DB  = "newsletter.db"
+PROMPT_BUDGET_TOKENS = 1_200      # condensed article text per call (was 6 000 chars ≈ 1 500)
+OLD_CUT_CHARS = 6_000             # what the prompt got before condensing: text[:6_000]
+# free-tier pacing between articles, "min,max" seconds (0,0 against a stub)
+PAUSE_S = tuple(float(x) for x in os.getenv("SUMMARISE_PAUSE_S", "15,20").split(","))
+
+# endpoints are overridable so benchmarks.load_test can point them at a local stub
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")     # e.g. http://127.0.0.1:8081
 
 PROMPT_TMPL = textwrap.dedent("""\
     Please summarize the following article for a general-audience newsletter.
@@ -59,72 +71,70 @@ PROMPT_TMPL = textwrap.dedent("""\
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 gemini_model = genai.GenerativeModel('gemini-2.5-flash')
 
-# Configure OpenRouter as fallback
-openrouter_client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
+# Configure OpenRouter as fallback (async, so a losing request can be cancelled)
+openrouter_client = AsyncOpenAI(
+    base_url=OPENROUTER_BASE_URL,
     api_key=os.getenv("OPENROUTER_API_KEY"),
 )
 
-ROUNDUP_RE = re.compile(r"\bround[\s-]*up\b", re.I)
-COHORT_RE = re.compile(r"\bcohort\b", re.I)
-
-def get_summary_gemini(text: str) -> str:
-    """Try to get summary using Gemini API."""
-    try:
-        response = gemini_model.generate_content(PROMPT_TMPL.format(text=text))
-        return response.text.strip()
-    except Exception as e:
-        print(f"⚠️ Gemini API error: {e}")
-        return None
-    
-def get_summary_openrouter(text: str) -> str:
-    """Fallback to OpenRouter API."""
-    try:
-        completion = openrouter_client.chat.completions.create(
-            model="deepseek/deepseek-chat-v3-0324:free",
-            messages=[{
-                "role": "user",
-                "content": PROMPT_TMPL.format(text=text)
-            }],
-            extra_body={}
-        )
-        return completion.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"⚠️ OpenRouter API error: {e}")
-        return None
+async def gemini_summary(prompt: str) -> str:
+    """Primary: Gemini."""
+    if GEMINI_API_ENDPOINT:
+        return await gemini_rest_summary(prompt)
+    response = await gemini_model.generate_content_async(prompt)
+    return response.text.strip()
+
+async def gemini_rest_summary(prompt: str) -> str:
+    """Gemini's REST generateContent over httpx, for GEMINI_API_ENDPOINT (a stub).
+
+    genai's async client only talks grpc_asyncio; with transport="rest" it
+    awaits a synchronous response and every call fails.
+    """
+    async with httpx.AsyncClient(base_url=GEMINI_API_ENDPOINT, timeout=60) as client:
+        r = await client.post("/v1beta/models/gemini-2.5-flash:generateContent",
+                              params={"key": os.getenv("GEMINI_API_KEY")},
+                              json={"contents": [{"role": "user", "parts": [{"text": prompt}]}]})
+        r.raise_for_status()
+    return r.json()["candidates"][0]["content"]["parts"][0]["text"].strip()
+
+async def openrouter_summary(prompt: str) -> str:
+    """Fallback / hedge: OpenRouter."""
+    completion = await openrouter_client.chat.completions.create(
+        model="deepseek/deepseek-chat-v3-0324:free",
+        messages=[{
+            "role": "user",
+            "content": prompt
+        }],
+        extra_body={}
+    )
+    return completion.choices[0].message.content.strip()
+
+# in preference order; src.hedge races the second against a slow first
+PROVIDERS = [("gemini", gemini_summary), ("openrouter", openrouter_summary)]
     
-def summarise_batch(limit: int = 5) -> None:
-    """Summarise the top <limit> scored, non-duplicate, non-roundup articles."""
+def summarise_batch(edition=None) -> None:
+    """Summarise the articles in `edition`'s (today's) lineup that don't have a summary yet."""
 
     eng = sa.create_engine("sqlite:///newsletter.db")
 
     with Session(eng) as ssn:
-        # Pull a wider pool (3× limit) sorted by score
-        pool = (
-            ssn.query(Article)
-               .filter(Article.summary.is_(None))
-               .order_by(Article.score.desc())
-               .limit(limit * 3)
-               .all()
-        )
+        # exactly the articles render will show (see src.lineup)
+        pool = [a for a in lineup.items(ssn, "articles", edition) if a.summary is None]
 
         # Summarise each selected article
+        stats = LatencyStats(ssn)
+        tokens_in = tokens_sent = 0
         for i, art in enumerate(pool):
             try:
-                if ROUNDUP_RE.search(art.title) or COHORT_RE.search(art.title):
-                    ssn.delete(art)
-                    continue
-    
-                snippet = art.text[:6_000]
+                snippet = condense(art.text, PROMPT_BUDGET_TOKENS, art.vector)
+                tokens_in += est_tokens((art.text or "")[:OLD_CUT_CHARS])
+                tokens_sent += est_tokens(snippet)
+
+                # Gemini first, OpenRouter hedged in if it is slow or fails
+                content, provider = race(PROVIDERS, PROMPT_TMPL.format(text=snippet), stats)
+                if provider and provider != PROVIDERS[0][0]:
+                    print(f"🔄 {provider} answered for: {art.title[:60]}")
 
-                # Try Gemini first
-                content = get_summary_gemini(snippet)
-                
-                # Fallback to OpenRouter if Gemini fails
-                if not content:
-                    print(f"🔄 Falling back to OpenRouter for: {art.title[:60]}")
-                    content = get_summary_openrouter(snippet)
-                
                 if not content:
                     print(f"⚠️ Both APIs failed for: {art.title[:60]}")
                     continue
@@ -132,8 +142,8 @@ def summarise_batch(limit: int = 5) -> None:
                 art.summary = clean_summary(content)
                 
                 # Add delay after each API call
-                if i < len(pool) - 1:
-                    sleep_time = random.uniform(15, 20)
+                if i < len(pool) - 1 and max(PAUSE_S) > 0:
+                    sleep_time = random.uniform(*PAUSE_S)
                     print(f"💤 Sleeping {sleep_time:.1f}s...")
                     time.sleep(sleep_time)
 
@@ -142,7 +152,8 @@ def summarise_batch(limit: int = 5) -> None:
                 continue
 
         ssn.commit()
-        print(f"✅ summarised {len([a for a in pool if a.summary])} / {limit} articles")
+        print(f"✅ summarised {len([a for a in pool if a.summary])} / {len(pool)} articles")
+        print(f"✂️ prompt text ≈{tokens_sent} tokens (the old {OLD_CUT_CHARS}-char cut sent ≈{tokens_in})")
 
 if __name__ == "__main__":
     summarise_batch()
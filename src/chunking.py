@@ -0,0 +1,88 @@
+"""
+Token-aware chunking for the MiniLM embedder.
+
+The old chunkers split the whole text on whitespace, joined 750-word windows
+and then kept the first few; MiniLM (max_seq_length 256) silently truncated
+each of those windows to its first ~190 words anyway. Here the text is
+tokenized a segment at a time, cut into windows that fit the model exactly,
+and tokenizing stops as soon as `max_chunks` windows exist. The token ids go
+straight to the model, so nothing is tokenized twice.
+"""
+
+from typing import Iterator, List, Sequence
+
+import numpy as np
+
+SEGMENT_CHARS = 4_000    # text tokenized per step, cut at whitespace
+
+
+def _segments(text: str, size: int = SEGMENT_CHARS) -> Iterator[str]:
+    """Consecutive slices of ~size chars that end on whitespace."""
+    start, n = 0, len(text)
+    while start < n:
+        end = min(start + size, n)
+        if end < n:
+            cut = max(text.rfind(ws, start, end) for ws in " \n\t")
+            end = cut + 1 if cut > start else end
+        yield text[start:end]
+        start = end
+
+
+def token_chunks(text: str, tokenizer, max_tokens: int,
+                 max_chunks: int) -> Iterator[List[int]]:
+    """
+    Lazily yield up to `max_chunks` lists of token ids, each at most
+    `max_tokens` long, without special tokens. WordPiece splits on whitespace
+    first, so tokenizing whitespace-aligned segments gives the same ids as
+    tokenizing the whole text.
+    """
+    if not text or max_chunks <= 0:
+        return
+    buf, emitted = [], 0
+    for seg in _segments(text):
+        buf += tokenizer(seg, add_special_tokens=False)["input_ids"]
+        while len(buf) >= max_tokens:
+            yield buf[:max_tokens]
+            buf = buf[max_tokens:]
+            emitted += 1
+            if emitted == max_chunks:
+                return
+    if buf:
+        yield buf
+
+
+def chunk_for(model, text: str, max_chunks: int) -> List[List[int]]:
+    """Chunks sized for `model`'s own sequence limit (less [CLS]/[SEP])."""
+    body = model.max_seq_length - 2
+    return list(token_chunks(text, model.tokenizer, body, max_chunks))
+
+
+def encode_chunks(model, chunks: Sequence[Sequence[int]], batch_size: int = 32,
+                  normalize: bool = True) -> np.ndarray:
+    """
+    SentenceTransformer.encode for pre-tokenized chunks: add [CLS]/[SEP], pad,
+    run the model's modules (transformer → pooling → normalize) and return a
+    float32 (len(chunks), dim) matrix.
+    """
+    import torch
+
+    tok = model.tokenizer
+    out = []
+    for i in range(0, len(chunks), batch_size):
+        batch = [[tok.cls_token_id, *c, tok.sep_token_id] for c in chunks[i:i + batch_size]]
+        width = max(len(ids) for ids in batch)
+        input_ids = torch.full((len(batch), width), tok.pad_token_id, dtype=torch.long)
+        attention = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, ids in enumerate(batch):
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention[row, :len(ids)] = 1
+        features = {"input_ids": input_ids.to(model.device),
+                    "attention_mask": attention.to(model.device)}
+        with torch.no_grad():
+            emb = model(features)["sentence_embedding"]
+        if normalize:
+            emb = torch.nn.functional.normalize(emb, p=2, dim=1)
+        out.append(emb.cpu().numpy().astype(np.float32))
+    if not out:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    return np.concatenate(out)
@@ -0,0 +1,107 @@
+"""
+Condense article / transcript text before it goes to the summary LLM.
+
+Instead of a blind `text[:N]` cut, the text is split into sentences (caption
+lines without punctuation are merged into ~sentence-sized pieces), each is
+embedded with the same MiniLM model as embed_articles / embed_videos, and the
+sentences closest to the document's stored mean vector are kept — skipping
+near-repeats — until the token budget is used. The picks are put back in
+their original order so the LLM still reads a coherent (if shorter) text.
+
+Token counts are estimated at ~4 characters per token, which is close enough
+for both Gemini and the OpenRouter models to size a prompt budget.
+"""
+
+import math
+import re
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+EMB_MODEL          = "sentence-transformers/all-MiniLM-L6-v2"
+CHARS_PER_TOKEN    = 4
+MIN_SENTENCE_WORDS = 12      # merge caption fragments up to about this
+MAX_SENTENCE_WORDS = 40      # and split run-ons beyond this
+MAX_SENTENCES      = 800     # embed at most this many (evenly sampled)
+REDUNDANT_SIM      = 0.9     # a sentence this close to a kept one adds nothing
+LEAD_SENTENCES     = 1       # always keep the opening sentence(s)
+
+_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_END_RE   = re.compile(r"[.!?][\"')\]]*$")
+
+_model = None
+
+
+def _get_model():
+    global _model
+    if _model is None:
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(EMB_MODEL)
+    return _model
+
+
+def est_tokens(text: str) -> int:
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> Iterator[str]:
+    """Sentence-ish pieces of MIN..MAX_SENTENCE_WORDS words where possible."""
+    buf: List[str] = []
+    for piece in _SPLIT_RE.split(text):
+        words = piece.split()
+        if not words:
+            continue
+        buf += words
+        if len(buf) >= MIN_SENTENCE_WORDS or _END_RE.search(piece.strip()):
+            for i in range(0, len(buf), MAX_SENTENCE_WORDS):
+                yield " ".join(buf[i:i + MAX_SENTENCE_WORDS])
+            buf = []
+    if buf:
+        yield " ".join(buf)
+
+
+def _centroid(emb: np.ndarray, doc_vector: Optional[bytes]) -> np.ndarray:
+    if doc_vector and len(doc_vector) == emb.shape[1] * 4:
+        c = np.frombuffer(doc_vector, dtype=np.float32)
+    else:
+        c = emb.mean(axis=0)
+    norm = np.linalg.norm(c)
+    return c / norm if norm else c
+
+
+def condense(text: str, budget_tokens: int, doc_vector: Optional[bytes] = None) -> str:
+    """
+    Return `text` cut down to about `budget_tokens` by keeping its most central
+    sentences. Text already within budget is returned unchanged (no model call).
+    `doc_vector` is the row's stored mean embedding; without it the mean of
+    the sentence embeddings is used.
+    """
+    text = text or ""
+    if est_tokens(text) <= budget_tokens:
+        return text
+
+    sents = list(split_sentences(text))
+    if len(sents) > MAX_SENTENCES:
+        keep = np.linspace(0, len(sents) - 1, MAX_SENTENCES).astype(int)
+        sents = [sents[i] for i in sorted(set(keep) | set(range(LEAD_SENTENCES)))]
+
+    emb = _get_model().encode(sents, normalize_embeddings=True, batch_size=64)
+    emb = np.asarray(emb, dtype=np.float32)
+    centrality = emb @ _centroid(emb, doc_vector)
+
+    budget_chars = budget_tokens * CHARS_PER_TOKEN
+    order = list(range(min(LEAD_SENTENCES, len(sents))))
+    order += [i for i in np.argsort(-centrality) if i >= LEAD_SENTENCES]
+
+    chosen: List[int] = []
+    used = 0
+    for i in order:
+        cost = len(sents[i]) + 1
+        if used + cost > budget_chars:
+            continue                    # a shorter sentence may still fit
+        if chosen and float(np.max(emb[chosen] @ emb[i])) >= REDUNDANT_SIM:
+            continue
+        chosen.append(int(i))
+        used += cost
+
+    return " ".join(sents[i] for i in sorted(chosen))
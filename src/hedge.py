@@ -0,0 +1,193 @@
+"""
+Hedged LLM calls: race the fallback provider against a slow primary.
+
+The primary (Gemini) starts alone. If it hasn't produced a valid answer after
+its recent median latency, the next provider starts in parallel; the first
+non-empty answer wins and the other request is cancelled. A provider that
+fails outright hands over immediately, as the old sequential fallback did.
+
+Latencies go into a per-provider histogram in `provider_latency` (committed
+with the caller's session), so the hedge delay follows how each provider has
+actually been behaving. A cancelled loser goes in too, at the time it had
+run: its latency was at least that, and leaving it out would keep only the
+fast calls and drag the median (and so the hedge delay) down. The race runs
+on a background event loop; the session is only read before it and written
+after it, on the calling thread. SUMMARY_HEDGE=0 turns racing off: the
+fallback then only runs once the primary has failed.
+"""
+
+import asyncio
+import datetime
+import json
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.models import ProviderLatency
+
+# histogram bucket upper bounds, seconds (the last bucket is open-ended)
+BUCKETS_S     = (0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+HIST_CAP      = 200          # halve the counts beyond this many samples
+DEFAULT_DELAY = 8.0          # hedge delay before we have any samples
+MIN_DELAY_S   = 2.0
+MAX_DELAY_S   = 30.0
+MIN_SAMPLES   = 5
+CALL_TIMEOUT_S = 120
+HEDGE         = os.getenv("SUMMARY_HEDGE", "1") != "0"
+
+Provider = Tuple[str, Callable[[str], Awaitable[str]]]
+
+
+class LatencyStats:
+    """Per-provider latency histograms living in the caller's session."""
+
+    def __init__(self, ssn):
+        self.ssn = ssn
+        self.rows = {r.provider: r for r in ssn.query(ProviderLatency)}
+
+    def _row(self, provider: str) -> ProviderLatency:
+        row = self.rows.get(provider)
+        if row is None:
+            row = ProviderLatency(provider=provider, buckets=json.dumps([0] * (len(BUCKETS_S) + 1)),
+                                  successes=0, failures=0, wins=0, cancelled=0)
+            self.ssn.add(row)
+            self.rows[provider] = row
+        return row
+
+    def observe(self, provider: str, secs: float = None, ok: bool = True,
+                censored: bool = False):
+        """One call; `censored` means it was cancelled after `secs`, unfinished."""
+        row = self._row(provider)
+        row.updated_at = datetime.datetime.utcnow()
+        if not ok:
+            row.failures = (row.failures or 0) + 1
+            return
+        if censored:
+            row.cancelled = (row.cancelled or 0) + 1
+        else:
+            row.successes = (row.successes or 0) + 1
+        counts = json.loads(row.buckets)
+        idx = next((i for i, b in enumerate(BUCKETS_S) if secs <= b), len(BUCKETS_S))
+        counts[idx] += 1
+        if sum(counts) > HIST_CAP:
+            counts = [c / 2 for c in counts]          # recent behaviour matters more
+        row.buckets = json.dumps(counts)
+
+    def count(self, provider: str, field: str):
+        row = self._row(provider)
+        setattr(row, field, (getattr(row, field) or 0) + 1)
+
+    def apply(self, events: Sequence[tuple]):
+        """Replay ("observe" | "count", *args) events recorded during a race."""
+        for method, *args in events:
+            getattr(self, method)(*args)
+
+    def quantile(self, provider: str, q: float = 0.5) -> Optional[float]:
+        row = self.rows.get(provider)
+        if row is None:
+            return None
+        counts = json.loads(row.buckets)
+        total = sum(counts)
+        if total < MIN_SAMPLES:
+            return None
+        # linear within the bucket the quantile falls in; the open-ended last
+        # bucket reports its lower bound
+        target, seen, lower = q * total, 0.0, 0.0
+        for upper, c in zip(BUCKETS_S + (None,), counts):
+            if c and seen + c >= target:
+                return lower if upper is None else lower + (upper - lower) * (target - seen) / c
+            seen += c
+            lower = upper if upper is not None else lower
+        return BUCKETS_S[-1]
+
+    def hedge_delay(self, provider: str) -> float:
+        p50 = self.quantile(provider, 0.5)
+        if p50 is None:
+            return DEFAULT_DELAY
+        return min(MAX_DELAY_S, max(MIN_DELAY_S, p50))
+
+
+# one event loop for the process, so async SDK clients stay on the loop they
+# were first used on
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _run(coro):
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="hedge-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+async def _timed(name: str, fn, prompt: str, events: list) -> Optional[str]:
+    started = time.monotonic()
+    try:
+        out = await asyncio.wait_for(fn(prompt), CALL_TIMEOUT_S)
+    except asyncio.CancelledError:
+        events.append(("observe", name, time.monotonic() - started, True, True))
+        raise
+    except Exception as e:
+        print(f"⚠️ {name} error: {e}")
+        events.append(("observe", name, None, False))
+        return None
+    out = (out or "").strip()
+    events.append(("observe", name, time.monotonic() - started, bool(out)))
+    return out or None
+
+
+async def _race(providers: Sequence[Provider], prompt: str, delays: Dict[str, float],
+                events: list, hedge: bool) -> Tuple[Optional[str], Optional[str]]:
+    running = {}
+    queue: List[Provider] = list(providers)
+
+    def start_next():
+        name, fn = queue.pop(0)
+        running[asyncio.ensure_future(_timed(name, fn, prompt, events))] = name
+
+    start_next()
+    try:
+        while running:
+            # hedge after the newest provider's median; without hedging (or
+            # with nothing left to start) just wait for an answer
+            timeout = None
+            if hedge and queue:
+                timeout = delays[list(running.values())[-1]]
+            done, _ = await asyncio.wait(running, timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                print(f"⏱️ {list(running.values())[-1]} slower than {timeout:.1f}s; "
+                      f"starting {queue[0][0]} alongside")
+                start_next()
+                continue
+            for task in done:
+                name = running.pop(task)
+                text = task.result()
+                if text:
+                    events.append(("count", name, "wins"))
+                    return text, name
+            if queue and not running:
+                start_next()            # every running provider failed: next one
+        return None, None
+    finally:
+        for task in running:
+            task.cancel()               # the loser's HTTP request is dropped here
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+
+def race(providers: Sequence[Provider], prompt: str, stats: LatencyStats,
+         hedge: bool = HEDGE) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Ask `providers` (in preference order) for `prompt`, hedging as described
+    above. Returns (answer, provider name), or (None, None) if all failed.
+    """
+    delays = {name: stats.hedge_delay(name) for name, _ in providers}
+    events: list = []
+    try:
+        return _run(_race(providers, prompt, delays, events, hedge))
+    finally:
+        stats.apply(events)
@@ -1,19 +1,164 @@
+"""
+Rolling retention for newsletter.db.
+
+Runs after every send. Instead of wiping the tables it:
+  1. retires everything the edition just considered, so the next edition only
+     picks from fresh harvests,
+  2. drops the heavy payload (text / transcript / vectors) once it is older than
+     `payload_days`,
+  3. deletes rows older than `row_days` (feed-entry dedup lives on in
+     seen_entries for SEEN_DAYS),
+  4. hands freed pages back to the OS with incremental_vacuum,
+  5. prunes cached raw pages (src.articles.page_cache) older than the articles'
+     `payload_days`: past that the text they could re-extract is gone.
+
+Deletes and payload updates run in batches so no single statement rewrites a
+large part of the file.
+"""
+
+import datetime
 import sqlite3
 
+from src.articles import page_cache
+from src.articles.seen import SEEN_DAYS
+
 DB = "newsletter.db"
 
-def housekeeping():
+BATCH_ROWS   = 500
+VACUUM_PAGES = 2_000     # pages released per incremental_vacuum call
+
+# age is measured on `age_col`; the payload columns get NULLed first, the
+# row itself goes once it is older than row_days
+RETENTION = {
+    "articles": {
+        "age_col":      "fetched_at",
+        "payload_cols": ("text", "vector", "chunk_vectors"),
+        "payload_days": 3,
+        "row_days":     30,
+    },
+    "videos": {
+        "age_col":      "published_at",
+        "payload_cols": ("transcript", "vector", "chunk_vectors"),
+        "payload_days": 3,
+        "row_days":     30,
+    },
+}
+
+
+def _cutoff(days: int) -> str:
+    # SQLAlchemy stores DateTime in SQLite as "YYYY-MM-DD HH:MM:SS.ffffff"
+    ts = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    return ts.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _batched(conn, sql: str, params: tuple) -> int:
+    """Repeat a LIMITed statement until it stops touching rows."""
+    total = 0
+    while True:
+        n = conn.execute(sql, params + (BATCH_ROWS,)).rowcount
+        conn.commit()
+        total += n
+        if n < BATCH_ROWS:
+            return total
+
+
+def retire(conn, table: str) -> int:
+    now = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+    return _batched(
+        conn,
+        f"UPDATE {table} SET retired_at = ? WHERE rowid IN "
+        f"(SELECT rowid FROM {table} WHERE retired_at IS NULL LIMIT ?)",
+        (now,),
+    )
+
+
+def drop_payload(conn, table: str, cfg: dict) -> int:
+    cols = cfg["payload_cols"]
+    sets = ", ".join(f"{c} = NULL" for c in cols)
+    any_set = " OR ".join(f"{c} IS NOT NULL" for c in cols)
+    return _batched(
+        conn,
+        f"UPDATE {table} SET {sets} WHERE rowid IN "
+        f"(SELECT rowid FROM {table} WHERE retired_at IS NOT NULL "
+        f"AND {cfg['age_col']} < ? AND ({any_set}) LIMIT ?)",
+        (_cutoff(cfg["payload_days"]),),
+    )
+
+
+def delete_expired(conn, table: str, cfg: dict) -> int:
+    return _batched(
+        conn,
+        f"DELETE FROM {table} WHERE rowid IN "
+        f"(SELECT rowid FROM {table} WHERE retired_at IS NOT NULL "
+        f"AND {cfg['age_col']} < ? LIMIT ?)",
+        (_cutoff(cfg["row_days"]),),
+    )
+
+
+def expire_seen(conn, days: int = SEEN_DAYS) -> int:
+    """Feed-entry dedup keys outlive the articles, but not forever."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'seen_entries'").fetchone():
+        return 0
+    return _batched(
+        conn,
+        "DELETE FROM seen_entries WHERE rowid IN "
+        "(SELECT rowid FROM seen_entries WHERE seen_at < ? LIMIT ?)",
+        (_cutoff(days),),
+    )
+
+
+def drop_stale_scores(conn) -> int:
+    """Profile scores (src.profiles) only matter until their item is retired."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'profile_scores'").fetchone():
+        return 0
+    return _batched(
+        conn,
+        "DELETE FROM profile_scores WHERE rowid IN "
+        "(SELECT rowid FROM profile_scores WHERE "
+        "(kind = 'articles' AND item_id NOT IN (SELECT id FROM articles WHERE retired_at IS NULL)) OR "
+        "(kind = 'videos' AND item_id NOT IN (SELECT video_id FROM videos WHERE retired_at IS NULL)) "
+        "LIMIT ?)",
+        (),
+    )
+
+
+def reclaim_space(conn) -> int:
+    """Release free pages without rewriting the whole file."""
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if mode != 2:
+        # one-off conversion for DBs created before INCREMENTAL was the default
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        print("🔧 switched newsletter.db to auto_vacuum=INCREMENTAL")
+        return 0
+
+    freed = 0
+    while True:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free:
+            return freed
+        step = min(free, VACUUM_PAGES)
+        conn.execute(f"PRAGMA incremental_vacuum({step})").fetchall()
+        freed += step
+
+
+def housekeeping(retention: dict = RETENTION):
     conn = sqlite3.connect(DB)
-    cur = conn.cursor()
 
-    cur.execute("DELETE FROM articles")
-    cur.execute("DELETE FROM videos")
-    conn.commit()
+    for table, cfg in retention.items():
+        retired = retire(conn, table)
+        stripped = drop_payload(conn, table, cfg)
+        deleted = delete_expired(conn, table, cfg)
+        print(f"🧹 {table}: retired {retired}, dropped payload of {stripped}, deleted {deleted}")
 
-    cur.execute("VACUUM")  # shrink file on disk
+    print(f"🧹 profile_scores: dropped {drop_stale_scores(conn)} scores of retired items")
+    print(f"🧹 seen_entries: expired {expire_seen(conn)} keys older than {SEEN_DAYS}d")
+    pages = reclaim_space(conn)
     conn.close()
-    print("🧹 All articles and videos deleted, DB compacted")
+
+    days = retention["articles"]["payload_days"]
+    print(f"🧹 page cache: removed {page_cache.prune(days)} day(s) older than {days}d")
+    print(f"🧹 Retention done, released {pages} free pages")
 
 if __name__ == "__main__":
     housekeeping()
-
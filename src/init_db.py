@@ -1,9 +1,8 @@
 # init_db.py
-from sqlalchemy import create_engine, select, text
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import Session
-from src.models import Base, Subscriber
-from datetime import datetime
-import secrets
+from src.models import Base
+from src import archive, subscribers
 
 DB_URL = "sqlite:///newsletter.db"
 
@@ -66,28 +65,47 @@ def drop_html_column(engine):
             print(f"⚠️ Could not drop 'html' column (maybe SQLite too old): {e}")
 
 
-def seed_subscribers(session: Session):
-    # Only seed if the table is empty
-    # if session.scalar(select(Subscriber.email).limit(1)):
-    #     print("✅ subscribers already present; skipping hard-seed")
-    #     return
+def add_missing_columns(engine):
+    """
+    ALTER TABLE ... ADD COLUMN for model columns the on-disk DB predates.
+    create_all() only creates missing tables, and newsletter.db lives on.
+    """
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            rows = conn.execute(text(f"PRAGMA table_info({table.name})")).fetchall()
+            if not rows:
+                continue  # fresh table, create_all already built it
+            existing = {row[1] for row in rows}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}"))
+                print(f"✅ Added '{col.name}' column to {table.name}")
+
+
+def enable_incremental_vacuum(engine):
+    """auto_vacuum only sticks if set before the first table is created."""
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT count(*) FROM sqlite_master")).scalar():
+            conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+
 
-    for email in HARDCODED_SUBS:
-        session.add(
-            Subscriber(
-                email=email,
-                active=True,
-                subscribed_at=datetime.utcnow(),
-                token=secrets.token_hex(16),
-            )
-        )
-    session.commit()
-    print(f"✅ seeded {len(HARDCODED_SUBS)} hard-coded subscribers")
+def seed_subscribers(session: Session):
+    # init_db runs on every pipeline run: one upsert, existing rows untouched
+    counts = subscribers.upsert(session, HARDCODED_SUBS)
+    print(f"✅ seeded {counts['new']} new hard-coded subscribers")
 
 
 def main():
     engine = create_engine(DB_URL)
+    enable_incremental_vacuum(engine)
     Base.metadata.create_all(engine)
+    add_missing_columns(engine)
+    subscribers.lowercase_emails(engine)
+    subscribers.ensure_indexes(engine)
+    subscribers.ensure_tokens(engine)
+    archive.ensure_schema(engine)
     # drop_html_column(engine)
     print("✅ newsletter.db schema ensured")
 
@@ -0,0 +1,145 @@
+"""
+The edition lineup: which articles and videos go out today, chosen once.
+
+Summarising and rendering used to pick "the top items" separately, with
+different rules, so summaries were paid for items that never rendered and
+rendered items could lack a summary. Now this stage picks each section once —
+
+* skip round-ups / cohort announcements,
+* dedup stories by normalised title (the better-scored copy wins),
+* at most `per_source` items per source / channel,
+* top `limit` by score, via bounded heaps in a single pass over the rows —
+
+and stores it in `lineup_items` for the edition date. Summarise and render
+both read that list. Run it after both rank stages; a section still missing
+when summarise or render asks for it is built then. Once stored, a section
+is kept for the day.
+
+An item whose summary fails for good is not replaced by the next candidate:
+render skips it and the edition goes out one item shorter. A failed summary
+leaves summarise `partial`, so src.pipeline retries it first; swapping in a
+runner-up would mean paying for a summary nobody planned to read, and the
+lineup would no longer be fixed for the day.
+
+    python -m src.lineup            # build today's missing sections
+    python -m src.lineup --rebuild  # e.g. after re-ranking
+"""
+
+import datetime
+import heapq
+import re
+import sys
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import Session
+
+from src.articles.seen import normalise_title
+from src.models import Article, LineupItem, Video
+
+DB_URL = "sqlite:///newsletter.db"
+SCAN_CHUNK = 1000
+
+ROUNDUP_RE = re.compile(r"\bround[\s-]*up\b", re.I)
+COHORT_RE = re.compile(r"\bcohort\b", re.I)
+
+# kind → (model, id column, source column, limit, per-source cap)
+SECTIONS = {
+    "articles": (Article, Article.id,       Article.source_name, 5, 1),
+    "videos":   (Video,   Video.video_id,   Video.channel_name,  1, 1),
+}
+
+Row = Tuple[int, str, str, str]     # score, id, source, title
+
+
+def today() -> datetime.date:
+    """The edition date when none is given: today in UTC, whatever the host's zone."""
+    return datetime.datetime.utcnow().date()
+
+
+def pick(rows: Iterable[Row], limit: int, per_source: int) -> List[Row]:
+    """
+    Best `limit` rows, at most `per_source` per source and one per story.
+    One pass: each source keeps a min-heap of its best `per_source` stories,
+    then the final top `limit` is a heap selection over those.
+    """
+    best_story: Dict[str, Row] = {}
+    for row in rows:
+        score, _, _, title = row
+        if ROUNDUP_RE.search(title) or COHORT_RE.search(title):
+            continue
+        key = normalise_title(title) or row[1]
+        kept = best_story.get(key)
+        if kept is None or score > kept[0]:
+            best_story[key] = row
+
+    by_source: Dict[str, list] = {}
+    for row in best_story.values():
+        heap = by_source.setdefault(row[2], [])
+        if len(heap) < per_source:
+            heapq.heappush(heap, row)
+        elif row > heap[0]:
+            heapq.heapreplace(heap, row)
+
+    return heapq.nlargest(limit, (row for heap in by_source.values() for row in heap))
+
+
+def _candidates(ssn, kind: str) -> Iterable[Row]:
+    model, id_col, src_col, _, _ = SECTIONS[kind]
+    stmt = (select(model.score, id_col, src_col, model.title)
+            .where(model.retired_at.is_(None), model.score.isnot(None))
+            .execution_options(yield_per=SCAN_CHUNK))
+    for score, item_id, source, title in ssn.execute(stmt):
+        yield score, item_id, source or "", title or ""
+
+
+def build(edition: datetime.date = None, rebuild: bool = False, db_url: str = DB_URL) -> dict:
+    """Select and store the missing sections of the lineup for `edition` (today); kind → [item ids]."""
+    with Session(create_engine(db_url)) as ssn:
+        return _build(ssn, edition, rebuild)
+
+
+def _build(ssn, edition: datetime.date = None, rebuild: bool = False) -> dict:
+    edition = edition or today()
+    if rebuild:
+        ssn.execute(delete(LineupItem).where(LineupItem.edition == edition))
+    have = load_ids(ssn, edition)
+
+    for kind, (_, _, _, limit, per_source) in SECTIONS.items():
+        if have[kind]:
+            continue
+        chosen = pick(_candidates(ssn, kind), limit, per_source)
+        ssn.add_all(LineupItem(edition=edition, kind=kind, position=i, item_id=item_id, score=score)
+                    for i, (score, item_id, _, _) in enumerate(chosen))
+        print(f"📋 {kind}: {len(chosen)} in the {edition} lineup")
+    ssn.commit()
+    return load_ids(ssn, edition)
+
+
+def load_ids(ssn, edition: datetime.date = None) -> dict:
+    edition = edition or today()
+    rows = ssn.execute(select(LineupItem.kind, LineupItem.item_id)
+                       .where(LineupItem.edition == edition)
+                       .order_by(LineupItem.kind, LineupItem.position))
+    ids = {kind: [] for kind in SECTIONS}
+    for kind, item_id in rows:
+        ids.setdefault(kind, []).append(item_id)
+    return ids
+
+
+def items(ssn, kind: str, edition: datetime.date = None) -> list:
+    """
+    Today's `kind` rows in lineup order, building that section (in `ssn`'s
+    database) if it is missing.
+    """
+    ids = load_ids(ssn, edition)
+    if not ids[kind]:
+        ids = _build(ssn, edition)
+    model, id_col = SECTIONS[kind][:2]
+    by_id = {getattr(r, id_col.key): r
+             for r in ssn.scalars(select(model).where(id_col.in_(ids[kind])))}
+    return [by_id[i] for i in ids[kind] if i in by_id]
+
+
+if __name__ == "__main__":
+    build(rebuild="--rebuild" in sys.argv)
@@ -1,7 +1,7 @@
 from sqlalchemy import create_engine, Column, Text, DateTime, String, LargeBinary
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Integer
-from sqlalchemy import Boolean, DateTime
+from sqlalchemy import Integer, Float
+from sqlalchemy import Boolean, Date, DateTime
 
 Base = declarative_base()
 
@@ -18,6 +18,48 @@ class Article(Base):
     summary      = Column(Text)      # nullable
     image_url   = Column(Text, nullable=True)
     vector       = Column(LargeBinary, nullable=True)
+    chunk_vectors = Column(LargeBinary, nullable=True)  # float32 (n_chunks, 384), row-major
+    retired_at   = Column(DateTime, nullable=True)  # set by housekeeping once an edition has gone out
+
+
+class ExtractionTier(Base):
+    __tablename__ = "extraction_tiers"
+    domain        = Column(String, primary_key=True)
+    tier          = Column(String)                  # lxml / trafilatura / selenium
+    successes     = Column(Integer, default=0)      # wins at `tier` since it was learned
+    failures      = Column(Integer, default=0)      # times every tier came up short
+    updated_at    = Column(DateTime)
+
+
+class SeenEntry(Base):
+    __tablename__ = "seen_entries"
+    key           = Column(String(32), primary_key=True)   # sha256("guid:…"/"link:…"/"title:…")[:32]
+    seen_at       = Column(DateTime)
+
+
+class SourceStats(Base):
+    __tablename__ = "source_stats"
+    name           = Column(String, primary_key=True)   # sources.yaml name
+    last_polled_at = Column(DateTime)
+    next_poll_at   = Column(DateTime)
+    items_per_day  = Column(Float)     # EWMA publish rate seen in the feed
+    new_per_poll   = Column(Float)     # EWMA articles actually stored per poll
+    secs_per_item  = Column(Float)     # EWMA fetch+extract cost per processed entry
+    polls          = Column(Integer, default=0)
+    selenium_fallbacks = Column(Integer, default=0)
+    failures       = Column(Integer, default=0)
+    pending_since  = Column(DateTime)  # never polled yet: first run that wanted it but didn't fetch it
+
+
+class ProviderLatency(Base):
+    __tablename__ = "provider_latency"
+    provider      = Column(String, primary_key=True)   # "gemini", "openrouter", …
+    buckets       = Column(Text)       # JSON counts per src.hedge.BUCKETS_S bound (decayed)
+    successes     = Column(Integer, default=0)
+    failures      = Column(Integer, default=0)
+    wins          = Column(Integer, default=0)      # answered first in a race
+    cancelled     = Column(Integer, default=0)      # lost a race and was cancelled
+    updated_at    = Column(DateTime)
 
 
 class Subscriber(Base):
@@ -27,6 +69,54 @@ class Subscriber(Base):
     subscribed_at = Column(DateTime)
     last_sent     = Column(DateTime)
     token         = Column(String(64))      # for 1-click unsubscribe link
+    bounced_at    = Column(DateTime)        # permanent (5xx) refusal; skipped until re-imported
+
+
+class ProfileScore(Base):
+    __tablename__ = "profile_scores"
+    profile       = Column(String, primary_key=True)       # profiles.yaml name
+    kind          = Column(String(16), primary_key=True)   # "articles" / "videos"
+    item_id       = Column(String, primary_key=True)       # Article.id / Video.video_id
+    score         = Column(Integer)
+
+
+class LineupItem(Base):
+    __tablename__ = "lineup_items"
+    edition       = Column(Date, primary_key=True)
+    kind          = Column(String(16), primary_key=True)   # "articles" / "videos"
+    position      = Column(Integer, primary_key=True)      # 0 = top of the section
+    item_id       = Column(String)     # Article.id / Video.video_id
+    score         = Column(Integer)    # at selection time
+
+
+class ArchiveItem(Base):
+    """Everything an edition sent, kept for good (housekeeping never touches it)."""
+    __tablename__ = "archive_items"
+    kind          = Column(String(16), primary_key=True)   # "articles" / "videos"
+    item_id       = Column(String, primary_key=True)       # Article.id / Video.video_id
+    edition       = Column(Date, index=True)
+    position      = Column(Integer)
+    source        = Column(Text)       # source_name / channel_name
+    title         = Column(Text)
+    summary       = Column(Text)
+    url           = Column(Text)
+    published_at  = Column(DateTime)
+    vector        = Column(LargeBinary, nullable=True)      # float32 (384,), as Article.vector
+    archived_at   = Column(DateTime)
+
+
+class StageRun(Base):
+    """One pipeline stage for one edition (src.pipeline)."""
+    __tablename__ = "stage_runs"
+    edition       = Column(Date, primary_key=True)
+    stage         = Column(String(32), primary_key=True)     # src.pipeline.STAGES key
+    status        = Column(String(16))     # running / partial / done / failed
+    watermark     = Column(Text)           # JSON fingerprint of the stage's inputs
+    outputs       = Column(Text)           # JSON: return value, work left, seconds
+    attempts      = Column(Integer, default=0)
+    started_at    = Column(DateTime)
+    finished_at   = Column(DateTime)
+    error         = Column(Text)
 
 
 class Video(Base):
@@ -42,6 +132,8 @@ class Video(Base):
     summary       = Column(Text,    nullable=True)
     transcript    = Column(Text,    nullable=True)  # for scoring
     vector       = Column(LargeBinary, nullable=True)
+    chunk_vectors = Column(LargeBinary, nullable=True)  # float32 (n_chunks, 384), row-major
+    retired_at    = Column(DateTime, nullable=True)  # set by housekeeping once an edition has gone out
 
 class Tweet(Base):
     __tablename__ = "tweets"
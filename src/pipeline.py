@@ -0,0 +1,277 @@
+"""
+Resumable pipeline: each stage records its run per edition in `stage_runs`.
+
+A failed CI run used to mean re-running everything, harvest included. Now
+every stage is started through this runner, which keeps, per edition date
+and stage: status, attempts, an input watermark (a cheap SQL fingerprint of
+what the stage reads) and its outputs. A stage is skipped when
+
+* it finished (`done`) for this edition,
+* its watermark is unchanged, and
+* it has no pending work left (articles without a vector, lineup items
+  without a summary, subscribers not yet mailed, …).
+
+Otherwise it runs again, and since every stage only touches unfinished rows
+(vector / score / summary IS NULL, last_sent before the edition), that is
+a resume, not a redo. A stage that ends with work left (e.g. both LLMs
+failed for an item) is recorded `partial` and runs again next time.
+The harvest stages are never skipped: what they read is the outside world,
+which no watermark in the DB can vouch for; the feed scheduler already
+leaves alone sources that are not due, and the video scraper only stores
+uploads it has not seen. housekeeping refuses to run before `send` is done for the edition, so a
+crashed run never loses its inputs.
+
+The edition is picked once per invocation and handed to every stage
+(lineup, summarise, render, send, archive): the newest edition whose
+newsletter stages started but whose housekeeping hasn't finished, if it is
+at most RESUME_DAYS old, else today in UTC. A run that crashes before
+midnight and is resumed after it — or simply runs across it — carries on
+with the same lineup and the same `last_sent` cut-off instead of starting a
+new edition. `--edition YYYY-MM-DD` picks one by hand.
+
+    python -m src.pipeline                         # every newsletter stage, in order
+    python -m src.pipeline embed_articles rank_articles
+    python -m src.pipeline --force summarise_articles
+    python -m src.pipeline --edition 2025-06-03 send
+    python -m src.pipeline status [YYYY-MM-DD]
+"""
+
+import datetime
+import importlib
+import json
+import pathlib
+import sys
+import time
+import traceback
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+from src import lineup
+from src.models import StageRun
+
+DB_URL = "sqlite:///newsletter.db"
+RESUME_DAYS = 1     # an unfinished edition is resumed up to a day later, then left
+
+
+def _call(module: str, func: str, with_edition: bool = False) -> Callable:
+    """Import lazily: skipped stages never load their models or clients."""
+    def stage(edition: datetime.date):
+        fn = getattr(importlib.import_module(module), func)
+        return fn(edition) if with_edition else fn()
+    return stage
+
+
+def _newsletter_base(edition: datetime.date) -> str:
+    return f"newsletter_{edition}"
+
+
+def _send(edition: datetime.date):
+    from src import smtp_mailer
+
+    base = _newsletter_base(edition)
+    return smtp_mailer.send(f"{base}.html", f"{base}.txt", edition)
+
+
+def _render_missing(conn, edition: datetime.date) -> int:
+    base = _newsletter_base(edition)
+    return sum(not pathlib.Path(f"{base}{ext}").exists() for ext in (".html", ".txt", ".parts.json"))
+
+
+_LIVE_ARTICLES = "FROM articles WHERE retired_at IS NULL"
+_LIVE_VIDEOS = "FROM videos WHERE retired_at IS NULL"
+_LINEUP = ("SELECT group_concat(item_id) FROM (SELECT item_id FROM lineup_items "
+           "WHERE edition = :edition ORDER BY kind, position)")
+_UNSUMMARISED = ("SELECT count(*) FROM lineup_items l JOIN {table} t ON t.{id} = l.item_id "
+                 "WHERE l.edition = :edition AND l.kind = '{kind}' AND t.summary IS NULL")
+_SUMMARISED = ("SELECT count(*) FROM lineup_items l "
+               "LEFT JOIN articles a ON l.kind = 'articles' AND a.id = l.item_id "
+               "LEFT JOIN videos v ON l.kind = 'videos' AND v.video_id = l.item_id "
+               "WHERE l.edition = :edition AND coalesce(a.summary, v.summary) IS NOT NULL")
+
+Check = Union[None, str, Callable]      # SQL (bound :edition / :since) or fn(conn, edition)
+
+# name → (run(edition), watermark, pending, required stage); in pipeline order
+STAGES: Dict[str, Tuple[Callable, Check, Check, Optional[str]]] = {
+    # harvest.yml
+    "harvest":            (_call("src.articles.run_harvest", "main"), None, None, None),
+    "harvest_videos":     (_call("src.youtube.youtube_scraper", "fetch_videos"), None, None, None),
+    # newsletter.yml
+    "embed_articles":     (_call("src.articles.embed_articles", "main"),
+                           f"SELECT count(*), max(fetched_at) {_LIVE_ARTICLES}",
+                           f"SELECT count(*) {_LIVE_ARTICLES} AND vector IS NULL AND text IS NOT NULL",
+                           None),
+    "rank_articles":      (_call("src.articles.rank", "main"),
+                           f"SELECT count(*), count(vector) {_LIVE_ARTICLES}",
+                           f"SELECT count(*) {_LIVE_ARTICLES} AND score IS NULL",
+                           None),
+    "embed_videos":       (_call("src.youtube.embed_videos", "main"),
+                           f"SELECT count(*), max(rowid) {_LIVE_VIDEOS}",
+                           f"SELECT count(*) {_LIVE_VIDEOS} AND vector IS NULL",
+                           None),
+    "rank_videos":        (_call("src.youtube.youtube_rank", "rank_videos"),
+                           f"SELECT count(*), count(vector) {_LIVE_VIDEOS}",
+                           f"SELECT count(*) {_LIVE_VIDEOS} AND score IS NULL",
+                           None),
+    "lineup":             (_call("src.lineup", "build", with_edition=True),
+                           None,
+                           "SELECT count(*) = 0 FROM lineup_items WHERE edition = :edition",
+                           None),
+    "summarise_articles": (_call("src.articles.summarise", "summarise_batch", with_edition=True),
+                           _LINEUP,
+                           _UNSUMMARISED.format(table="articles", id="id", kind="articles"),
+                           "lineup"),
+    "summarise_videos":   (_call("src.youtube.youtube_summarise", "summarise_batch", with_edition=True),
+                           _LINEUP,
+                           _UNSUMMARISED.format(table="videos", id="video_id", kind="videos"),
+                           "lineup"),
+    "render":             (_call("src.render_newsletter", "build", with_edition=True),
+                           _SUMMARISED,
+                           _render_missing,
+                           "lineup"),
+    "send":               (_send,
+                           None,
+                           # as iter_recipient_pages: bounced addresses are never pending
+                           "SELECT count(*) FROM subscribers WHERE active = 1 AND bounced_at IS NULL "
+                           "AND (last_sent IS NULL OR last_sent < :since)",
+                           "render"),
+    "archive":            (_call("src.archive", "archive", with_edition=True),
+                           _SUMMARISED,
+                           None,
+                           "send"),
+    # retires the edition's inputs: only once everyone has it
+    "housekeeping":       (_call("src.housekeeping", "housekeeping"), None, None, "send"),
+}
+
+# read the feeds / YouTube: always run, a same-day re-harvest only adds what is new
+ALWAYS_RUN = {"harvest", "harvest_videos"}
+
+NEWSLETTER = ["embed_articles", "rank_articles", "embed_videos", "rank_videos", "lineup",
+              "summarise_articles", "summarise_videos", "render", "send", "archive", "housekeeping"]
+
+
+def current_edition(engine) -> datetime.date:
+    """The open edition (see the module docstring), or today in UTC."""
+    today = lineup.today()
+    StageRun.__table__.create(engine, checkfirst=True)
+    with Session(engine) as ssn:
+        closed = (select(StageRun.edition)
+                  .where(StageRun.stage == "housekeeping", StageRun.status == "done"))
+        latest = ssn.scalar(select(func.max(StageRun.edition))
+                            .where(StageRun.stage.in_(NEWSLETTER), StageRun.edition.not_in(closed)))
+    if latest is not None and (today - latest).days <= RESUME_DAYS:
+        return latest
+    return today
+
+
+def _check(conn, check: Check, edition: datetime.date):
+    if check is None:
+        return None
+    if callable(check):
+        return check(conn, edition)
+    params = {"edition": edition.isoformat(),
+              "since": datetime.datetime.combine(edition, datetime.time.min)
+                                        .strftime("%Y-%m-%d %H:%M:%S.%f")}
+    return list(conn.execute(text(check), params).one())
+
+
+def inspect(engine, stage: str, edition: datetime.date) -> Tuple[Optional[str], int]:
+    """The stage's current (watermark JSON, pending work)."""
+    _, watermark, pending, _ = STAGES[stage]
+    with engine.connect() as conn:
+        mark = _check(conn, watermark, edition)
+        left = _check(conn, pending, edition)
+    if isinstance(left, list):
+        left = left[0]
+    return (json.dumps(mark, default=str) if mark is not None else None), int(left or 0)
+
+
+def run(stage: str, edition: datetime.date = None, force: bool = False,
+        db_url: str = DB_URL) -> str:
+    """Run `stage` for `edition` (the open one) unless it is already complete; returns its status."""
+    engine = create_engine(db_url)
+    StageRun.__table__.create(engine, checkfirst=True)
+    edition = edition or current_edition(engine)
+    fn, _, _, requires = STAGES[stage]
+
+    with Session(engine) as ssn:
+        rec = ssn.get(StageRun, (edition, stage))
+        watermark, pending = inspect(engine, stage, edition)
+        if (not force and stage not in ALWAYS_RUN and rec is not None and rec.status == "done"
+                and rec.watermark == watermark and not pending):
+            print(f"⏭️ {stage}: already done for {edition}")
+            return "skipped"
+        if requires and not force:
+            dep = ssn.get(StageRun, (edition, requires))
+            if dep is None or dep.status != "done":
+                print(f"⛔ {stage}: waits for {requires} to finish for {edition}")
+                return "blocked"
+
+        if rec is None:
+            rec = StageRun(edition=edition, stage=stage, attempts=0)
+            ssn.add(rec)
+        if rec.status in ("running", "partial", "failed"):
+            print(f"🔁 {stage}: resuming ({rec.status}, attempt {rec.attempts + 1}, {pending} pending)")
+        rec.status, rec.error, rec.outputs = "running", None, None
+        rec.attempts = (rec.attempts or 0) + 1
+        rec.started_at, rec.finished_at = datetime.datetime.utcnow(), None
+        ssn.commit()
+
+        started = time.monotonic()
+        try:
+            result = fn(edition)
+        except BaseException as e:         # SystemExit from smtp_mailer included
+            rec.status = "failed"
+            rec.error = "".join(traceback.format_exception_only(type(e), e)).strip()[:2000]
+            rec.finished_at = datetime.datetime.utcnow()
+            ssn.commit()
+            raise
+
+        watermark, pending = inspect(engine, stage, edition)
+        rec.status = "partial" if pending else "done"
+        rec.watermark = watermark
+        rec.outputs = json.dumps({"result": result, "pending": pending,
+                                  "seconds": round(time.monotonic() - started, 1)}, default=str)
+        rec.finished_at = datetime.datetime.utcnow()
+        ssn.commit()
+        if pending:
+            print(f"⚠️ {stage}: {pending} item(s) still pending for {edition}")
+        return rec.status
+
+
+def status(edition: datetime.date = None, db_url: str = DB_URL):
+    engine = create_engine(db_url)
+    edition = edition or current_edition(engine)
+    with Session(engine) as ssn:
+        recs = {r.stage: r for r in ssn.scalars(select(StageRun).where(StageRun.edition == edition))}
+    print(f"edition {edition}")
+    for stage in STAGES:
+        r = recs.get(stage)
+        if r is None:
+            print(f"  {stage:<20} -")
+            continue
+        took = json.loads(r.outputs).get("seconds") if r.outputs else None
+        print(f"  {stage:<20} {r.status:<8} attempts={r.attempts}"
+              + (f" {took}s" if took is not None else "") + (f"  {r.error}" if r.error else ""))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["status"]:
+        status(datetime.date.fromisoformat(args[1]) if len(args) > 1 else None)
+        sys.exit()
+    force = "--force" in args
+    edition = None
+    if "--edition" in args[:-1]:
+        i = args.index("--edition")
+        edition, args = datetime.date.fromisoformat(args[i + 1]), args[:i] + args[i + 2:]
+    names = [a for a in args if not a.startswith("--")] or NEWSLETTER
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        sys.exit(f"unknown stage(s) {unknown}; known: {', '.join(STAGES)}")
+    edition = edition or current_edition(create_engine(DB_URL))
+    print(f"📅 edition {edition}")
+    for name in names:
+        if run(name, edition, force=force) == "blocked":
+            sys.exit(1)
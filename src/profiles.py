@@ -0,0 +1,235 @@
+"""
+Multi-profile scoring: one harvest and one embedding run feed many editions.
+
+A profile is a keyword file in the keywords.yaml / youtube_keywords.yaml
+format; sources_and_keywords/profiles.yaml names them. Every article and video
+is scored against all profiles in one pass:
+
+* keywords — the distinct keywords of every profile are matched once per text
+  (an Aho–Corasick automaton when pyahocorasick is installed, otherwise one
+  substring test per distinct keyword); the hit matrix times the (profile,
+  category) membership matrix gives each profile's weighted category hits,
+* semantics — all profiles' category vectors (articles) or query vectors
+  (videos) are stacked, so one matrix product, or one chunk pass for
+  SEMANTIC_MODE=max/topk, covers every profile,
+* source weight and recency per profile, with the formulas of article_score
+  and youtube_rank.batch_scores, so `default` reproduces Article.score and
+  Video.score.
+
+Scores go to profile_scores (profile, kind, item_id) → score.
+
+    python -m src.profiles              # items missing a score for any profile
+    python -m src.profiles --rescore    # every live item
+"""
+
+import datetime
+import sys
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+import yaml
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from src.models import Article, ProfileScore, Video
+from src.vector_store import TOP_K_CHUNKS, chunk_scores, decode_blobs, decode_chunks
+
+try:
+    import ahocorasick
+except ModuleNotFoundError:          # substring test per distinct keyword
+    ahocorasick = None
+
+PROFILES_YAML = Path("sources_and_keywords/profiles.yaml")
+DB_URL        = "sqlite:///newsletter.db"
+CHUNK         = 500
+WRITE_BATCH   = 2000     # score rows per INSERT (4 bound parameters each)
+
+ARTICLE_KEYWORD_FACTOR = 1.2     # article_score
+ARTICLE_HALF_LIFE_H    = 24
+VIDEO_SEMANTIC_FACTOR  = 25      # youtube_rank.batch_scores
+VIDEO_HORIZON_H        = 24
+
+
+class KeywordIndex:
+    """The distinct keywords of many (profile, category) columns, matched in one pass."""
+
+    def __init__(self, columns: Sequence[Sequence[str]]):
+        self.keywords = sorted({k.lower() for col in columns for k in col if k})
+        pos = {k: i for i, k in enumerate(self.keywords)}
+        self.membership = np.zeros((len(self.keywords), len(columns)), dtype=np.float32)
+        for j, col in enumerate(columns):
+            for k in col:
+                if k:
+                    self.membership[pos[k.lower()], j] = 1
+        self.automaton = None
+        if ahocorasick is not None and self.keywords:
+            self.automaton = ahocorasick.Automaton()
+            for i, k in enumerate(self.keywords):
+                self.automaton.add_word(k, i)
+            self.automaton.make_automaton()
+
+    def hits(self, text: str) -> np.ndarray:
+        flat = (text or "").lower()
+        found = np.zeros(len(self.keywords), dtype=np.float32)
+        if self.automaton is not None:
+            for _, i in self.automaton.iter(flat):
+                found[i] = 1
+        else:
+            for i, k in enumerate(self.keywords):
+                if k in flat:
+                    found[i] = 1
+        return found
+
+    def column_hits(self, texts: Sequence[str]) -> np.ndarray:
+        """(n_texts, n_columns) bool: does the text hit any keyword of the column."""
+        if not texts:
+            return np.zeros((0, self.membership.shape[1]), dtype=bool)
+        return (np.stack([self.hits(t) for t in texts]) @ self.membership) > 0
+
+
+def load_profiles(path: Path = PROFILES_YAML) -> Dict[str, dict]:
+    """name → {"articles": cfg, "videos": cfg} with the keyword YAMLs loaded."""
+    if path.exists():
+        spec = yaml.safe_load(path.read_text())["profiles"]
+    else:
+        spec = {"default": {"articles": "sources_and_keywords/keywords.yaml",
+                            "videos": "sources_and_keywords/youtube_keywords.yaml"}}
+    return {name: {kind: yaml.safe_load(Path(files[kind]).read_text()) for kind in ("articles", "videos")}
+            for name, files in spec.items()}
+
+
+class Engine:
+    """
+    All profiles for one kind of item, stacked:
+
+    * `kw_weights`   (n_category_columns, n_profiles) keyword weights,
+    * `queries`      (n_semantic_columns, dim) normalised query vectors,
+    * `sem_weights`  (n_semantic_columns, n_profiles),
+    * `src_weights`  per profile {source: weight}.
+    """
+
+    def __init__(self, kind: str, profiles: Dict[str, dict]):
+        from src.articles.scoring import MODEL, SEMANTIC_WEIGHTS
+
+        self.kind = kind
+        self.names = list(profiles)
+        n = len(self.names)
+        columns, kw_w, texts, sem_w = [], [], [], []
+        for p, name in enumerate(self.names):
+            cfg = profiles[name][kind]
+            for cat in cfg["scoring_categories"]:
+                columns.append(cat["keywords"])
+                kw_w.append((p, cat.get("weight", 1)))
+            if kind == "articles":
+                weights = cfg.get("semantic_weights", SEMANTIC_WEIGHTS)
+                for item in cfg["semantic_keywords"]:
+                    for category, keywords in item.items():
+                        texts.append(" ".join(keywords))
+                        sem_w.append((p, weights.get(category, 0)))
+            else:
+                # youtube_rank: one query from all of the profile's keywords
+                texts.append(" ".join(k for cat in cfg["scoring_categories"] for k in cat["keywords"]))
+                sem_w.append((p, VIDEO_SEMANTIC_FACTOR))
+
+        self.keywords = KeywordIndex(columns)
+        self.kw_weights = np.zeros((len(columns), n))
+        for j, (p, w) in enumerate(kw_w):
+            self.kw_weights[j, p] = w
+        self.queries = np.stack([MODEL.encode([t], normalize_embeddings=True)[0] for t in texts]
+                                ).astype(np.float32)
+        self.sem_weights = np.zeros((len(texts), n))
+        for j, (p, w) in enumerate(sem_w):
+            self.sem_weights[j, p] = w
+        self.src_weights = [profiles[name][kind].get("source_weights", {}) for name in self.names]
+
+    def semantic(self, vectors, chunk_blobs, mode: str, k: int = TOP_K_CHUNKS) -> np.ndarray:
+        """(n_items, n_profiles) weighted semantic term, one product for every profile."""
+        if mode == "mean":
+            # float64, as youtube_rank.semantic_sims and scoring.semantic_score_matrix
+            sims = decode_blobs(vectors).astype(np.float64) @ self.queries.T.astype(np.float64)
+        else:
+            chunks, owner = decode_chunks(chunk_blobs, vectors)
+            sims = chunk_scores(chunks, owner, len(vectors), self.queries, mode, k)
+        return sims.astype(np.float64) @ self.sem_weights
+
+    def source_matrix(self, sources: Sequence[str]) -> np.ndarray:
+        return np.array([[float(w.get(s, 1.0)) for w in self.src_weights] for s in sources])
+
+    def score(self, rows, now: datetime.datetime, mode: str) -> np.ndarray:
+        """(n_items, n_profiles) int scores for Article or Video rows."""
+        hours = np.array([max(0.0, (now - _utc(r.published_at)).total_seconds() / 3600)
+                          if r.published_at else 0.0 for r in rows])
+        sem = self.semantic([r.vector for r in rows], [r.chunk_vectors for r in rows], mode)
+        if self.kind == "articles":
+            kw = self.keywords.column_hits([r.text or "" for r in rows]) @ self.kw_weights
+            raw = self.source_matrix([r.source_name for r in rows]) * (kw * ARTICLE_KEYWORD_FACTOR + sem)
+            raw *= (0.5 ** (hours / ARTICLE_HALF_LIFE_H))[:, None]
+            return np.maximum(1, np.trunc(raw)).astype(np.int64)
+        kw = self.keywords.column_hits([r.transcript or r.description or "" for r in rows]) @ self.kw_weights
+        raw = self.source_matrix([r.channel_name for r in rows]) * (kw + sem)
+        raw *= np.minimum(1.0, VIDEO_HORIZON_H / np.maximum(1.0, hours))[:, None]
+        return raw.astype(np.int64)
+
+
+def _utc(ts: datetime.datetime) -> datetime.datetime:
+    return ts if ts.tzinfo else ts.replace(tzinfo=datetime.timezone.utc)
+
+
+ITEMS = {"articles": (Article, Article.id), "videos": (Video, Video.video_id)}
+
+
+def score_all(rescore: bool = False, mode: str = None, db_url: str = DB_URL,
+              profiles: Dict[str, dict] = None) -> Dict[str, int]:
+    """Score live items against every profile; kind → items scored."""
+    from src.articles.scoring import SEMANTIC_MODE
+
+    mode = mode or SEMANTIC_MODE
+    profiles = profiles or load_profiles()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    done = {}
+    with Session(create_engine(db_url)) as ssn:
+        for kind, (model, id_col) in ITEMS.items():
+            engine = Engine(kind, profiles)
+            stmt = select(model).where(model.retired_at.is_(None))
+            if not rescore:
+                complete = (select(ProfileScore.item_id)
+                            .where(ProfileScore.kind == kind, ProfileScore.profile.in_(engine.names))
+                            .group_by(ProfileScore.item_id)
+                            .having(func.count() == len(engine.names)))
+                stmt = stmt.where(id_col.not_in(complete))
+            # stream CHUNK rows at a time; only the score rows are kept around,
+            # and written once the read cursor is done (as in rank.py)
+            values = []
+            done[kind] = 0
+            for chunk in ssn.scalars(stmt.execution_options(yield_per=CHUNK)).partitions(CHUNK):
+                scores = engine.score(chunk, now, mode)
+                values += [{"profile": name, "kind": kind, "item_id": getattr(r, id_col.key),
+                            "score": int(s)}
+                           for r, row_scores in zip(chunk, scores)
+                           for name, s in zip(engine.names, row_scores)]
+                ssn.expunge_all()
+                done[kind] += len(chunk)
+            for i in range(0, len(values), WRITE_BATCH):
+                ins = insert(ProfileScore).values(values[i:i + WRITE_BATCH])
+                ssn.execute(ins.on_conflict_do_update(
+                    index_elements=["profile", "kind", "item_id"], set_={"score": ins.excluded.score}))
+            ssn.commit()
+            print(f"✅ {kind}: scored {done[kind]} items × {len(engine.names)} profiles")
+    return done
+
+
+def top_items(ssn, profile: str, kind: str, limit: int = 10) -> List[tuple]:
+    """(item_id, score) of a profile's best live items."""
+    model, id_col = ITEMS[kind]
+    return ssn.execute(
+        select(ProfileScore.item_id, ProfileScore.score)
+        .join(model, id_col == ProfileScore.item_id)
+        .where(ProfileScore.profile == profile, ProfileScore.kind == kind, model.retired_at.is_(None))
+        .order_by(ProfileScore.score.desc())
+        .limit(limit)).all()
+
+
+if __name__ == "__main__":
+    score_all(rescore="--rescore" in sys.argv)
@@ -1,80 +1,189 @@
-import datetime, pathlib
+import datetime, hashlib, json, os, pathlib, re
+import premailer
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 from jinja2 import Environment, FileSystemLoader, select_autoescape
-from premailer import transform
+from html import escape
+from premailer import Premailer
 from slugify import slugify
-from src.models import Article, Video
+from src import lineup
 
+# e.g. https://example.com/unsubscribe?token={token}; unset → no unsubscribe link
+UNSUBSCRIBE_URL = os.getenv("UNSUBSCRIBE_URL")
+TOKEN_SLOT      = "%%UNSUBSCRIBE_URL%%"
 
-TODAY = datetime.date.today()
-MAX_PER_SOURCE = 1
+FRAG_RE = re.compile(r"<!--frag:(\w+)-->(.*?)<!--/frag-->", re.S)
+GAP_RE  = re.compile(r"<!--/frag-->(\s*)<!--frag:(\w+)-->")
 
 
-def load_top_articles(limit=5):
+def load_lineup(kind: str, edition: datetime.date):
+    """`edition`'s lineup for `kind`; an item whose summary failed is left out."""
     eng = create_engine("sqlite:///newsletter.db")
     with Session(eng) as ssn:
-        pool = (
-            ssn.query(Article)
-               .order_by(Article.score.desc())
-               .limit(limit * 3)
-               .all()
-        )
-    
-    chosen, seen = [], {}
-
-    for art in pool:
-        cnt = seen.get(art.source_name, 0)
-        if cnt >= MAX_PER_SOURCE:
-            continue        # we already kept 2 from this source
-        seen[art.source_name] = cnt + 1
-        chosen.append(art)
-        if len(chosen) == limit:
-            break
-
-    return chosen
-
-
-def load_top_videos(limit=3):
-    eng = create_engine("sqlite:///newsletter.db")
-    with Session(eng) as ssn:
-        return (
-            ssn.query(Video)
-               .filter(Video.summary.isnot(None))
-               .order_by(Video.score.desc())
-               .limit(limit)
-               .all()
-        )
-
-
-def build():
+        rows = lineup.items(ssn, kind, edition)
+    missing = [r.title for r in rows if not r.summary]
+    for title in missing:
+        print(f"⚠️ no summary, left out: {title[:60]}")
+    return [r for r in rows if r.summary]
+
+
+def split_fragments(html: str):
+    """
+    Cut the inlined document into a skeleton with one <!--slot:kind--> per
+    section, the list of pre-rendered item blocks for each section and the
+    whitespace the template leaves between two of them.
+    """
+    fragments, separators = {}, {}
+
+    def _gap(m):
+        separators.setdefault(m.group(2), m.group(1))
+        return f"<!--/frag--><!--frag:{m.group(2)}-->"
+
+    def _cut(m):
+        kind = m.group(1)
+        first = kind not in fragments
+        fragments.setdefault(kind, []).append(m.group(2))
+        return f"<!--slot:{kind}-->" if first else ""
+
+    skeleton = FRAG_RE.sub(_cut, GAP_RE.sub(_gap, html))
+    return skeleton, fragments, separators
+
+
+# ── compiled template: CSS inlined once per template hash ─────────────────
+CACHE_DIR = pathlib.Path(".cache/premailer")
+PREMAILER_OPTIONS = {"allow_network": False}
+SLOT      = "__CEL_{}__"
+DATE_RE   = re.compile(r"__CEL_DATE\[(.*?)\]__")
+FIELDS    = ("title", "summary", "url", "image_url", "thumbnail_url")
+ATTR_FIELDS = ("url", "image_url", "thumbnail_url")      # rendered inside attribute values
+
+
+class _DateSlot:
+    """Stands in for the edition date; remembers the strftime format used."""
+    def strftime(self, fmt):
+        return f"__CEL_DATE[{fmt}]__"
+
+
+class _ItemSlot:
+    """Stands in for an Article/Video; every field renders as a placeholder."""
+    def __init__(self, with_image: bool):
+        for f in FIELDS:
+            setattr(self, f, SLOT.format(f.upper()))
+        if not with_image:
+            self.image_url = self.thumbnail_url = None
+
+
+def compile_template(env, name="newsletter.html.j2") -> dict:
+    """
+    Render the template with placeholder items, inline its CSS once and cache
+    the result by a hash of everything that shapes it (template, premailer
+    version and options, and this module's slot/fill code):
+        {"skeleton": ..., "items": {kind: {"img": frag, "noimg": frag}},
+     "separators": {kind: whitespace}, "unsubscribe": frag}
+    Google Fonts <link>s are kept as-is, never fetched.
+    """
+    source, _, _ = env.loader.get_source(env, name)
+    key = [source, premailer.__version__, json.dumps(PREMAILER_OPTIONS, sort_keys=True),
+           pathlib.Path(__file__).read_text(encoding="utf-8")]
+    digest = hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()[:16]
+    cached = CACHE_DIR / f"{digest}.json"
+    if cached.exists():
+        return json.loads(cached.read_text(encoding="utf-8"))
+
+    tpl = env.get_template(name)
+    raw = tpl.render(articles=[_ItemSlot(True), _ItemSlot(False)],
+                     videos=[_ItemSlot(True), _ItemSlot(False)],
+                     date=_DateSlot(),
+                     unsubscribe_url=TOKEN_SLOT)
+    inlined = Premailer(raw, **PREMAILER_OPTIONS).transform()
+    skeleton, frags, separators = split_fragments(inlined)
+    compiled = {
+        "skeleton": skeleton,
+        "items": {kind: {"img": frags[kind][0], "noimg": frags[kind][1]}
+                  for kind in ("articles", "videos")},
+        "separators": separators,
+        "unsubscribe": frags["unsubscribe"][0],
+    }
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cached.write_text(json.dumps(compiled), encoding="utf-8")
+    print(f"🎨 compiled {name} ({digest}) → {cached}")
+    return compiled
+
+
+def fill_item(compiled: dict, kind: str, item) -> str:
+    """
+    Drop one item's fields into its pre-inlined fragment, escaped the way
+    lxml serialises them after premailer (benchmarks.render_parity checks it).
+    """
+    has_img = bool(getattr(item, "image_url", None) or getattr(item, "thumbnail_url", None))
+    frag = compiled["items"][kind]["img" if has_img else "noimg"]
+    for f in FIELDS:
+        value = escape(str(getattr(item, f, None) or ""), quote=False)
+        if f in ATTR_FIELDS:
+            value = value.replace('"', "&quot;")
+        if f == "summary":
+            value = value.replace("\n", "<br>")   # as premailer/lxml would serialise it
+        frag = frag.replace(SLOT.format(f.upper()), value)
+    return frag
+
+
+def personalise(parts: dict, token: str = None):
+    """
+    Per-subscriber (html, text) from a parts bundle: only string joins and
+    substitution, no template or CSS work. Without a token (the shared copy)
+    the unsubscribe link is left out.
+    """
+    url = UNSUBSCRIBE_URL.format(token=token) if UNSUBSCRIBE_URL and token else ""
+    html = parts["skeleton"]
+    text_blocks = []
+    for kind, frags in parts["fragments"].items():
+        if kind == "unsubscribe":
+            html = html.replace("<!--slot:unsubscribe-->", frags[0] if url and frags else "", 1)
+            continue
+        sep = parts.get("separators", {}).get(kind, "")
+        html = html.replace(f"<!--slot:{kind}-->", sep.join(frags), 1)
+        text_blocks += parts["text"][kind]
+    text = "\n\n".join(text_blocks)
+    if url:
+        text += f"\n\nUnsubscribe: {url}"
+    return html.replace(TOKEN_SLOT, url), text
+
+
+def build(edition: datetime.date = None):
+    edition = edition or lineup.today()
     env = Environment(
         loader=FileSystemLoader("templates"),
         autoescape=select_autoescape(enabled_extensions=("html",))
     )
-    tpl = env.get_template("newsletter.html.j2")
-    articles = load_top_articles()
+    compiled = compile_template(env, "newsletter.html.j2")
+    articles = load_lineup("articles", edition)
     # tweets   = load_top_tweets()
-    videos = load_top_videos()
-
-
-    raw_html   = tpl.render(articles=articles, 
-                            # tweets=tweets, 
-                            videos=videos,
-                            date=TODAY)
-
-    html_body  = transform(raw_html)        # inline CSS
-    plaintext  = "\n\n".join(
-        [f"{a.title}\n{a.summary}\n{a.url}" for a in articles] +
-        [f"{v.title}\n{v.summary}\n{v.url}" for v in videos]
-        # +
-        # [f"{t.title}\n{t.summary}\n{t.url}" for t in tweets]  # not title something else, we need to generate a title then?
-    )
-
-    base = f"newsletter_{TODAY}"
+    videos = load_lineup("videos", edition)
+
+    # CSS was inlined when the template was compiled; here we only fill slots
+    skeleton = DATE_RE.sub(lambda m: edition.strftime(m.group(1)), compiled["skeleton"])
+    parts = {
+        "skeleton":  skeleton,
+        "separators": compiled["separators"],
+        "fragments": {
+            "articles":    [fill_item(compiled, "articles", a) for a in articles],
+            "videos":      [fill_item(compiled, "videos", v) for v in videos],
+            "unsubscribe": [compiled["unsubscribe"]] if UNSUBSCRIBE_URL else [],
+        },
+        "text": {
+            "articles": [f"{a.title}\n{a.summary}\n{a.url}" for a in articles],
+            "videos":   [f"{v.title}\n{v.summary}\n{v.url}" for v in videos],
+            # [f"{t.title}\n{t.summary}\n{t.url}" for t in tweets]  # not title something else, we need to generate a title then?
+        },
+    }
+
+    html_body, plaintext = personalise(parts)   # shared copy, no token
+
+    base = f"newsletter_{edition}"
     pathlib.Path(f"{base}.html").write_text(html_body,  encoding="utf-8")
     pathlib.Path(f"{base}.txt").write_text(plaintext,  encoding="utf-8")
-    print(f"Generated {base}.html & {base}.txt")
+    pathlib.Path(f"{base}.parts.json").write_text(json.dumps(parts), encoding="utf-8")
+    print(f"Generated {base}.html, {base}.txt & {base}.parts.json")
 
 
 
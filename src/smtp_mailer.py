@@ -1,9 +1,15 @@
-import os, smtplib, ssl, datetime, itertools
+import os, smtplib, ssl, datetime, itertools, socket, threading, time, json, base64, uuid, pathlib, copy
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from sqlalchemy import create_engine, select
+from email.header import Header
+import email.policy
+from sqlalchemy import create_engine, update
 from sqlalchemy.orm import Session
 from src.models import Subscriber
+from src import lineup
+from src.render_newsletter import personalise, UNSUBSCRIBE_URL
+from src.subscribers import ensure_tokens, iter_recipient_pages
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -13,50 +19,276 @@ FROM_ADDR = os.getenv("SMTP_USER")
 HOST      = os.getenv("SMTP_HOST")
 PORT      = int(os.getenv("SMTP_PORT", 587))
 PASS      = os.getenv("SMTP_PASS")
+STARTTLS  = os.getenv("SMTP_STARTTLS", "1") != "0"   # 0 for a local test server
 
-def load_recipients():
+BATCH_SIZE   = 50
+WORKERS      = int(os.getenv("SMTP_WORKERS", 3))     # parallel SMTP connections
+MAX_ATTEMPTS = 4
+MAX_IN_FLIGHT = WORKERS * 4      # batches queued ahead of the SMTP workers
+
+TRANSIENT = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+             socket.timeout, ConnectionError)
+
+
+def edition_start(edition=None) -> datetime.datetime:
+    """Anyone with last_sent (UTC) at/after this already has the edition."""
+    edition = edition or lineup.today()
+    return datetime.datetime.combine(edition, datetime.time.min)
+
+def iter_batches(since=None):
+    """
+    [(email, token)] batches of active subscribers not yet served this
+    edition, streamed page by page in email order (see src.subscribers).
+    """
+    for page in iter_recipient_pages(since or edition_start()):
+        yield from chunk(page, BATCH_SIZE)
+
+def mark_sent(emails, when=None):
+    if not emails:
+        return
+    eng = create_engine("sqlite:///newsletter.db")
+    with Session(eng) as ssn:
+        ssn.execute(
+            update(Subscriber)
+            .where(Subscriber.email.in_(emails))
+            .values(last_sent=when or datetime.datetime.utcnow())
+        )
+        ssn.commit()
+
+def mark_bounced(emails, when=None):
+    """Permanent (5xx) refusals: left out of later sends until re-imported with --reactivate."""
+    if not emails:
+        return
     eng = create_engine("sqlite:///newsletter.db")
     with Session(eng) as ssn:
-        emails = ssn.scalars(
-            select(Subscriber.email)
-            .where(Subscriber.active.is_(True))
-        ).all()
-    return emails
+        ssn.execute(
+            update(Subscriber)
+            .where(Subscriber.email.in_(emails))
+            .values(bounced_at=when or datetime.datetime.utcnow())
+        )
+        ssn.commit()
+    print(f"📭 {len(emails)} recipients refused for good, marked bounced")
 
 def chunk(it, n):
     it = iter(it)
     while (batch := list(itertools.islice(it, n))):
         yield batch
 
-def send(html_path, txt_path):
-    today = datetime.date.today()
-    subj  = f"Chittem ki Chitthi - {today.strftime('%B %d, %Y')}"
+def build_message(html: str, txt: str, subj: str) -> bytes:
+    """Serialise the MIME body once; recipients only go in the envelope (Bcc)."""
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subj
+    msg["From"]    = FROM_ADDR
+    msg.attach(MIMEText(txt,  "plain", "utf-8"))   # base64: no over-long lines
+    msg.attach(MIMEText(html, "html", "utf-8"))
+    return msg.as_bytes(policy=email.policy.SMTP)   # CRLF, as smtplib won't fix bytes
 
-    html = open(html_path).read()
-    txt  = open(txt_path).read()
-    rcpts = load_recipients()  # list of emails
+class PersonalisedMessage:
+    """
+    MIME frame built once; each recipient only costs the string substitution
+    in `personalise` plus a base64 pass over their copy.
+    """
 
-    context = ssl.create_default_context()
-    with smtplib.SMTP(HOST, PORT) as server:
-        server.connect(HOST, PORT)
-        server.ehlo()
-        server.starttls(context=context)
+    def __init__(self, parts: dict, subj: str, tokens: dict = None):
+        self.parts  = parts
+        self.tokens = tokens or {}
+        self.boundary = f"==cel{uuid.uuid4().hex}=="
+        self.head = (
+            f"Subject: {Header(subj, 'utf-8').encode()}\r\n"
+            f"From: {FROM_ADDR}\r\n"
+            "MIME-Version: 1.0\r\n"
+            f'Content-Type: multipart/alternative; boundary="{self.boundary}"\r\n'
+        ).encode()
+
+    def for_batch(self, tokens: dict) -> "PersonalisedMessage":
+        """Same frame, with only this batch's tokens to look up."""
+        bound = copy.copy(self)
+        bound.tokens = tokens
+        return bound
+
+    def _part(self, subtype: str, body: str) -> bytes:
+        return (
+            f"--{self.boundary}\r\n"
+            f'Content-Type: text/{subtype}; charset="utf-8"\r\n'
+            "MIME-Version: 1.0\r\n"
+            "Content-Transfer-Encoding: base64\r\n\r\n"
+        ).encode() + base64.encodebytes(body.encode("utf-8")).replace(b"\n", b"\r\n")
+
+    def __call__(self, rcpt: str) -> bytes:
+        html, txt = personalise(self.parts, self.tokens.get(rcpt))
+        return b"".join([
+            self.head, f"To: {rcpt}\r\n\r\n".encode(),
+            self._part("plain", txt), self._part("html", html),
+            f"--{self.boundary}--\r\n".encode(),
+        ])
+
+def open_connection() -> smtplib.SMTP:
+    server = smtplib.SMTP(HOST, PORT, timeout=60)
+    server.ehlo()
+    if STARTTLS:
+        server.starttls(context=ssl.create_default_context())
         server.ehlo()
+    if PASS:
         server.login(FROM_ADDR, PASS)
+    return server
+
+
+class ConnectionPool:
+    """One authenticated SMTP connection per worker thread, reopened on drop."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def get(self) -> smtplib.SMTP:
+        server = getattr(self._local, "server", None)
+        if server is None:
+            server = open_connection()
+            self._local.server = server
+            with self._lock:
+                self._all.append(server)
+        return server
+
+    def discard(self):
+        server = getattr(self._local, "server", None)
+        self._local.server = None
+        if server is not None:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def close(self):
+        for server in self._all:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+
+class BatchFailed(Exception):
+    """
+    A batch gave up; `sent` lists recipients that did get the edition,
+    `bounced` those refused for good before it did.
+    """
+
+    def __init__(self, cause, sent, bounced=()):
+        super().__init__(str(cause))
+        self.sent = sent
+        self.bounced = list(bounced)
+
+def _permanent(refused: dict) -> list:
+    """Recipients refused with a 5xx; a 4xx is left to the next run."""
+    return [r for r, (code, _) in refused.items() if code >= 500]
+
+def _deliver(server, batch, payload, done: list, refused: dict):
+    """One envelope for the batch, or one per recipient when payload is personalised."""
+    if not callable(payload):
+        refused.update(server.sendmail(FROM_ADDR, batch, payload))
+        if refused:
+            print(f"⚠️ {len(refused)} recipients refused: {', '.join(refused)}")
+        done += [r for r in batch if r not in refused]
+        return
+    for rcpt in batch:
+        if rcpt in done or rcpt in refused:
+            continue            # settled before a retry
+        try:
+            server.sendmail(FROM_ADDR, [rcpt], payload(rcpt))
+            done.append(rcpt)
+        except smtplib.SMTPRecipientsRefused as e:
+            print(f"⚠️ recipient refused: {rcpt}")
+            refused.update(e.recipients)    # don't retry, don't mark as sent
+
+def send_batch(pool: ConnectionPool, batch, payload):
+    """
+    sendmail with retries on transient failures; returns (accepted, bounced)
+    emails. `payload` is the shared message bytes or a callable email → bytes.
+    """
+    done, refused = [], {}
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            _deliver(pool.get(), batch, payload, done, refused)
+            return done, _permanent(refused)
+        except smtplib.SMTPRecipientsRefused as e:
+            print(f"⚠️ all {len(e.recipients)} recipients in batch refused")
+            return [], _permanent(e.recipients)
+        except (smtplib.SMTPResponseException, *TRANSIENT) as e:
+            code = getattr(e, "smtp_code", None)
+            permanent = code is not None and code >= 500
+            if permanent or attempt == MAX_ATTEMPTS:
+                raise BatchFailed(e, done, _permanent(refused)) from e
+            wait = 2 ** attempt
+            print(f"🔄 batch attempt {attempt} failed ({e}); retrying in {wait}s")
+            pool.discard()          # the connection may be half-dead
+            time.sleep(wait)
+
+def send(html_path, txt_path, edition=None):
+    edition = edition or lineup.today()
+    subj  = f"Chittem ki Chitthi - {edition.strftime('%B %d, %Y')}"
+
+    parts_path = pathlib.Path(html_path.replace(".html", ".parts.json"))
+    if UNSUBSCRIBE_URL and parts_path.exists():
+        # per-subscriber copies with their own unsubscribe link
+        parts = json.loads(parts_path.read_text(encoding="utf-8"))
+        payload = PersonalisedMessage(parts, subj)
+        if (created := ensure_tokens(create_engine("sqlite:///newsletter.db"))):
+            print(f"🔑 created unsubscribe tokens for {created} subscribers")
+    else:
+        html = open(html_path).read()
+        txt  = open(txt_path).read()
+        payload = build_message(html, txt, subj)
+
+    pool = ConnectionPool()
+    sent, failed, total = 0, 0, 0
 
-        for batch in chunk(rcpts, 50):
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = subj
-            msg["From"]    = FROM_ADDR
-            # msg["To"] = f"Undisclosed recipients <{FROM_ADDR}>"
-            # msg["Bcc"]     = ", ".join(batch)
+    def settle(fut, batch):
+        nonlocal sent, failed
+        try:
+            accepted, bounced = fut.result()
+        except BatchFailed as e:
+            mark_sent(e.sent)
+            mark_bounced(e.bounced)
+            sent += len(e.sent)
+            failed += len(batch) - len(e.sent)
+            print(f"❌ batch of {len(batch)} failed after {len(e.sent)} sent: {e}")
+            return
+        except Exception as e:
+            failed += len(batch)
+            print(f"❌ batch of {len(batch)} failed: {e}")
+            return
+        # recorded per batch, so a crashed run resumes where it stopped
+        mark_sent(accepted)
+        mark_bounced(bounced)
+        sent += len(accepted)
+        print(f"✅ sent to {len(accepted)} recipients")
 
-            msg.attach(MIMEText(txt,  "plain"))
-            msg.attach(MIMEText(html, "html"))
+    try:
+        with ThreadPoolExecutor(max_workers=WORKERS) as ex:
+            in_flight = {}
+            # recipients stream in pages (only those not yet served); at most
+            # MAX_IN_FLIGHT batches are queued, so memory stays flat
+            for batch in iter_batches(edition_start(edition)):
+                emails = [email for email, _ in batch]
+                total += len(emails)
+                p = payload.for_batch(dict(batch)) if callable(payload) else payload
+                in_flight[ex.submit(send_batch, pool, emails, p)] = emails
+                if len(in_flight) >= MAX_IN_FLIGHT:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        settle(fut, in_flight.pop(fut))
+            for fut in list(in_flight):
+                settle(fut, in_flight.pop(fut))
+    finally:
+        pool.close()
 
-            server.sendmail(FROM_ADDR, batch, msg.as_string())
-            print(f"✅ sent to {len(batch)} recipients")
+    if not total:
+        print("✅ every active subscriber already has this edition")
+        return
+    print(f"📬 delivered to {sent}/{total} recipients ({failed} failed)")
+    if failed:
+        raise SystemExit(1)
 
 if __name__ == "__main__":
-    base = f"newsletter_{datetime.date.today()}"
+    base = f"newsletter_{lineup.today()}"
     send(f"{base}.html", f"{base}.txt")
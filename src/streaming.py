@@ -0,0 +1,24 @@
+"""
+Helpers for walking large tables without holding them in memory.
+"""
+
+from typing import Iterator, List
+
+
+def iter_batches(query, key_col, size: int = 100) -> Iterator[List]:
+    """
+    Keyset-paginate an ORM query: yield lists of at most `size` rows ordered by
+    `key_col`. Each page is a fresh SELECT, so the caller may commit (or expunge)
+    between pages, and rows that drop out of the query's filter after being
+    processed don't shift the pages.
+    """
+    last = None
+    while True:
+        q = query.order_by(key_col)
+        if last is not None:
+            q = q.filter(key_col > last)
+        batch = q.limit(size).all()
+        if not batch:
+            return
+        yield batch
+        last = getattr(batch[-1], key_col.key)
@@ -0,0 +1,251 @@
+"""
+Subscriber management at list scale.
+
+    python -m src.subscribers import list.csv [--reactivate]   # or .jsonl / .txt
+    python -m src.subscribers deactivate emails.txt
+    python -m src.subscribers unsubscribe tokens.txt
+    python -m src.subscribers stats
+
+* import streams the file (CSV with an `email` column or a bare first column,
+  JSONL objects with "email", or one address per line) and upserts it with
+  one `INSERT ... ON CONFLICT` executemany per IMPORT_BATCH rows. New addresses get an
+  unsubscribe token; known ones keep theirs, and stay unsubscribed (or
+  bounced) unless --reactivate is given.
+* deactivate / unsubscribe flip `active` for a batch of emails / tokens per
+  UPDATE.
+* iter_recipients pages through everyone due this edition in email order,
+  leaving out addresses the mail server refused for good (`bounced_at`).
+  Each page is its own short read keyed on the last email seen, so no read
+  transaction stays open while the mailer writes last_sent (SQLite would
+  lock the writer out), and a restarted send simply carries on.
+
+Addresses are stored lower-cased; the primary key is the conflict target.
+"""
+
+import csv
+import datetime
+import itertools
+import json
+import re
+import secrets
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy import create_engine, func, or_, select, text, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from src.models import Subscriber
+
+DB_URL         = "sqlite:///newsletter.db"
+IMPORT_BATCH   = 5_000      # rows per INSERT ... ON CONFLICT executemany + commit
+UPDATE_BATCH   = 900        # emails / tokens per UPDATE ... IN (...)
+RECIPIENT_PAGE = 1_000
+
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+def normalise_email(raw) -> str:
+    return str(raw or "").strip().lower()
+
+
+def new_token() -> str:
+    return secrets.token_hex(16)
+
+
+def _batches(it: Iterable, n: int) -> Iterator[list]:
+    it = iter(it)
+    while (batch := list(itertools.islice(it, n))):
+        yield batch
+
+
+# ── reading lists ────────────────────────────────────────────────────────
+def iter_emails(path: Path) -> Iterator[str]:
+    """Raw addresses from a .csv, .jsonl/.ndjson or one-per-line file, streamed."""
+    path = Path(path)
+    with path.open(newline="", encoding="utf-8") as fh:
+        if path.suffix == ".csv":
+            rows = csv.reader(fh)
+            header = next(rows, [])
+            cols = [h.strip().lower() for h in header]
+            col = cols.index("email") if "email" in cols else 0
+            if "email" not in cols and header:
+                yield header[col]               # no header row: it's data
+            for row in rows:
+                if len(row) > col:
+                    yield row[col]
+        elif path.suffix in (".jsonl", ".ndjson"):
+            for line in fh:
+                if line.strip():
+                    obj = json.loads(line)
+                    yield obj.get("email", "") if isinstance(obj, dict) else obj
+        else:
+            yield from (line for line in fh if line.strip())
+
+
+# ── writes ───────────────────────────────────────────────────────────────
+def upsert(ssn, emails: Iterable[str], reactivate: bool = False,
+           batch: int = IMPORT_BATCH) -> Dict[str, int]:
+    """
+    Bulk-insert `emails`; existing rows keep their token and, unless
+    `reactivate`, their active flag. Returns counts of seen / invalid / new.
+    """
+    counts = {"seen": 0, "invalid": 0, "new": 0}
+    before = ssn.scalar(select(func.count()).select_from(Subscriber))
+    now = datetime.datetime.utcnow()
+
+    def valid():
+        for raw in emails:
+            counts["seen"] += 1
+            email = normalise_email(raw)
+            if _EMAIL_RE.match(email):
+                yield email
+            else:
+                counts["invalid"] += 1
+
+    ins = insert(Subscriber)
+    keep = {"token": func.coalesce(Subscriber.token, ins.excluded.token)}
+    if reactivate:
+        keep["active"] = True
+        keep["bounced_at"] = None
+    stmt = ins.on_conflict_do_update(index_elements=["email"], set_=keep)
+
+    for chunk in _batches(valid(), batch):
+        rows = [{"email": e, "active": True, "subscribed_at": now, "token": new_token()}
+                for e in dict.fromkeys(chunk)]           # dedup within the batch
+        ssn.execute(stmt, rows)                          # one executemany per batch
+        ssn.commit()
+
+    counts["new"] = ssn.scalar(select(func.count()).select_from(Subscriber)) - before
+    return counts
+
+
+def _deactivate_where(ssn, column, values: Iterable[str], batch: int = UPDATE_BATCH) -> int:
+    changed = 0
+    for chunk in _batches(values, batch):
+        changed += ssn.execute(
+            update(Subscriber)
+            .where(column.in_(chunk), Subscriber.active.is_(True))
+            .values(active=False)
+        ).rowcount
+        ssn.commit()
+    return changed
+
+
+def deactivate(ssn, emails: Iterable[str]) -> int:
+    return _deactivate_where(ssn, Subscriber.email, (normalise_email(e) for e in emails))
+
+
+def unsubscribe(ssn, tokens: Iterable[str]) -> int:
+    """The 1-click unsubscribe, for one token or a whole export of them."""
+    return _deactivate_where(ssn, Subscriber.token, (t.strip() for t in tokens if t.strip()))
+
+
+# ── reads ────────────────────────────────────────────────────────────────
+def iter_recipient_pages(since: datetime.datetime, db_url: str = DB_URL,
+                         page: int = RECIPIENT_PAGE) -> Iterator[List[Tuple[str, str]]]:
+    """
+    [(email, token)] pages of active subscribers whose last_sent is before
+    `since`, in email order; every page is a fresh short query.
+    """
+    eng = create_engine(db_url)
+    after = ""
+    while True:
+        with Session(eng) as ssn:
+            rows = ssn.execute(
+                select(Subscriber.email, Subscriber.token)
+                .where(Subscriber.active.is_(True), Subscriber.bounced_at.is_(None))
+                .where(or_(Subscriber.last_sent.is_(None), Subscriber.last_sent < since))
+                .where(Subscriber.email > after)
+                .order_by(Subscriber.email)
+                .limit(page)
+            ).all()
+        if not rows:
+            return
+        yield [tuple(r) for r in rows]
+        after = rows[-1][0]
+
+
+def iter_recipients(since: datetime.datetime, db_url: str = DB_URL) -> Iterator[Tuple[str, str]]:
+    for rows in iter_recipient_pages(since, db_url):
+        yield from rows
+
+
+# ── schema helpers (run from init_db) ────────────────────────────────────
+def ensure_indexes(engine):
+    """The 1-click unsubscribe looks rows up by token."""
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_subscribers_token ON subscribers (token)"))
+
+
+def lowercase_emails(engine) -> int:
+    """
+    Older rows kept their original case; ON CONFLICT needs one spelling.
+    Where an active mixed-case row has a lower-case twin, the twin takes over:
+    it keeps the older row's token (its links have been out longer), the
+    earliest subscribed_at and the latest last_sent, and the mixed-case row
+    is deactivated so the address gets one copy.
+    """
+    same = "lower(d.email) = subscribers.email"
+    twins = f"{same} AND d.email != subscribers.email AND d.active"
+    with engine.begin() as conn:
+        renamed = conn.execute(text(
+            "UPDATE subscribers SET email = lower(email) "
+            "WHERE email != lower(email) "
+            "AND lower(email) NOT IN (SELECT email FROM subscribers) "
+            # one spelling per address, or the rename itself collides
+            "AND rowid = (SELECT min(rowid) FROM subscribers d "
+            "             WHERE lower(d.email) = lower(subscribers.email))"
+        )).rowcount
+        merged = conn.execute(text(
+            "UPDATE subscribers SET "
+            f"token = coalesce((SELECT d.token FROM subscribers d WHERE {same} "
+            "                  AND (d.email = subscribers.email OR d.active) AND d.token != '' "
+            "                  ORDER BY d.subscribed_at IS NOT NULL, d.subscribed_at, d.rowid "
+            "                  LIMIT 1), token), "
+            f"subscribed_at = (SELECT min(d.subscribed_at) FROM subscribers d WHERE {same}), "
+            f"last_sent = (SELECT max(d.last_sent) FROM subscribers d WHERE {same}) "
+            "WHERE email = lower(email) "
+            f"AND EXISTS (SELECT 1 FROM subscribers d WHERE {twins})"
+        )).rowcount
+        conn.execute(text(
+            "UPDATE subscribers SET active = 0 "
+            "WHERE email != lower(email) AND active "
+            "AND lower(email) IN (SELECT email FROM subscribers)"
+        ))
+        return renamed + merged
+
+
+def ensure_tokens(engine) -> int:
+    """Rows from before tokens existed get one, or their unsubscribe link has nowhere to go."""
+    with engine.begin() as conn:
+        # randomblob is evaluated per row: the same 32 hex digits as new_token()
+        return conn.execute(text(
+            "UPDATE subscribers SET token = lower(hex(randomblob(16))) "
+            "WHERE token IS NULL OR token = ''"
+        )).rowcount
+
+
+def stats(ssn) -> dict:
+    rows = ssn.execute(select(Subscriber.active, func.count()).group_by(Subscriber.active)).all()
+    counts = {("active" if active else "inactive"): n for active, n in rows}
+    counts["bounced"] = ssn.scalar(select(func.count()).select_from(Subscriber)
+                                   .where(Subscriber.bounced_at.isnot(None)))
+    return counts
+
+
+if __name__ == "__main__":
+    cmd, *args = sys.argv[1:] or ["help"]
+    paths = [a for a in args if not a.startswith("--")]
+    with Session(create_engine(DB_URL)) as ssn:
+        if cmd == "import" and paths:
+            print(f"✅ {upsert(ssn, iter_emails(paths[0]), reactivate='--reactivate' in args)}")
+        elif cmd in ("deactivate", "unsubscribe") and paths:
+            with open(paths[0], encoding="utf-8") as fh:
+                fn = deactivate if cmd == "deactivate" else unsubscribe
+                print(f"✅ {cmd}d {fn(ssn, fh)} subscribers")
+        elif cmd == "stats":
+            print(stats(ssn))
+        else:
+            print(__doc__)
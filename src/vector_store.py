@@ -0,0 +1,307 @@
+"""
+Contiguous, memory-mapped embedding matrix with an id mapping.
+
+The float32 blobs in Article.vector / Video.vector stay the source of truth
+(newsletter.db is the only thing CI persists). This store is a derived copy:
+`sync_from_db` streams the blobs into one row-major float16 (or int8 +
+per-row scale) matrix on disk, and `load` maps it back without copying, so
+scoring, dedup and "related stories" become matrix operations.
+
+Files for a store called "articles" under vectors/:
+    articles.vec         raw matrix, rows in id order
+    articles.scale.npy   per-row float32 scales (int8 only)
+    articles.ids.json    {"dim": .., "dtype": .., "ids": [...]}
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+VECTOR_DIR = Path("vectors")
+DIM        = 384          # all-MiniLM-L6-v2
+DTYPES     = ("float16", "int8")
+
+
+def decode_blobs(blobs: Sequence[Optional[bytes]], dim: int = DIM) -> np.ndarray:
+    """
+    Stack float32 blobs into one (n, dim) matrix with a single join + view.
+    Missing or short blobs become zero rows (same as semantic_scores did).
+    """
+    empty = bytes(dim * 4)
+    joined = b"".join(b if b and len(b) == dim * 4 else empty for b in blobs)
+    return np.frombuffer(joined, dtype=np.float32).reshape(-1, dim)
+
+
+# ── chunk-level vectors ──────────────────────────────────────────────────
+# Each row's `chunk_vectors` blob holds its per-chunk embeddings back to back.
+# Scoring in "max"/"topk" mode compares every chunk of every row against the
+# queries in one matrix product and reduces per row, instead of trusting the
+# mean-pooled `vector`.
+CHUNK_MODES  = ("mean", "max", "topk")
+TOP_K_CHUNKS = 3
+# nothing reads chunk_vectors under SEMANTIC_MODE=mean, so the embedders only
+# store them for max/topk (rows without them score on their mean vector)
+KEEP_CHUNKS  = os.getenv("SEMANTIC_MODE", "mean") in ("max", "topk")
+
+
+def decode_chunks(chunk_blobs: Sequence[Optional[bytes]],
+                  fallback_blobs: Optional[Sequence[Optional[bytes]]] = None,
+                  dim: int = DIM) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stack the chunks of many rows into one (total_chunks, dim) matrix and an
+    `owner` array with the row index of each chunk (sorted, rows in order).
+    Rows without chunk_vectors fall back to their mean vector as one chunk;
+    rows with neither own no chunks.
+    """
+    size = dim * 4
+    fallback_blobs = fallback_blobs or [None] * len(chunk_blobs)
+    parts, counts = [], []
+    for cb, vb in zip(chunk_blobs, fallback_blobs):
+        if cb and len(cb) % size == 0:
+            parts.append(cb)
+            counts.append(len(cb) // size)
+        elif vb and len(vb) == size:
+            parts.append(vb)
+            counts.append(1)
+        else:
+            counts.append(0)
+    matrix = np.frombuffer(b"".join(parts), dtype=np.float32).reshape(-1, dim)
+    owner = np.repeat(np.arange(len(counts)), counts)
+    return matrix, owner
+
+
+def chunk_scores(chunks: np.ndarray, owner: np.ndarray, n_rows: int,
+                 queries: np.ndarray, mode: str = "max",
+                 k: int = TOP_K_CHUNKS) -> np.ndarray:
+    """
+    (n_rows, n_queries) similarities from chunk vectors: the best chunk per
+    row ("max") or the mean of its k best chunks ("topk"). Rows without
+    chunks score 0.
+    """
+    if mode not in ("max", "topk"):
+        raise ValueError(f"chunk mode must be 'max' or 'topk', not {mode!r}")
+    q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    out = np.zeros((n_rows, q.shape[0]), dtype=np.float32)
+    if not len(owner):
+        return out
+
+    sims = chunks @ q.T                      # every chunk of every row at once
+    counts = np.bincount(owner, minlength=n_rows)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    has = counts > 0
+    if mode == "max" or k == 1:
+        out[has] = np.maximum.reduceat(sims, starts[has], axis=0)
+        return out
+
+    # pad to (rows, longest row, queries) so the top-k is one sort
+    pos = np.arange(len(owner)) - starts[owner]
+    padded = np.full((n_rows, counts.max(), q.shape[0]), -np.inf, dtype=np.float32)
+    padded[owner, pos] = sims
+    top = -np.sort(-padded, axis=1)[:, :k]
+    finite = np.isfinite(top)
+    total = np.where(finite, top, 0).sum(axis=1)
+    n = finite.sum(axis=1)
+    np.divide(total, n, out=out, where=n > 0)
+    return out
+
+
+class VectorStore:
+    def __init__(self, name: str, root: Path = VECTOR_DIR,
+                 dtype: str = "float16", dim: int = DIM):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}")
+        self.name  = name
+        self.root  = Path(root)
+        self.dtype = dtype
+        self.dim   = dim
+        self.ids: List[str] = []
+        self.index: dict = {}
+        self.matrix: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+
+    # ── paths ────────────────────────────────────────────────────────────
+    @property
+    def vec_path(self) -> Path:
+        return self.root / f"{self.name}.vec"
+
+    @property
+    def ids_path(self) -> Path:
+        return self.root / f"{self.name}.ids.json"
+
+    @property
+    def scale_path(self) -> Path:
+        return self.root / f"{self.name}.scale.npy"
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ── writing ──────────────────────────────────────────────────────────
+    def sync_from_db(self, ssn, model, id_attr: str = "id", batch: int = 1_000) -> "VectorStore":
+        """
+        Rebuild the store from `model.vector` blobs, streaming `batch` rows at a
+        time straight into the on-disk matrix. `id_attr` is an attribute name
+        or a column expression (e.g. the table's rowid).
+        """
+        id_col  = getattr(model, id_attr) if isinstance(id_attr, str) else id_attr
+        query   = (ssn.query(id_col, model.vector)
+                      .filter(model.vector.isnot(None))
+                      .order_by(id_col))
+        n = query.count()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.vec_path.with_suffix(".vec.tmp")
+        np_dtype = np.float16 if self.dtype == "float16" else np.int8
+        out = np.memmap(tmp, dtype=np_dtype, mode="w+", shape=(max(n, 1), self.dim))
+        scales = np.ones(max(n, 1), dtype=np.float32)
+
+        ids, row, pending_ids, pending_blobs = [], 0, [], []
+        for rid, blob in query.yield_per(batch):
+            pending_ids.append(rid)
+            pending_blobs.append(blob)
+            if len(pending_blobs) == batch:
+                row = self._write_rows(out, scales, row, pending_blobs)
+                ids += pending_ids
+                pending_ids, pending_blobs = [], []
+        if pending_blobs:
+            row = self._write_rows(out, scales, row, pending_blobs)
+            ids += pending_ids
+        out.flush()
+        del out
+
+        os.replace(tmp, self.vec_path)
+        if self.dtype == "int8":
+            np.save(self.scale_path, scales[:n])
+        self.ids_path.write_text(json.dumps({"dim": self.dim, "dtype": self.dtype, "ids": ids}))
+        print(f"🧮 vector store '{self.name}': {n} × {self.dim} {self.dtype}")
+        return self.load()
+
+    def _write_rows(self, out, scales, row, blobs) -> int:
+        block = decode_blobs(blobs, self.dim)
+        end = row + len(block)
+        if self.dtype == "float16":
+            out[row:end] = block.astype(np.float16)
+        else:
+            s = np.abs(block).max(axis=1) / 127.0
+            s[s == 0] = 1.0
+            out[row:end] = np.round(block / s[:, None]).astype(np.int8)
+            scales[row:end] = s
+        return end
+
+    # ── reading ──────────────────────────────────────────────────────────
+    def load(self) -> "VectorStore":
+        """Memory-map the matrix (zero-copy); an absent store loads empty."""
+        if not self.ids_path.exists():
+            self.ids, self.index, self.matrix = [], {}, np.zeros((0, self.dim), np.float32)
+            return self
+        meta = json.loads(self.ids_path.read_text())
+        self.dim, self.dtype, self.ids = meta["dim"], meta["dtype"], meta["ids"]
+        self.index = {rid: i for i, rid in enumerate(self.ids)}
+        np_dtype = np.float16 if self.dtype == "float16" else np.int8
+        if self.ids:
+            self.matrix = np.memmap(self.vec_path, dtype=np_dtype, mode="r",
+                                    shape=(len(self.ids), self.dim))
+        else:
+            self.matrix = np.zeros((0, self.dim), np_dtype)
+        self.scales = np.load(self.scale_path) if self.dtype == "int8" and self.ids else None
+        return self
+
+    def rows(self, ids: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        float32 matrix for `ids` (zero rows for unknown ids) and a bool mask of
+        which ids were found.
+        """
+        ids = list(ids)
+        pos = np.array([self.index.get(i, -1) for i in ids], dtype=np.int64)
+        found = pos >= 0
+        out = np.zeros((len(ids), self.dim), dtype=np.float32)
+        if found.any():
+            out[found] = self._dequantize(pos[found])
+        return out, found
+
+    def _dequantize(self, pos: np.ndarray) -> np.ndarray:
+        block = np.asarray(self.matrix[pos], dtype=np.float32)
+        if self.scales is not None:
+            block *= self.scales[pos][:, None]
+        return block
+
+    # ── similarity ───────────────────────────────────────────────────────
+    def similarities(self, queries: np.ndarray) -> np.ndarray:
+        """(n_items, n_queries) dot products against every stored vector."""
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not self.ids:
+            return np.zeros((0, q.shape[0]), dtype=np.float32)
+        sims = np.asarray(self.matrix, dtype=np.float32) @ q.T
+        if self.scales is not None:
+            sims *= self.scales[:, None]
+        return sims
+
+    def search(self, query: np.ndarray, k: int = 10,
+               exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """Top-k (id, score) by dot product (= cosine, vectors are normalised)."""
+        sims = self.similarities(query)[:, 0]
+        for rid in exclude:
+            if rid in self.index:
+                sims[self.index[rid]] = -np.inf
+        k = min(k, len(sims))
+        if k <= 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(self.ids[i], float(sims[i])) for i in top if np.isfinite(sims[i])]
+
+    def related(self, rid: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Stories closest to an already-stored item."""
+        if rid not in self.index:
+            return []
+        vec = self._dequantize(np.array([self.index[rid]]))[0]
+        return self.search(vec, k, exclude=[rid])
+
+    def near_duplicates(self, threshold: float = 0.92) -> List[Tuple[str, str, float]]:
+        """Pairs of stored items whose cosine similarity is ≥ threshold."""
+        if len(self.ids) < 2:
+            return []
+        mat = np.asarray(self.matrix, dtype=np.float32)
+        if self.scales is not None:
+            mat = mat * self.scales[:, None]
+        sims = np.triu(mat @ mat.T, k=1)
+        a, b = np.nonzero(sims >= threshold)
+        return [(self.ids[i], self.ids[j], float(sims[i, j])) for i, j in zip(a, b)]
+
+
+def sync_all(db_url: str = "sqlite:///newsletter.db") -> dict:
+    """Rebuild the article and video stores from the DB blobs."""
+    import sqlalchemy as sa
+    from sqlalchemy.orm import Session
+    from src.models import Article, Video
+
+    eng = sa.create_engine(db_url)
+    with Session(eng) as ssn:
+        return {
+            "articles": VectorStore("articles").sync_from_db(ssn, Article, "id"),
+            "videos":   VectorStore("videos").sync_from_db(ssn, Video, "video_id"),
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python -m src.vector_store                    → rebuild both stores
+    # python -m src.vector_store related <id> [k]   → nearest stored articles
+    # python -m src.vector_store dups [threshold]   → near-duplicate article pairs
+    if len(sys.argv) > 2 and sys.argv[1] == "related":
+        store = VectorStore("articles").load()
+        k = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+        for rid, score in store.related(sys.argv[2], k):
+            print(f"{score:.3f}  {rid}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "dups":
+        store = VectorStore("articles").load()
+        thr = float(sys.argv[2]) if len(sys.argv) > 2 else 0.92
+        for a, b, score in store.near_duplicates(thr):
+            print(f"{score:.3f}  {a}  {b}")
+    else:
+        sync_all()
@@ -0,0 +1,150 @@
+"""
+Caption payload → plain transcript text.
+
+One streaming parser per format YouTube serves:
+
+* json3   – the "events" array is decoded one event at a time,
+* srv3    – XML (<timedtext><body><p><s>…), also the legacy <transcript><text>,
+            walked with iterparse and cleared as we go,
+* vtt/srt – read cue by cue; headers, cue numbers, timing lines and cue
+            settings are skipped and inline tags (<00:00:01.120>, <c>, <i>,
+            <v Speaker>, {\\an8}) removed.
+
+Auto-generated ("rolling") captions repeat each line in the next one or two
+cues; `dedupe_lines` drops those repeats so they don't inflate the embedding
+and LLM input.
+"""
+
+from __future__ import annotations
+
+import html
+import io
+import json
+import re
+from collections import deque
+from typing import Iterable, Iterator, Optional
+from xml.etree import ElementTree as ET
+
+FORMATS = ("json3", "srv3", "vtt", "srt")
+
+ROLLING_WINDOW = 3        # a line equal to one of the last N kept lines is a repeat
+
+_TAG_RE    = re.compile(r"<[^>]*>|\{\\[^}]*\}")
+_SPACE_RE  = re.compile(r"\s+")
+_TIMING_RE = re.compile(r"-->")
+
+
+def _clean(line: str) -> str:
+    if "<" in line or "{" in line:
+        line = _TAG_RE.sub("", line)
+    if "&" in line:
+        line = html.unescape(line)
+    return _SPACE_RE.sub(" ", line).strip()
+
+
+# ── json3 ────────────────────────────────────────────────────────────────
+def iter_json3(raw: str) -> Iterator[str]:
+    """Lines of a json3 payload, decoding `events` one object at a time."""
+    dec = json.JSONDecoder()
+    key = raw.find('"events"')
+    if key < 0:
+        return
+    pos = raw.find("[", key) + 1
+    if pos == 0:
+        return
+    n = len(raw)
+    while pos < n:
+        while pos < n and raw[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= n or raw[pos] == "]":
+            return
+        try:
+            event, pos = dec.raw_decode(raw, pos)
+        except json.JSONDecodeError:
+            return              # truncated payload: keep what we have
+        segs = event.get("segs") if isinstance(event, dict) else None
+        if not segs:
+            continue
+        text = "".join(seg.get("utf8", "") for seg in segs)
+        for line in text.split("\n"):
+            yield line
+
+
+# ── srv3 / XML ───────────────────────────────────────────────────────────
+def iter_srv3(raw: str) -> Iterator[str]:
+    """Lines of srv3 (<p>) or legacy timedtext (<text>) XML."""
+    try:
+        for _, elem in ET.iterparse(io.StringIO(raw), events=("end",)):
+            if elem.tag in ("p", "text"):
+                text = "".join(elem.itertext())
+                elem.clear()
+                for line in text.split("\n"):
+                    yield line
+    except ET.ParseError:
+        return                  # truncated/invalid tail: keep what we have
+
+
+# ── WebVTT / SRT ─────────────────────────────────────────────────────────
+def iter_cues(raw: str) -> Iterator[str]:
+    """
+    Text lines of WebVTT or SRT cues. Both are blank-line separated blocks;
+    only blocks with a timing line are cues, and only the lines after it are
+    text (whatever precedes it is a cue id / SRT index). Header, NOTE, STYLE
+    and REGION blocks have no timing line and are skipped.
+    """
+    block = []
+    for ln in io.StringIO(raw):
+        ln = ln.rstrip("\r\n")
+        if ln:                  # YouTube's rolling cues contain " " lines
+            block.append(ln.strip())
+            continue
+        yield from _cue_text(block)
+        block = []
+    yield from _cue_text(block)
+
+
+def _cue_text(block):
+    for i, ln in enumerate(block):
+        if _TIMING_RE.search(ln):
+            return block[i + 1:]
+    return ()
+
+
+# ── shared ───────────────────────────────────────────────────────────────
+def dedupe_lines(lines: Iterable[str], window: int = ROLLING_WINDOW) -> Iterator[str]:
+    """Clean each line and drop empties and rolling-caption repeats."""
+    recent: deque = deque(maxlen=window)
+    for line in lines:
+        line = _clean(line)
+        if not line or line in recent:
+            continue
+        recent.append(line)
+        yield line
+
+
+def sniff_format(raw: str) -> str:
+    head = raw[:512].lstrip("﻿ \t\r\n")
+    if head.startswith("{"):
+        return "json3"
+    if head.startswith("<"):
+        return "srv3"
+    if head.startswith("WEBVTT"):
+        return "vtt"
+    return "srt"
+
+
+_PARSERS = {"json3": iter_json3, "srv3": iter_srv3, "vtt": iter_cues, "srt": iter_cues}
+
+
+def iter_caption_lines(raw: str, fmt: Optional[str] = None) -> Iterator[str]:
+    """Clean, de-duplicated transcript lines; `fmt` is sniffed when unknown."""
+    if fmt not in _PARSERS:
+        fmt = sniff_format(raw)
+    return dedupe_lines(_PARSERS[fmt](raw))
+
+
+def parse_captions(raw: str, fmt: Optional[str] = None) -> str:
+    """Convert a caption payload (.json3/.srv3/.vtt/.srt) → plain text."""
+    if not raw:
+        return ""
+    return "\n".join(iter_caption_lines(raw, fmt))
@@ -1,64 +1,65 @@
 """
 Embed each video's transcript (or description) by splitting into
-~750-word chunks, encoding with MiniLM, and mean-pooling.
-Stores the float32 vector in Video.vector.
+model-sized token chunks (src.chunking), encoding with MiniLM, and mean-pooling.
+Stores the float32 vector in Video.vector and, when SEMANTIC_MODE=max/topk
+scores on them, the per-chunk vectors (up to MAX_STORED_CHUNKS, so long
+interviews aren't cut after a few chunks) in Video.chunk_vectors.
 """
 
 import numpy as np, sqlalchemy as sa
 from sqlalchemy.orm import Session
 from sentence_transformers import SentenceTransformer
+from src.chunking import chunk_for, encode_chunks
 from src.models import Video
-from src.youtube.youtube_utils import get_video_transcript
-import time
+from src.streaming import iter_batches
+from src.vector_store import KEEP_CHUNKS, VectorStore
+from src.youtube.youtube_utils import refresh_transcripts
 
 EMB_MODEL       = "sentence-transformers/all-MiniLM-L6-v2"
-MAX_WORDS_CHUNK = 750      # ≈512 tokens
-MAX_CHUNKS      = 6        # first 5 chunks ≈3 750 words
+MAX_CHUNKS      = 6        # 254-token chunks (~190 words each): the mean covers ~1.1k words
+MAX_STORED_CHUNKS = 128    # ≈24k words: most of a three-hour interview
 BATCH_SIZE      = 32
 
 model = SentenceTransformer(EMB_MODEL)
 
-def chunk_text(txt: str):
-    words = txt.split()
-    for i in range(0, len(words), MAX_WORDS_CHUNK):
-        yield " ".join(words[i : i + MAX_WORDS_CHUNK])
-
 def main():
     eng = sa.create_engine("sqlite:///newsletter.db")
+    total = 0
     with Session(eng) as ssn:
         vids = (
             ssn.query(Video)
                .filter(Video.vector.is_(None))
-               .all()
+               .filter(Video.retired_at.is_(None))
         )
-        total = len(vids)
-        for i in range(0, total, BATCH_SIZE):
-            batch = vids[i : i + BATCH_SIZE]
+        for batch in iter_batches(vids, Video.video_id, BATCH_SIZE):
+            # missing transcripts for the whole batch, one Tor circuit per worker
+            refresh_transcripts([v for v in batch if not (v.transcript and v.transcript.strip())])
+            # only chunk scoring needs more than the MAX_CHUNKS the mean uses
+            limit = MAX_STORED_CHUNKS if KEEP_CHUNKS else MAX_CHUNKS
             texts = []
             for v in batch:
-                if v.transcript and v.transcript.strip():
-                    txt = v.transcript
-                else:
-                    time.sleep(3)
-                    txt = get_video_transcript(v)  # fetches & writes v.transcript
-                chunks = list(chunk_text(txt))[:MAX_CHUNKS] or [txt[:1000]]
+                chunks = chunk_for(model, v.transcript or "", limit) or [[]]
                 texts.append(chunks)
             # Flatten and encode
             flat_chunks = [c for sub in texts for c in sub]
-            vecs        = model.encode(flat_chunks, normalize_embeddings=True)
+            vecs        = encode_chunks(model, flat_chunks)
 
-            # mean-pool back to per-video
+            # mean-pool the first MAX_CHUNKS back to per-video, keep every chunk if asked
             idx = 0
             for v, chunk_list in zip(batch, texts):
                 k = len(chunk_list)
                 v.vector = (
-                    np.mean(vecs[idx : idx + k], axis=0)
+                    np.mean(vecs[idx : idx + min(k, MAX_CHUNKS)], axis=0)
                     .astype(np.float32)
                     .tobytes()
                 )
+                v.chunk_vectors = vecs[idx : idx + k].tobytes() if KEEP_CHUNKS else None
                 idx += k
             ssn.commit()
             print(f"embedded video {v.title}")
+            ssn.expunge_all()
+            total += len(batch)
+        VectorStore("videos").sync_from_db(ssn, Video, "video_id")
     print(f"✅ embedded {total} videos")
 
 if __name__ == "__main__":
@@ -0,0 +1,163 @@
+"""
+Isolated Tor circuits, one per transcript worker.
+
+Tor isolates SOCKS streams by their credentials (IsolateSOCKSAuth, on by
+default for every SocksPort): connections that authenticate with a different
+username/password never share a circuit. So each worker gets its own —
+
+    socks5h://yt-<run>-w<worker>-<generation>:x@127.0.0.1:9050
+
+— and rotating a worker that got a 403/429 only bumps its generation: its next
+connection builds a fresh circuit (normally through another exit) while the
+other workers keep theirs, in-flight requests included. The old global NEWNYM,
+on a new control connection every time, is gone. With stem and a ControlPort
+the burned circuit is also closed, over one control connection held for the
+pool's lifetime; without them rotation still works, the circuit just idles out.
+
+    TOR_SOCKS_HOST / TOR_SOCKS_PORT     127.0.0.1 / 9050 (9150 for Tor Browser)
+    TOR_CONTROL_PORT                    9051; "" to skip the control port
+    TOR_CONTROL_PASSWORD
+    TRANSCRIPT_WORKERS                  circuits (and fetch threads), 4
+
+Any SOCKS5 server with username/password auth can stand in for Tor.
+"""
+
+import os
+import queue
+import secrets
+import threading
+from contextlib import contextmanager, suppress
+from typing import Dict, Iterator, Optional
+
+try:
+    from stem.control import Controller  # type: ignore
+except ModuleNotFoundError:              # rotation by credentials alone
+    Controller = None
+
+TOR_SOCKS_HOST     = os.getenv("TOR_SOCKS_HOST", "127.0.0.1")
+TOR_SOCKS_PORT     = int(os.getenv("TOR_SOCKS_PORT", "9050"))
+TOR_CONTROL_PORT   = os.getenv("TOR_CONTROL_PORT", "9051")
+TOR_CONTROL_PASSWORD = os.getenv("TOR_CONTROL_PASSWORD")
+TRANSCRIPT_WORKERS = int(os.getenv("TRANSCRIPT_WORKERS", "4"))
+
+DEBUG = os.getenv("YT_CAPTION_DEBUG", "0") != "0"
+
+
+class Circuit:
+    """One worker's isolated circuit, identified by its SOCKS credentials."""
+
+    def __init__(self, pool: "CircuitPool", worker: int):
+        self.pool = pool
+        self.worker = worker
+        self.generation = 0
+
+    @property
+    def username(self) -> str:
+        return f"yt-{self.pool.run}-w{self.worker}-{self.generation}"
+
+    @property
+    def proxy_url(self) -> str:
+        return f"socks5h://{self.username}:x@{self.pool.host}:{self.pool.port}"
+
+    @property
+    def proxies(self) -> Dict[str, str]:
+        return {"http": self.proxy_url, "https": self.proxy_url}
+
+    def rotate(self, reason: str = ""):
+        """New credentials → new circuit for this worker only."""
+        burned = self.username
+        self.generation += 1
+        self.pool.rotations += 1
+        closed = self.pool.close_circuits(burned)
+        if DEBUG:
+            print(f"[Tor] w{self.worker} rotated ({reason}); closed {closed} circuit(s)")
+
+
+class CircuitPool:
+    """
+    `size` circuits handed out one per worker:
+
+        with pool.circuit() as c:
+            requests.get(url, proxies=c.proxies)
+    """
+
+    def __init__(self, size: int = TRANSCRIPT_WORKERS, host: str = TOR_SOCKS_HOST,
+                 port: int = TOR_SOCKS_PORT, control_port: Optional[str] = TOR_CONTROL_PORT,
+                 password: Optional[str] = TOR_CONTROL_PASSWORD):
+        self.size = size
+        self.host, self.port = host, port
+        self.control_port = int(control_port) if control_port else None
+        self.password = password
+        self.run = secrets.token_hex(3)     # never pick up a previous run's circuits
+        self.rotations = 0
+        self._free: "queue.Queue[Circuit]" = queue.Queue()
+        for i in range(size):
+            self._free.put(Circuit(self, i))
+        self._ctl = None
+        self._ctl_lock = threading.Lock()
+
+    @contextmanager
+    def circuit(self) -> Iterator[Circuit]:
+        c = self._free.get()
+        try:
+            yield c
+        finally:
+            self._free.put(c)
+
+    def _controller(self):
+        """The pool's one control connection, (re)opened on demand."""
+        if Controller is None or self.control_port is None:
+            return None
+        if self._ctl is None or not self._ctl.is_alive():
+            try:
+                ctl = Controller.from_port(port=self.control_port)
+                ctl.authenticate(password=self.password)
+            except Exception as e:
+                print(f"⚠️ Tor control port {self.control_port} unavailable ({e}); "
+                      "rotating by credentials only")
+                self.control_port = None
+                return None
+            self._ctl = ctl
+        return self._ctl
+
+    def close_circuits(self, username: str) -> int:
+        """Close the circuits Tor built for `username`'s streams."""
+        with self._ctl_lock:
+            ctl = self._controller()
+            if ctl is None:
+                return 0
+            try:
+                status = ctl.get_info("circuit-status")
+            except Exception:
+                return 0
+            ids = [line.split()[0] for line in status.splitlines()
+                   if f'SOCKS_USERNAME="{username}"' in line]
+            for cid in ids:
+                with suppress(Exception):
+                    ctl.close_circuit(cid)
+            return len(ids)
+
+    def close(self):
+        with self._ctl_lock:
+            if self._ctl is not None:
+                with suppress(Exception):
+                    self._ctl.close()
+                self._ctl = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default: Optional[CircuitPool] = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> CircuitPool:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = CircuitPool()
+        return _default
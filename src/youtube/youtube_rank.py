@@ -1,7 +1,9 @@
 # src/youtube_rank.py
-import datetime, pytz, numpy as np, sqlalchemy as sa
+import datetime, os, pytz, numpy as np, sqlalchemy as sa
 from sqlalchemy.orm import Session
+from sqlalchemy import update
 from src.models import Video
+from src.vector_store import CHUNK_MODES, TOP_K_CHUNKS, chunk_scores, decode_blobs, decode_chunks
 import itertools, yaml, numpy as np, pytz
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
@@ -13,6 +15,7 @@ CATEGORIES = CFG["scoring_categories"]
 # build two handy dicts
 KW_DICT   = {c["name"]: c["keywords"] for c in CATEGORIES}
 WEIGHTS   = {c["name"]: c.get("weight", 1) for c in CATEGORIES}
+_KW_LOWER = {name: [k.lower() for k in kws] for name, kws in KW_DICT.items()}
 
 # ── 2.  Single global query vector from ALL keywords  ──────────────────────
 _EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
@@ -25,10 +28,38 @@ cfg = yaml.safe_load(Path("sources_and_keywords/youtube_keywords.yaml").read_tex
 SRC_W = cfg.get("source_weights", {})
 
 
-def cosine(blob):
+# "mean": the mean-pooled Video.vector; "max"/"topk": best chunk(s) of chunk_vectors
+SEMANTIC_MODE = os.getenv("SEMANTIC_MODE", "mean")
+if SEMANTIC_MODE not in CHUNK_MODES:
+    raise ValueError(f"SEMANTIC_MODE must be one of {CHUNK_MODES}")
+
+
+def cosine(blob, chunks: bytes = None, mode: str = None):
+    mode = mode or SEMANTIC_MODE
+    if mode != "mean":
+        return float(semantic_sims([blob], [chunks], mode)[0])
     v = np.frombuffer(blob, dtype=np.float32)
     return float(np.dot(v, QUERY_VEC))
 
+
+def semantic_sims(blobs, chunk_blobs, mode: str = None, k: int = TOP_K_CHUNKS,
+                  exact: bool = False) -> np.ndarray:
+    """
+    Query similarity for many videos: one matrix product over vectors or chunks.
+    exact=True (mean mode) takes a float32 np.dot per row of the decoded matrix
+    instead — what cosine() returns, to the bit.
+    """
+    mode = mode or SEMANTIC_MODE
+    if mode == "mean":
+        vecs = decode_blobs(blobs)
+        if exact:
+            return np.array([np.dot(v, QUERY_VEC) for v in vecs], dtype=np.float64)
+        # float64: float32 BLAS products round differently from np.dot, and
+        # a last-bit difference can flip int() at an integer boundary
+        return vecs.astype(np.float64) @ QUERY_VEC.astype(np.float64)
+    chunks, owner = decode_chunks(chunk_blobs, blobs)
+    return chunk_scores(chunks, owner, len(blobs), QUERY_VEC, mode, k)[:, 0]
+
 def source_weight(name: str) -> float:
     return float(SRC_W.get(name, 1.0))
 
@@ -37,24 +68,61 @@ UTC = pytz.utc
 def kw_weighted_hits(text: str) -> int:
     flat = text.lower()
     total = 0
-    for name, kw_list in KW_DICT.items():
-        if any(k.lower() in flat for k in kw_list):
+    for name, kw_list in _KW_LOWER.items():
+        if any(k in flat for k in kw_list):
             total += WEIGHTS[name]
     return total  # simple int, not Counter now
 
-def rank_videos():
+RECENCY_HORIZON_H = 24   # videos older than this decay as 24 / age_in_hours
+
+
+def recency_factors(published, now) -> np.ndarray:
+    """min(1, 24 / age_h) for every video at once; unknown dates get 1."""
+    now_ts = now.timestamp()
+    ts = np.array([
+        (p if p.tzinfo else UTC.localize(p)).timestamp() if p else now_ts
+        for p in published
+    ], dtype=np.float64)
+    hours = np.maximum(1.0, (now_ts - ts) / 3600)
+    return np.minimum(1.0, RECENCY_HORIZON_H / hours)
+
+
+def batch_scores(vids, now, recency: bool = True) -> np.ndarray:
+    """
+    Scores for a list of Video rows: one blob join + one matrix product for the
+    semantic term (mean vectors or chunks, per SEMANTIC_MODE), recency as an array op.
+    With recency=False this is the old per-row int(w * (kw + sem*25)) exactly:
+    the mean-mode similarity is then the old float32 np.dot per row, since a
+    matrix product rounds differently and can flip int() at an integer
+    boundary (benchmarks.rank_parity checks it).
+    """
+    sem = semantic_sims([v.vector for v in vids], [v.chunk_vectors for v in vids],
+                        exact=not recency)
+    kw  = np.array([kw_weighted_hits(v.transcript or v.description or "") for v in vids],
+                   dtype=np.float64)
+    w   = np.array([source_weight(v.channel_name) for v in vids], dtype=np.float64)
+    raw = w * (kw * 1 + sem.astype(np.float64) * 25)
+    if recency:
+        raw = raw * recency_factors([v.published_at for v in vids], now)
+    return raw.astype(np.int64)   # truncates toward zero, like int()
+
+
+def rank_videos(recency: bool = True):
     eng = sa.create_engine("sqlite:///newsletter.db")
     now = datetime.datetime.now(tz=UTC)
     with Session(eng) as ssn:
-        vids = ssn.query(Video).filter(Video.score.is_(None)).all()
-        for v in vids:
-            txt   = v.transcript or v.description or ""
-            sem   = cosine(v.vector) if v.vector else 0
-            kw    = kw_weighted_hits(txt)
-            # rec   = 24 / max(1, (now - v.published_at).total_seconds()/3600)
-            w = source_weight(v.channel_name)
-            v.score = int(w * (kw*1 + sem*25))
+        vids = (ssn.query(Video)
+                   .filter(Video.score.is_(None))
+                   .filter(Video.retired_at.is_(None))
+                   .all())
+        if not vids:
+            return
+        scores = batch_scores(vids, now, recency)
+        ssn.execute(update(Video), [
+            {"video_id": v.video_id, "score": int(sc)} for v, sc in zip(vids, scores)
+        ])
         ssn.commit()
+    print(f"✅ ranked {len(vids)} videos")
 
 if __name__ == "__main__":
     rank_videos()
@@ -15,6 +15,7 @@ load_dotenv()
 UTC = pytz.utc
 HOURS = 24 # lookback window in hours basically 7 days here
 MIN_DURATION_SEC = 5 * 60  # 5 minutes
+YOUTUBE_API_ENDPOINT = os.getenv("YOUTUBE_API_ENDPOINT")  # a stand-in API (benchmarks.load_test)
 
 def load_channels(config_path="sources_and_keywords/channels.yaml"):
     with open(config_path) as f:
@@ -37,7 +38,8 @@ def fetch_videos(max_results_per_channel=7, config_path="sources_and_keywords/ch
     Fetch recent videos >= MIN_DURATION_SEC from each channel's uploads playlist
     and store new ones in the DB.
     """
-    youtube = build("youtube", "v3", developerKey=os.getenv("YOUTUBE_API_KEY"))
+    youtube = build("youtube", "v3", developerKey=os.getenv("YOUTUBE_API_KEY"),
+                    client_options={"api_endpoint": YOUTUBE_API_ENDPOINT} if YOUTUBE_API_ENDPOINT else None)
     cutoff = datetime.datetime.now(tz=UTC) - datetime.timedelta(hours=HOURS)
     channels = load_channels(config_path)
 
@@ -1,15 +1,17 @@
 import os, textwrap, dotenv
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
-from openai import OpenAI
-import google.generativeai as genai
-from src.models import Video
-from src.articles.summarise import clean_summary
+from src.articles.summarise import clean_summary, PROVIDERS
+from src.condense import condense, est_tokens
+from src.hedge import LatencyStats, race
+from src import lineup
 
 dotenv.load_dotenv()                               
 
 MODEL = "deepseek/deepseek-r1-0528-qwen3-8b:free" 
 DB  = "newsletter.db"
+PROMPT_BUDGET_TOKENS = 1_800      # condensed transcript per call (was 10 000 chars ≈ 2 500)
+OLD_CUT_CHARS = 10_000            # what the prompt got before condensing: text[:10000]
 
 PROMPT_TMPL = textwrap.dedent("""\
     Please summarize the following video for a general-audience newsletter.
@@ -30,65 +32,30 @@ PROMPT_TMPL = textwrap.dedent("""\
     {text}
 """)
 
-# Configure Gemini client
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-gemini_model = genai.GenerativeModel('gemini-2.5-flash')
+# Gemini / OpenRouter clients and the hedged race are shared with article summaries
 
-# Configure OpenRouter as fallback
-openrouter_client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
-
-def get_summary_gemini(text: str) -> str:
-    try:
-        response = gemini_model.generate_content(PROMPT_TMPL.format(text=text))
-        return response.text.strip()
-    except Exception as e:
-        print(f"⚠️ Gemini API error: {e}")
-        return None
-    
-def get_summary_openrouter(text: str) -> str:
-    """Fallback to OpenRouter API."""
-    try:
-        completion = openrouter_client.chat.completions.create(
-            model="deepseek/deepseek-chat-v3-0324:free",
-            messages=[{
-                "role": "user",
-                "content": PROMPT_TMPL.format(text=text)
-            }],
-            extra_body={}
-        )
-        return completion.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"⚠️ OpenRouter API error: {e}")
-        return None
-
-def summarise_batch(limit: int = 1) -> None:
+def summarise_batch(edition=None) -> None:
     eng = create_engine("sqlite:///newsletter.db")
 
     with Session(eng) as ssn:
-        vids = ssn.scalars(
-            select(Video)
-            .where(Video.summary.is_(None))
-            .order_by(Video.score.desc())
-            .limit(limit)
-        ).all()
+        # exactly the videos render will show (see src.lineup)
+        vids = [v for v in lineup.items(ssn, "videos", edition) if v.summary is None]
+        stats = LatencyStats(ssn)
 
         for i, v in enumerate(vids):
-            content_text = v.transcript or v.description
-            snippet = content_text[:10000]
-            
-            # Try Gemini first
-            summary = get_summary_gemini(snippet)
-            
-            # Fallback to OpenRouter if Gemini fails
-            if not summary:
-                print(f"🔄 Falling back to OpenRouter for: {v.title[:60]}")
-                summary = get_summary_openrouter(snippet)
+            content_text = v.transcript or v.description or ""
+            snippet = condense(content_text, PROMPT_BUDGET_TOKENS, v.vector)
+            print(f"✂️ {v.title[:60]}: ≈{est_tokens(content_text[:OLD_CUT_CHARS])} "
+                  f"(old cut) → ≈{est_tokens(snippet)} tokens")
             
+            # Gemini first, OpenRouter hedged in if it is slow or fails
+            summary, provider = race(PROVIDERS, PROMPT_TMPL.format(text=snippet), stats)
+            if provider and provider != PROVIDERS[0][0]:
+                print(f"🔄 {provider} answered for: {v.title[:60]}")
+
             if not summary:
                 print(f"⚠️ Both APIs failed for: {v.title[:60]}")
+                ssn.commit()            # keep the latency samples
                 continue
             
             v.summary = clean_summary(summary)
@@ -1,6 +1,6 @@
 """
 Light‑weight YouTube caption helper *v4* — handles CAPTCHA‑gated videos,
-adds cookie support, Tor rotation and bounded retries.
+adds cookie support, per-worker Tor circuits and bounded retries.
 
 Usage recap
 -----------
@@ -8,7 +8,10 @@ Usage recap
 * Export or auto‑extract YouTube cookies so yt‑dlp can bypass the
   “Sign‑in to confirm you’re not a robot” wall.
 * Run Tor (`brew services start tor`) so requests go through a clean IP.
-* Call `enrich_video_with_transcript(video)` from your ORM pipeline; or
+  Every worker uses its own isolated circuit (src.youtube.tor_pool); a
+  403/429 only rotates that worker's circuit.
+* Call `refresh_transcripts(videos)` (parallel) or
+  `enrich_video_with_transcript(video)` from your ORM pipeline; or
   run the CLI for a quick test:
 
 ```bash
@@ -19,15 +22,13 @@ This saves `transcripts.json` in the current directory.
 
 from __future__ import annotations
 
-import html
-import json
 import os
 import random
 import re
 import time
-from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Iterable, Optional, Tuple
 
 import requests
 from yt_dlp import YoutubeDL
@@ -39,13 +40,13 @@ from youtube_transcript_api import (
 )
 from youtube_transcript_api.proxies import GenericProxyConfig, InvalidProxyConfig
 
+from src.youtube.captions import parse_captions
+from src.youtube.tor_pool import Circuit, CircuitPool, default_pool
+
 # ---------------------------------------------------------------------------
-# Config & TOR
+# Config (Tor settings live in src.youtube.tor_pool)
 # ---------------------------------------------------------------------------
 
-TOR_SOCKS_PORT = 9050  # change to 9150 when using Tor Browser
-SOCKS_PROXY = f"socks5h://127.0.0.1:{TOR_SOCKS_PORT}"
-PROXIES = {"http": SOCKS_PROXY, "https": SOCKS_PROXY}
 PREFERRED_EN_KEYS = ("en", "en-US", "en-GB", "a.en", "xx")
 CAPTION_EXTS = ("vtt", "srt", "srv3", "json3")
 MAX_RETRIES_PER_VIDEO = 3
@@ -87,7 +88,6 @@ if COOKIE_FILE and not COOKIE_FILE.exists():
 YDL_OPTS = {
     "skip_download": True,
     "quiet": not DEBUG,
-    "proxy": SOCKS_PROXY,
     "nocheckcertificate": True,
 }
 if COOKIE_FILE and COOKIE_FILE.exists():
@@ -101,44 +101,13 @@ else:
     if DEBUG:
         print("[yt-dlp] will load cookies from Chrome at runtime")
 
-# ---------------- Tor rotation helper ----------------
-try:
-    from stem import Signal  # type: ignore
-    from stem.control import Controller  # type: ignore
-
-    def _rotate_tor_identity(password: str | None = None) -> None:
-        """Send NEWNYM to Tor control port → new exit IP."""
-        with suppress(Exception):
-            with Controller.from_port(port=9051) as ctl:
-                ctl.authenticate(password=password)
-                ctl.signal(Signal.NEWNYM)
-                if DEBUG:
-                    print("[Tor] NEWNYM → IP rotated")
-except ModuleNotFoundError:
-
-    def _rotate_tor_identity(password: str | None = None):  # type: ignore
-        return
-
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
 
-def _strip_caption_payload(raw: str) -> str:
+def _strip_caption_payload(raw: str, ext: Optional[str] = None) -> str:
     """Convert caption payload (.json3/.srv3/.vtt/.srt) → plain text."""
-    if raw.lstrip().startswith("{"):
-        try:
-            obj = json.loads(raw)
-            return "\n".join(html.unescape(seg["utf8"]) for ev in obj["events"]
-                                    if "segs" in ev for seg in ev["segs"] if seg.get("utf8"))
-        except Exception:
-            return ""
-
-    lines: List[str] = []
-    for ln in raw.splitlines():
-        ln = ln.strip()
-        if ln and not ln.isdigit() and "-->" not in ln and not ln.lower().startswith("webvtt"):
-            lines.append(ln)
-    return "\n".join(lines)
+    return parse_captions(raw, ext)
 
 
 def _pick_caption(info: dict) -> Optional[dict]:
@@ -154,17 +123,17 @@ def _pick_caption(info: dict) -> Optional[dict]:
     return None
 
 
-def _fetch_transcript_ytdlp(video_id: str, attempt: int = 0) -> Optional[str]:
+def _fetch_transcript_ytdlp(video_id: str, circuit: Circuit, attempt: int = 0) -> Optional[str]:
     if attempt >= MAX_RETRIES_PER_VIDEO:
         return None
     try:
-        with YoutubeDL(YDL_OPTS) as ydl:
+        with YoutubeDL({**YDL_OPTS, "proxy": circuit.proxy_url}) as ydl:
             info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
     except Exception as exc:
         if DEBUG:
             print(f"[yt-dlp] info error: {exc}")
-        _rotate_tor_identity()
-        return _fetch_transcript_ytdlp(video_id, attempt + 1)
+        circuit.rotate("info error")
+        return _fetch_transcript_ytdlp(video_id, circuit, attempt + 1)
 
     cap = _pick_caption(info)
     if not cap:
@@ -174,36 +143,34 @@ def _fetch_transcript_ytdlp(video_id: str, attempt: int = 0) -> Optional[str]:
 
     try:
         time.sleep(random.uniform(3, 6))
-        r = requests.get(cap["url"], proxies=PROXIES, timeout=30)
+        r = requests.get(cap["url"], proxies=circuit.proxies, timeout=30)
         if r.status_code in {403, 429}:
             if DEBUG:
                 print(f"[yt-dlp] {r.status_code} – rotate & retry ({attempt + 1})")
-            _rotate_tor_identity()
+            circuit.rotate(str(r.status_code))
             time.sleep(5)
-            return _fetch_transcript_ytdlp(video_id, attempt + 1)
+            return _fetch_transcript_ytdlp(video_id, circuit, attempt + 1)
         if r.status_code != 200:
             if DEBUG:
                 print(f"[yt-dlp] caption GET {r.status_code}")
             return None
-        return _strip_caption_payload(r.text)
+        return _strip_caption_payload(r.text, cap.get("ext"))
     except Exception as exc:
         if DEBUG:
             print(f"[yt-dlp] download error: {exc}")
-        _rotate_tor_identity()
-        return _fetch_transcript_ytdlp(video_id, attempt + 1)
+        circuit.rotate("download error")
+        return _fetch_transcript_ytdlp(video_id, circuit, attempt + 1)
 
 
-def _fetch_transcript_ytapi(video_id: str) -> Optional[str]:
+def _fetch_transcript_ytapi(video_id: str, circuit: Circuit) -> Optional[str]:
     # First try preferred English keys → then any language → then auto‑translate.
-    proxy_config = None
-    if PROXIES:
-        try:
-            proxy_config = GenericProxyConfig(
-                http_url=PROXIES.get("http"),
-                https_url=PROXIES.get("https"),
-            )
-        except InvalidProxyConfig:
-            proxy_config = None
+    try:
+        proxy_config = GenericProxyConfig(
+            http_url=circuit.proxies["http"],
+            https_url=circuit.proxies["https"],
+        )
+    except InvalidProxyConfig:
+        proxy_config = None
 
     api = YouTubeTranscriptApi(proxy_config=proxy_config)
     for langs in (PREFERRED_EN_KEYS, ()):  # empty tuple means “any”
@@ -229,7 +196,7 @@ def _fetch_transcript_ytapi(video_id: str) -> Optional[str]:
         except (TranscriptsDisabled, NoTranscriptFound):
             return None
         except CouldNotRetrieveTranscript:
-            _rotate_tor_identity()
+            circuit.rotate("transcript-api")
             time.sleep(5)
             continue
     # auto‑translate generated ASR to English
@@ -253,21 +220,30 @@ def _fetch_transcript_ytapi(video_id: str) -> Optional[str]:
 # Public API
 # ---------------------------------------------------------------------------
 
-def enrich_video_with_transcript(video):
-    """Populate `video.transcript` if empty and return the text used."""
-    if getattr(video, "transcript", None):
-        return video.transcript
-
-    text = _fetch_transcript_ytdlp(video.video_id)
+def fetch_transcript(video_id: str, description: str, circuit: Circuit) -> Tuple[str, str]:
+    """(text, source) for one video over `circuit`; touches no ORM state."""
+    text = _fetch_transcript_ytdlp(video_id, circuit)
     source = "yt-dlp"
 
     if not text:
-        text = _fetch_transcript_ytapi(video.video_id)
+        text = _fetch_transcript_ytapi(video_id, circuit)
         source = "transcript-api"
 
     if not text:
-        text = getattr(video, "description", "") or ""
+        text = description or ""
         source = "description"
+    return text, source
+
+
+def enrich_video_with_transcript(video, circuit: Optional[Circuit] = None):
+    """Populate `video.transcript` if empty and return the text used."""
+    if getattr(video, "transcript", None):
+        return video.transcript
+
+    if circuit is None:
+        with default_pool().circuit() as c:
+            return enrich_video_with_transcript(video, c)
+    text, source = fetch_transcript(video.video_id, getattr(video, "description", ""), circuit)
 
     video.transcript = text
     print(f"✓ {source} for {video.title}" if text else f"→ no captions for {video.title}")
@@ -280,16 +256,26 @@ get_video_transcript = enrich_video_with_transcript
 # Batch helper
 # ---------------------------------------------------------------------------
 
-def refresh_transcripts(videos: Iterable):
-    """Iterate through `videos` collection, enrich missing transcripts."""
-    processed = 0
-    for v in videos:
+def refresh_transcripts(videos: Iterable, pool: Optional[CircuitPool] = None):
+    """
+    Enrich missing transcripts, one worker per circuit of `pool`. Fetches run
+    in threads; the ORM objects are only written back on the calling thread.
+    """
+    pool = pool or default_pool()
+    todo = [v for v in videos if not getattr(v, "transcript", None)]
+
+    def work(video_id: str, description: str):
         time.sleep(random.uniform(2, 4))
-        try:
-            enrich_video_with_transcript(v)
-        except Exception as exc:
-            print(f"✗ {v.title}: {exc}")
-        processed += 1
-        if processed % 10 == 0:
-            _rotate_tor_identity()
-            time.sleep(5)
+        with pool.circuit() as c:
+            return fetch_transcript(video_id, description, c)
+
+    with ThreadPoolExecutor(max_workers=pool.size) as ex:
+        futures = [ex.submit(work, v.video_id, getattr(v, "description", "") or "") for v in todo]
+        for v, fut in zip(todo, futures):
+            try:
+                text, source = fut.result()
+            except Exception as exc:
+                print(f"✗ {v.title}: {exc}")
+                continue
+            v.transcript = text
+            print(f"✓ {source} for {v.title}" if text else f"→ no captions for {v.title}")